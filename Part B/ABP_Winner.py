@@ -1,14 +1,29 @@
+import multiprocessing
+import multiprocessing.pool
 import random
-from typing import List, Tuple, Dict, Union
+import time
+import weakref
+from array import array
+from typing import List, Tuple, Dict, Union, Optional, Callable
 
-from Classes.Board import Board
+from Classes.BitBoard import BitBoard
 from Classes.Delta import Delta
+from Classes.Move import Move
+from Classes.MoveOrderer import MoveOrderer
 from Classes.Pos2D import Pos2D
-from Classes.Square import Square
+from Classes.TranspositionTable import TranspositionTable
 from Enums.GamePhase import GamePhase
 from Enums.PlayerColor import PlayerColor
 from Misc.Timer import Timer
 from Misc.Utilities import Utilities as Utils
+from Misc import Zobrist
+
+
+class _SearchTimeout(Exception):
+    """
+    Raised inside a search when its deadline has passed, to abandon it.
+    """
+    pass
 
 
 class Player():
@@ -41,19 +56,59 @@ class Player():
     # The amount of rounds expected to be played. Includes placement rounds and
     # all rounds until around 2nd deathzone.
     _NUM_EXPECTED_ROUNDS: int = 24 + 194
-    _DEPTH_TWO_EXPECTED_TURN_TIME: float = 200
-
+    # Games can go on for longer than expected, so always keep enough time for
+    # at least this many more rounds.
+    _MIN_EXPECTED_REMAINING_ROUNDS: int = 10
+    # How much time a move in each phase gets, relative to an even split of the
+    # remaining time. Placement moves shape the rest of the game, so they get
+    # more.
+    _PHASE_TIME_WEIGHTS: Dict[GamePhase, float] = {
+        GamePhase.PLACEMENT: 1.5,
+        GamePhase.MOVEMENT: 1.0
+    }
+    # Roughly how many times longer each iteration of the iterative-deepening
+    # search takes than the one before it. Used to avoid starting an iteration
+    # that would almost certainly be aborted.
+    _ITERATION_GROWTH_FACTOR: float = 4.0
+    # Deeper than this and every line has reached the end of the game anyway.
+    _MAX_DEPTH: int = 32
+
+
+    # --- Parallel search parameters ---
+    # The number of worker processes to spread the root moves' searches
+    # across. With 0, they are searched one after the other in this process.
+    # In parallel mode the time budget for a move is measured in wall-clock
+    # time, since the search no longer runs on this process' CPU time.
+    _NUM_SEARCH_PROCESSES: int = 0
+    # The most memory each worker's transposition table may use.
+    _WORKER_TRANSPOSITION_TABLE_MEGABYTES: float = 8
+    # Root moves are searched with a window just below (or above, for black)
+    # the best score found so far, so that moves that tie it still get their
+    # exact score. Must be smaller than the heuristic's rounding.
+    _ROOT_WINDOW_EPSILON: float = 1e-11
 
     # --- Other parameters ---
     _ALPHA_START_VALUE: int = -9999
     _BETA_START_VALUE: int = 9999
     _SEED: int = 1337
+    # The most memory the transposition table may use.
+    _TRANSPOSITION_TABLE_MEGABYTES: float = 32
 
     # --- Instance variables ---
     # A reference to the current board that the agent is on.
     _timer: Timer
-    _board: Board
+    _board: BitBoard
     _color: PlayerColor
+    # Search results kept between turns, keyed by position hash.
+    _transposition_table: TranspositionTable
+    # Killer moves and history scores kept between turns.
+    _move_orderer: MoveOrderer
+    # The pool of worker processes used in parallel mode, or None. Started once
+    # per game.
+    _search_pool: Optional[multiprocessing.pool.Pool]
+    # The best score of the root moves searched so far in the current
+    # iteration, shared with the worker processes.
+    _shared_best_value: Optional[multiprocessing.Value]
 
 
     def __init__(self, color: str):
@@ -69,7 +124,20 @@ class Player():
         player for this game).
         """
 
-        self._board = Board(None, 0, GamePhase.PLACEMENT)
+        self._board = BitBoard(None, 0, GamePhase.PLACEMENT)
+        self._transposition_table = TranspositionTable(
+            Player._TRANSPOSITION_TABLE_MEGABYTES)
+        self._move_orderer = MoveOrderer()
+        self._search_pool = None
+        self._shared_best_value = None
+        if (Player._NUM_SEARCH_PROCESSES > 0):
+            self._shared_best_value = multiprocessing.Value('d', 0.0)
+            self._search_pool = multiprocessing.Pool(
+                Player._NUM_SEARCH_PROCESSES, initializer=_init_search_worker,
+                initargs=(self._shared_best_value,))
+            # The workers are stopped when the player is garbage collected (or
+            # when the program exits).
+            weakref.finalize(self, self._search_pool.terminate)
         if (color.lower() == "white"):
             self._color = PlayerColor.WHITE
         else:
@@ -91,52 +159,188 @@ class Player():
         below, in the ‘Representing actions’ section.
         """
         with(self._timer):
-            deltas: List[Delta] = self._board.get_all_possible_deltas(self._color)
+            # The search works with packed moves (see Classes.Move) rather
+            # than Deltas, which are much more expensive to create.
+            moves: array = self._board.get_all_possible_moves(self._color)
 
-            if (len(deltas) == 0):
+            if (len(moves) == 0):
+                # We have no moves, so our turn is forfeited.
+                self._board.skip_turn()
                 return None
 
             remaining_time: float = self._timer.limit - self._timer.clock
             if (remaining_time < Player._PANIC_MODE_REMAINING_TIME):
                 # AHH! Not much time remaining - pick a random move.
                 print(self._color, "PANIC")
-                random_delta: Delta = random.choice(deltas)
-                self._board = self._board.get_next_board(random_delta)
-                return random_delta.get_referee_form()
-
-            # Determine the depth based on the amount of time remaining.
-            depth: int
-            remaining_expected_rounds: int = \
-                Player._NUM_EXPECTED_ROUNDS - self._board.round_num
-            remaining_expected_time_per_round: float = \
-                remaining_time / (remaining_expected_rounds + 10)
-            if (remaining_expected_time_per_round
-                    > Player._DEPTH_TWO_EXPECTED_TURN_TIME):
-                depth = 2
+                random_move: int = random.choice(moves)
+                self._board = self._board.get_next_board_from_move(random_move)
+                return Move.get_referee_form(random_move)
+
+            # Search one move further ahead each iteration until the time
+            # budget for this move runs out, keeping the scores of the last
+            # iteration that finished.
+            budget: float = self._get_move_time_budget()
+            self._move_orderer.age_history()
+            get_time: Callable[[], float] = time.process_time
+            if (self._search_pool is not None):
+                get_time = time.time
+            deadline: float = get_time() + budget
+            move_scores: Dict[int, float] = {}
+            depth: int = 1
+            while (depth <= Player._MAX_DEPTH):
+                iteration_start: float = get_time()
+                try:
+                    # The first iteration always runs to completion so that
+                    # there is a move to fall back on.
+                    if (self._search_pool is not None):
+                        move_scores = self._get_move_scores_in_parallel(
+                            moves, depth,
+                            deadline if depth > 1 else float("inf"))
+                    else:
+                        move_scores = self._get_move_scores(
+                            moves, depth,
+                            deadline if depth > 1 else float("inf"))
+                except _SearchTimeout:
+                    break
+
+                print("Looked {} moves ahead!".format(depth))
+                iteration_time: float = get_time() - iteration_start
+                if (get_time() + iteration_time
+                        * Player._ITERATION_GROWTH_FACTOR > deadline):
+                    break
+
+                # Search the best move found so far first in the next
+                # iteration, so that the rest are searched with a tight window.
+                best_so_far: int = Utils.get_best_deltas(
+                    move_scores, self._color)[0][0]
+                moves.remove(best_so_far)
+                moves.insert(0, best_so_far)
+                depth += 1
+
+            best_moves: List[Tuple[int, float]] = Utils.get_best_deltas(move_scores, self._color)
+            best_move: Tuple[int, float]
+            if (len(best_moves) > 1):
+                # There are more than one "best" moves. Pick a random one.
+                best_move = random.choice(list(best_moves))
             else:
-                depth = 1
+                best_move = best_moves[0]
+
+            self._board = self._board.get_next_board_from_move(best_move[0])
+
+            print(self._color, "DOES", Move.get_referee_form(best_move[0]), "[{}]".format(best_move[1]))
+            return Move.get_referee_form(best_move[0])
 
-            print("Looking {} moves ahead!".format(depth))
-            delta_scores: Dict[Delta, float] = {}
-            for delta in deltas:
-                delta_scores[delta] = \
+    def _get_move_time_budget(self) -> float:
+        """
+        Returns how much CPU time the current move may take, based on the time
+        remaining, the game phase and the number of rounds expected to remain.
+        """
+        remaining_time: float = \
+            self._timer.get_remaining() - Player._PANIC_MODE_REMAINING_TIME
+        remaining_expected_rounds: int = max(
+            Player._NUM_EXPECTED_ROUNDS - self._board.round_num,
+            Player._MIN_EXPECTED_REMAINING_ROUNDS)
+        # We only play every second round.
+        remaining_expected_moves: float = remaining_expected_rounds / 2
+
+        budget: float = remaining_time / remaining_expected_moves \
+            * Player._PHASE_TIME_WEIGHTS[self._board.phase]
+        return max(0.0, min(budget, remaining_time))
+
+    def _get_move_scores(self, moves: array, depth: int,
+                         deadline: float) -> Dict[int, float]:
+        """
+        Searches each move to the given depth and returns their scores. Raises
+        _SearchTimeout if the deadline passes before the search finishes, in
+        which case the board is left as it was.
+        """
+        move_scores: Dict[int, float] = {}
+        best_value: float = Player._get_root_start_value(self._color)
+        for move in moves:
+            (alpha, beta) = Player._get_root_window(self._color, best_value)
+            self._board.apply_move(move)
+            try:
+                move_scores[move] = \
                     Player.get_alpha_beta_value(
-                        self._board.get_next_board(delta), depth - 1,
-                        Player._ALPHA_START_VALUE,
-                        Player._BETA_START_VALUE, self._color)
-
-            best_deltas: List[Delta] = Utils.get_best_deltas(delta_scores, self._color)
-            best_delta: Tuple[Delta, float]
-            if (len(best_deltas) > 1):
-                # There are more than one "best" deltas. Pick a random one.
-                best_delta = random.choice(list(best_deltas))
+                        self._board, depth - 1, alpha, beta,
+                        self._color.opposite(), self._transposition_table,
+                        self._move_orderer, deadline)
+            finally:
+                self._board.undo_move(move)
+            best_value = Player._get_better_value(
+                self._color, best_value, move_scores[move])
+
+        return move_scores
+
+    def _get_move_scores_in_parallel(self, moves: array, depth: int,
+                                     deadline: float) -> Dict[int, float]:
+        """
+        Does the same as ._get_move_scores(), but searches the moves in the
+        worker processes. 'deadline' is a time.time() value.
+        """
+        self._shared_best_value.value = \
+            Player._get_root_start_value(self._color)
+
+        # The workers get the board and the move as a handful of ints.
+        board_encoding: Tuple[int, ...] = self._board.encode()
+        results: List[Tuple[int, multiprocessing.pool.AsyncResult]] = [
+            (move, self._search_pool.apply_async(
+                _search_root_move,
+                (board_encoding, move, depth, self._color.value, deadline)))
+            for move in moves]
+
+        # Wait for every search to finish (searches that are out of time
+        # return straight away) so none are left running into the next one.
+        move_scores: Dict[int, float] = {}
+        is_timed_out: bool = False
+        for move, result in results:
+            score: Optional[float] = result.get()
+            if (score is None):
+                is_timed_out = True
             else:
-                best_delta = best_deltas[0]
+                move_scores[move] = score
+
+        if (is_timed_out):
+            raise _SearchTimeout()
 
-            self._board = self._board.get_next_board(best_delta[0])
+        return move_scores
 
-            print(self._color, "DOES", best_delta[0], "[{}]".format(best_delta[1]))
-            return best_delta[0].get_referee_form()
+    @staticmethod
+    def _get_root_start_value(color: PlayerColor) -> float:
+        """
+        Returns the worst possible score for the given player.
+        """
+        if (color == PlayerColor.WHITE):
+            return Player._ALPHA_START_VALUE
+        else:
+            return Player._BETA_START_VALUE
+
+    @staticmethod
+    def _get_better_value(color: PlayerColor, value1: float,
+                          value2: float) -> float:
+        """
+        Returns whichever of the two scores is better for the given player.
+        """
+        if (color == PlayerColor.WHITE):
+            return max(value1, value2)
+        else:
+            return min(value1, value2)
+
+    @staticmethod
+    def _get_root_window(color: PlayerColor,
+                         best_value: float) -> Tuple[float, float]:
+        """
+        Returns the (alpha, beta) window to search a root move of the given
+        player with, given the best score of the root moves searched so far.
+        Moves that can't at least tie that score are cut off early, and get a
+        score that is worse than it.
+        """
+        if (color == PlayerColor.WHITE):
+            return (best_value - Player._ROOT_WINDOW_EPSILON,
+                    Player._BETA_START_VALUE)
+        else:
+            return (Player._ALPHA_START_VALUE,
+                    best_value + Player._ROOT_WINDOW_EPSILON)
 
     def update(self, action: Tuple[Union[int, Tuple[int]]]):
         """
@@ -164,8 +368,8 @@ class Player():
 
             if (action is None):
                 # Opponent forfeited turn.
-                self._board.round_num += 1
-                self._board._update_game_phase()
+                self._board.skip_turn()
+                return
 
             positions: List[Pos2D]
 
@@ -203,92 +407,106 @@ class Player():
             self._board = self._board.get_next_board(opponent_delta)
 
     @staticmethod
-    def get_alpha_beta_value(board: Board, depth: int, alpha: float, beta: float, color: PlayerColor) -> float:
+    def get_alpha_beta_value(board: BitBoard, depth: int, alpha: float, beta: float, color: PlayerColor, transposition_table: TranspositionTable, move_orderer: MoveOrderer, deadline: float) -> float:
+        if (time.process_time() > deadline):
+            raise _SearchTimeout()
+
+        # The value of a position depends on whose point of view it is being
+        # evaluated from, so include the color in the key. The table is kept
+        # between turns, so include the round too: the same pieces on a later
+        # round are closer to the next shrink, which an entry's search may not
+        # have seen coming.
+        key: int = board.zobrist_hash ^ Zobrist.PLAYER_KEYS[color] \
+            ^ (board.round_num * Zobrist.ROUND_KEY & 0xFFFFFFFFFFFFFFFF)
+        # The window the caller asked for, used to tell whether the value found
+        # is exact or only a bound.
+        original_alpha: float = alpha
+        original_beta: float = beta
+        tt_move: int = TranspositionTable.NO_MOVE
+        entry: Optional[Tuple[int, int, float, int]] = transposition_table.probe(key)
+        if (entry is not None):
+            (entry_depth, bound_type, value, tt_move) = entry
+            if (entry_depth >= depth):
+                if (bound_type == TranspositionTable.EXACT):
+                    return value
+                elif (bound_type == TranspositionTable.LOWER_BOUND):
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if (beta <= alpha):
+                    return value
+
         if (depth == 0 or board.phase == GamePhase.FINISHED):
-            return Player.get_heuristic_value(board, color)
+            v: float = Player.get_heuristic_value(board, color)
+            transposition_table.store(key, depth, TranspositionTable.EXACT, v)
+            return v
+
+        moves: List[int] = move_orderer.order_moves(
+            board.get_all_possible_moves(color), board.round_num, tt_move)
 
+        best_move: Optional[int] = None
         if (color == PlayerColor.WHITE): # Maximizer
-            v: float = Player._ALPHA_START_VALUE
-            deltas: List[Delta] = board.get_all_possible_deltas(color)
-            for delta in deltas:
-                v = max(v, Player.get_alpha_beta_value(board.get_next_board(delta), depth - 1, alpha, beta, color.opposite()))
+            v = Player._ALPHA_START_VALUE
+            for move in moves:
+                board.apply_move(move)
+                try:
+                    child_v: float = Player.get_alpha_beta_value(board, depth - 1, alpha, beta, color.opposite(), transposition_table, move_orderer, deadline)
+                finally:
+                    board.undo_move(move)
+                if (child_v > v or best_move is None):
+                    v = child_v
+                    best_move = move
                 alpha = max(alpha, v)
                 if (beta <= alpha):
+                    move_orderer.record_move_cutoff(move, board.round_num, depth)
                     break
-            return v
 
         else: # Minimizer
             v = Player._BETA_START_VALUE
-            deltas: List[Delta] = board.get_all_possible_deltas(color)
-            for delta in deltas:
-                v = min(v, Player.get_alpha_beta_value(board.get_next_board(delta), depth - 1, alpha, beta, color.opposite()))
+            for move in moves:
+                board.apply_move(move)
+                try:
+                    child_v: float = Player.get_alpha_beta_value(board, depth - 1, alpha, beta, color.opposite(), transposition_table, move_orderer, deadline)
+                finally:
+                    board.undo_move(move)
+                if (child_v < v or best_move is None):
+                    v = child_v
+                    best_move = move
                 beta = min(beta, v)
                 if (beta <= alpha):
+                    move_orderer.record_move_cutoff(move, board.round_num, depth)
                     break
-            return v
+
+        # Work out whether v is the exact value of the position or only a bound
+        # on it, relative to the window that was searched.
+        bound_type: int
+        if (v <= original_alpha):
+            bound_type = TranspositionTable.UPPER_BOUND
+        elif (v >= original_beta):
+            bound_type = TranspositionTable.LOWER_BOUND
+        else:
+            bound_type = TranspositionTable.EXACT
+        transposition_table.store(
+            key, depth, bound_type, v,
+            TranspositionTable.NO_MOVE if best_move is None
+            else Move.get_key(best_move))
+
+        return v
 
     @staticmethod
-    def get_heuristic_value(board: Board, player: PlayerColor):
+    def get_heuristic_value(board: BitBoard, player: PlayerColor):
         """
         Given a board, calculates and returns its rating based on heuristics.
         """
 
-        player_squares: List[Square] = board.get_player_squares(player)
-        opponent_squares: List[Square] = board.get_player_squares(player.opposite())
-
-        # -- Num pieces --
-        # Calculate the number of white and black pieces. This is a very
-        # important heuristic that will help prioritize preserving white's own
-        # pieces and killing the enemy's black pieces.
-        num_own_pieces: int = len(player_squares)
-        num_opponent_pieces: int = len(opponent_squares)
-
-        # -- Mobility --
-        # Calculate the mobility for both white and black i.e. the number of
-        # possible moves they can make.
-        own_mobility: int = board.get_num_moves(player)
-        opponent_mobility: int = board.get_num_moves(player.opposite())
-
-        # -- Cohesiveness --
-        own_total_distance: int = 0
-        opponent_total_distance: int = 0
-
-        displacement: Pos2D
-        for idx, square1 in enumerate(player_squares):
-            for square2 in player_squares[idx + 1:]:
-                displacement = square1.pos - square2.pos
-                own_total_distance += abs(displacement.x) + abs(displacement.y)
-
-        for idx, square1 in enumerate(opponent_squares):
-            for square2 in opponent_squares[idx + 1:]:
-                displacement = square1.pos - square2.pos
-                opponent_total_distance += abs(displacement.x) + abs(displacement.y)
-
-        own_avg_allied_distance: float = own_total_distance / (
-                    num_own_pieces + 1)
-        opponent_avg_allied_distance: float = opponent_total_distance / (
-                num_opponent_pieces + 1)
-
-        # -- Centrality --
-        own_total_distance: int = 0
-        opponent_total_distance: int = 0
-
-        x_displacement: float
-        y_displacement: float
-        for square in player_squares:
-            x_displacement = 3.5 - square.pos.x
-            y_displacement = 3.5 - square.pos.y
-            own_total_distance += abs(x_displacement) + abs(y_displacement)
-
-        for square in opponent_squares:
-            x_displacement = 3.5 - square.pos.x
-            y_displacement = 3.5 - square.pos.y
-            opponent_total_distance += abs(x_displacement) + abs(y_displacement)
-
-        own_avg_center_distance: float = own_total_distance / (
-                    num_own_pieces + 1)
-        opponent_avg_center_distance: float = opponent_total_distance / (
-                num_opponent_pieces + 1)
+        # The number of pieces, mobility, cohesiveness (average distance
+        # between allied pieces) and centrality (average distance from the
+        # centre) of both players. See BitBoard.get_features.
+        (num_own_pieces, num_opponent_pieces,
+         own_mobility, opponent_mobility,
+         own_avg_allied_distance, opponent_avg_allied_distance,
+         own_avg_center_distance, opponent_avg_center_distance) = \
+            board.get_features(player)
 
         # Calculate the heuristic score/rating.
         rounded_heuristic_score: float = round(
@@ -306,3 +524,65 @@ class Player():
         # For white, return as is. For black, negate.
         return rounded_heuristic_score if player == PlayerColor.WHITE \
             else -rounded_heuristic_score
+
+
+# The state of a parallel search worker process (see
+# Player._NUM_SEARCH_PROCESSES). Each worker keeps its own transposition table
+# and move orderer for the whole game.
+_worker_transposition_table: Optional[TranspositionTable] = None
+_worker_move_orderer: Optional[MoveOrderer] = None
+_worker_shared_best_value: Optional[multiprocessing.Value] = None
+_worker_round_num: int = -1
+
+
+def _init_search_worker(shared_best_value: multiprocessing.Value):
+    """
+    Sets up a parallel search worker process.
+    """
+    global _worker_transposition_table, _worker_move_orderer, \
+        _worker_shared_best_value
+
+    _worker_transposition_table = TranspositionTable(
+        Player._WORKER_TRANSPOSITION_TABLE_MEGABYTES)
+    _worker_move_orderer = MoveOrderer()
+    _worker_shared_best_value = shared_best_value
+
+
+def _search_root_move(board_encoding: Tuple[int, ...], move: int, depth: int,
+                      color_value: int, deadline: float) -> Optional[float]:
+    """
+    Searches one root move (packed, see Classes.Move) in a parallel search
+    worker process and returns its score, or None if the deadline (a
+    time.time() value) passed first.
+    """
+    global _worker_round_num
+
+    board: BitBoard = BitBoard.decode(board_encoding)
+    color: PlayerColor = PlayerColor(color_value)
+    if (board.round_num != _worker_round_num):
+        # This is the first root move of a new search.
+        _worker_move_orderer.age_history()
+        _worker_round_num = board.round_num
+
+    # Tighten the window with the best score any worker has found so far.
+    with _worker_shared_best_value.get_lock():
+        best_value: float = _worker_shared_best_value.value
+    (alpha, beta) = Player._get_root_window(color, best_value)
+
+    # The search measures time with this process' CPU time, which runs at the
+    # same rate as wall-clock time while the worker is busy.
+    process_deadline: float = time.process_time() + (deadline - time.time())
+    board.apply_move(move)
+    try:
+        score: float = Player.get_alpha_beta_value(
+            board, depth - 1, alpha, beta, color.opposite(),
+            _worker_transposition_table, _worker_move_orderer,
+            process_deadline)
+    except _SearchTimeout:
+        return None
+
+    with _worker_shared_best_value.get_lock():
+        _worker_shared_best_value.value = Player._get_better_value(
+            color, _worker_shared_best_value.value, score)
+
+    return score
@@ -1,8 +1,9 @@
 import random
 from typing import List, Dict, Tuple
 
-from Classes.Board import Board
-from Classes.Delta import Delta
+from Classes.BitBoard import BitBoard
+from Classes.Move import Move
+from Classes.MoveOrderer import MoveOrderer
 from Classes.Node import Node
 from Enums.GamePhase import GamePhase
 from Enums.PlayerColor import PlayerColor
@@ -10,17 +11,19 @@ from Misc.Utilities import Utilities as Utils
 
 class AlphaBetaAgent():
 
-    _board: Board
+    _board: BitBoard
     _node: Node
+    _move_orderer: MoveOrderer
     _init_node: Node = Node(None, None)
 
-    def __init__(self, start_board: Board = None, seed: int = random.randint(0, 999999)):
+    def __init__(self, start_board: BitBoard = None, seed: int = random.randint(0, 999999)):
         if (start_board == None):
-            self._board = Board(None, 1, GamePhase.PLACEMENT)
+            self._board = BitBoard(None, 1, GamePhase.PLACEMENT)
         else:
             self._board = start_board
 
         self._node = self._init_node
+        self._move_orderer = MoveOrderer()
         random.seed(seed)
 
     def run(self):
@@ -29,53 +32,62 @@ class AlphaBetaAgent():
         is_maximizer: bool = False
         while (self._board.phase != GamePhase.FINISHED):
 
-            deltas: List[Delta] = self._board.get_all_possible_deltas(Utils.get_player(self._board.round_num))
-            delta_scores: List[Tuple[Delta, float]] = []
-            for delta in deltas:
-                delta_scores.append((delta, AlphaBetaAgent.alphabeta(self._board.get_next_board(delta), Node(self._node, delta), 2, -9999, 9999, is_maximizer)))
+            moves: List[int] = self._board.get_all_possible_moves(Utils.get_player(self._board.round_num))
+            move_scores: List[Tuple[int, float]] = []
+            self._move_orderer.age_history()
+            for move in moves:
+                self._board.apply_move(move)
+                move_scores.append((move, AlphaBetaAgent.alphabeta(self._board, Node(self._node, move), 2, -9999, 9999, is_maximizer, self._move_orderer)))
+                self._board.undo_move(move)
 
-            if (len(set([delta_score[1] for delta_score in delta_scores])) == 1):
-                best_delta: Tuple[Delta, float] = random.choice(delta_scores)
+            if (len(set([move_score[1] for move_score in move_scores])) == 1):
+                best_move: Tuple[int, float] = random.choice(move_scores)
             elif not is_maximizer:
-                best_delta: Tuple[Delta, float] = max(delta_scores, key=lambda x:x[1])
+                best_move: Tuple[int, float] = max(move_scores, key=lambda x:x[1])
             elif is_maximizer:
-                best_delta: Tuple[Delta, float] = min(delta_scores, key=lambda x:x[1])
+                best_move: Tuple[int, float] = min(move_scores, key=lambda x:x[1])
 
-            self._board = self._board.get_next_board(best_delta[0])
-            self._node = Node(self._node, best_delta[0])
+            self._board = self._board.get_next_board_from_move(best_move[0])
+            self._node = Node(self._node, best_move[0])
             is_maximizer = not is_maximizer
 
-            print("{:3}: {} ({})".format(self._board.round_num - 1, best_delta[0], best_delta[1]))
+            print("{:3}: {} ({})".format(self._board.round_num - 1, Move.get_referee_form(best_move[0]), best_move[1]))
             print(self._board)
 
     @staticmethod
-    def alphabeta(board: Board, node: Node, depth: int, alpha: float, beta: float, is_maximizer: bool) -> float:
+    def alphabeta(board: BitBoard, node: Node, depth: int, alpha: float, beta: float, is_maximizer: bool, move_orderer: MoveOrderer) -> float:
         if (depth == 0 or board.phase == GamePhase.FINISHED):
             return AlphaBetaAgent.get_heuristic_value(board)
 
         if (is_maximizer):
             v: float = -999999
-            deltas: List[Delta] = board.get_all_possible_deltas(Utils.get_player(board.round_num))
-            for delta in deltas:
-                child_node: Node = Node(node, delta)
-                v = max(v, AlphaBetaAgent.alphabeta(board.get_next_board(delta), child_node, depth - 1, alpha, beta, False))
+            moves: List[int] = move_orderer.order_moves(board.get_all_possible_moves(Utils.get_player(board.round_num)), board.round_num)
+            for move in moves:
+                child_node: Node = Node(node, move)
+                board.apply_move(move)
+                v = max(v, AlphaBetaAgent.alphabeta(board, child_node, depth - 1, alpha, beta, False, move_orderer))
+                board.undo_move(move)
                 alpha = max(alpha, v)
                 if (beta <= alpha):
+                    move_orderer.record_move_cutoff(move, board.round_num, depth)
                     break
             return v
         else:
             v = 999999
-            deltas: List[Delta] = board.get_all_possible_deltas(Utils.get_player(board.round_num))
-            for delta in deltas:
-                child_node: Node = Node(node, delta)
-                v = min(v, AlphaBetaAgent.alphabeta(board.get_next_board(delta), child_node, depth - 1, alpha, beta, True))
+            moves: List[int] = move_orderer.order_moves(board.get_all_possible_moves(Utils.get_player(board.round_num)), board.round_num)
+            for move in moves:
+                child_node: Node = Node(node, move)
+                board.apply_move(move)
+                v = min(v, AlphaBetaAgent.alphabeta(board, child_node, depth - 1, alpha, beta, True, move_orderer))
+                board.undo_move(move)
                 beta = min(beta, v)
                 if beta <= alpha:
+                    move_orderer.record_move_cutoff(move, board.round_num, depth)
                     break
             return v
 
     @staticmethod
-    def get_heuristic_value(board: Board):
+    def get_heuristic_value(board: BitBoard):
         num_white_pieces: int = len(board._get_player_squares(PlayerColor.WHITE))
         num_black_pieces: int = len(board._get_player_squares(PlayerColor.BLACK))
         return num_white_pieces - num_black_pieces
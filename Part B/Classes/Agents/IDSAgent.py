@@ -26,7 +26,7 @@ class IDSAgent:
     _RATING_NUM_ROUNDING: int = 10
     # The length of the history of recent board states the agent can remember.
     # Used to avoid repeat moves. Can be quiet high, as each board (being
-    # represented by a string) does not take much memory.
+    # represented by its Zobrist hash) does not take much memory.
     _BOARD_HISTORY_MEMORY: int = 512
 
     # A reference to the current board that the agent is on.
@@ -34,12 +34,15 @@ class IDSAgent:
     # The depth to go in each iteration of the iterative-deepening search
     # algorithm i.e. number of moves to look ahead.
     _depth: int
-    # A list of recent boards. Each board is stored in its string form, for
-    # memory and efficiency purposes.
+    # A list of recent boards. Each board is stored as the Zobrist hash of its
+    # squares (see Board.get_squares_hash()), for memory and efficiency
+    # purposes. Only White moves, so the round - and with it the rest of the
+    # hash - changes every move even when the pieces come back to where they
+    # were.
     # This will allow us to check if a move results in a previous board, and
     # therefore not perform that move, avoiding
     # endless loops in the process.
-    _recent_board_history: List[str] = []
+    _recent_board_history: List[int] = []
 
     def __init__(self, start_board: Board, depth: int, seed: int = None):
         self._board = start_board
@@ -73,7 +76,7 @@ class IDSAgent:
             # Before performing the move, save the current board into the recent
             # boards history list.
             self._recent_board_history = \
-                ([str(self._board)]
+                ([self._board.get_squares_hash()]
                  + self._recent_board_history[:IDSAgent._BOARD_HISTORY_MEMORY])
 
             # Perform the move, replacing the reference to the old board with
@@ -85,7 +88,7 @@ class IDSAgent:
 
     @staticmethod
     def get_board_ratings(board: Board, depth: int,
-                          recent_board_history: List[str]) -> List[float]:
+                          recent_board_history: List[int]) -> List[float]:
         """
         Returns a list of ratings for the given board of size 'depth' + 1. For
         example, if this function returns this list: [2.2, 1.6, 1.7], that means
@@ -99,14 +102,14 @@ class IDSAgent:
         (2, 1)' vs 'move to (2, 1) then kill enemy piece at (2, 2)'. In this
         scenario, we can prioritize the former, thanks to the list of ratings
         being returned. recent_board_history is list of boards represented by
-        strings used to avoid repeating previous board states, avoiding endless
-        loops in the process.
+        the Zobrist hashes of their squares used to avoid repeating previous board states,
+        avoiding endless loops in the process.
         """
 
         # If the current board has been explored in recent board history, return
         # the appropriate rating to discourage its selection in a list e.g.
         # [-99999].
-        if (str(board) in recent_board_history):
+        if (board.get_squares_hash() in recent_board_history):
             return [IDSAgent._REPEAT_BOARD]
 
         # If we're at the end of our search, either due to depth being equal to
@@ -126,7 +129,7 @@ class IDSAgent:
 
     @staticmethod
     def get_best_delta(board: Board, player: PlayerColor, depth: int,
-                       recent_board_history: List[str]) \
+                       recent_board_history: List[int]) \
             -> Tuple[Delta, List[float]]:
         """
         Returns the highest-rated (or best) move from the current board for the
@@ -147,9 +150,11 @@ class IDSAgent:
         # best move along the way.
         best_delta: Tuple[Delta, List[float]] = (None, [-999999])
         for delta in deltas:
+            board.apply(delta)
             delta_ratings: List[float] = \
-                IDSAgent.get_board_ratings(board.get_next_board(delta),
-                                           depth - 1, recent_board_history)
+                IDSAgent.get_board_ratings(board, depth - 1,
+                                           recent_board_history)
+            board.undo(delta)
 
             # This "max" criteria defined by the lambda looks a bit complex, so
             # let's explain. Keep in mind that floats further to the left in a
@@ -1,13 +1,18 @@
+import multiprocessing
+import os
 import random
 import time
+from array import array
 from math import sqrt
-from typing import List, Tuple
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Set, Tuple
 
-from Classes import Delta
-from Classes.Board import Board
-from Classes.Node import Node
+from Classes.BitBoard import BitBoard
+from Classes.NodeArena import NodeArena
+from Classes.TreeFile import TreeFile
 from Enums.GamePhase import GamePhase
 from Enums.PlayerColor import PlayerColor
+from Misc import Zobrist
 from Misc.Utilities import Utilities as Utils
 
 
@@ -15,119 +20,503 @@ class MCTSAgent():
     """
     Contains the main driver functions used for this AI. Contains functions that, together, implement the Monte Carlo
     Tree Search algorithm.
+
+    The tree is really a graph (see NodeArena): positions reached by different orders of moves share a node, so their
+    simulations all count towards the same statistics. A node can have several parents, so a simulation back-propagates
+    along the path it actually took rather than through parent links.
     """
 
     _EXPLORATION_MULTIPLIER: float = sqrt(2)
+    # The chance that a rollout move is picked from just the moves that capture, when there are any, rather than from
+    # every move. Purely random games rarely resemble real ones, where captures are seldom passed up.
+    _ROLLOUT_CAPTURE_PROBABILITY: float = 0.75
+    # Nodes are evicted before a simulation (or a batch of them) whenever fewer nodes than this are free.
+    _MIN_FREE_NODES: int = 512
+    # How often training writes the nodes that have changed to its tree file.
+    _SAVE_INTERVAL_SECONDS: float = 60
+    # How long the workers of train_root_parallel() grow their trees between merges.
+    _MERGE_INTERVAL_SECONDS: float = 5
+    # How many moves deep the workers' trees are merged into the main tree. Below this, the workers' statistics are too
+    # sparse to be worth sending.
+    _MERGE_DEPTH: int = 3
+    # The memory each worker's own tree may use in train_root_parallel().
+    _WORKER_TREE_MEGABYTES: float = 64
+    # How many playouts train_leaf_parallel() hands each worker at a time. More keeps the workers busier, but each
+    # batch is selected with less up to date statistics.
+    _LEAF_BATCH_SIZE_PER_PROCESS: int = 8
+    # The number of lost simulations temporarily added to the nodes on the path of a playout that is still running in
+    # train_leaf_parallel(), so that the other selections in its batch are steered elsewhere.
+    _VIRTUAL_LOSS: int = 1
+
+    # The graph that's being searched by MCTS. Its root is NodeArena.ROOT.
+    tree: NodeArena
+    _board: BitBoard
+    # The board at the root of the tree. White moves first, on round 0, as in a real game.
+    _init_board: BitBoard = BitBoard(None, 0, GamePhase.PLACEMENT)
 
-    # A reference to the root node in the tree that's being searched by MCTS.
-    tree_root: Node
-    _board: Board
-    _init_board: Board = Board(None, 1, GamePhase.PLACEMENT)
+    # Where the tree is being saved while training, or None.
+    _tree_path: Optional[str] = None
+    # Eviction rewrites too much of the tree to track node by node, so it calls for a full save instead.
+    _needs_full_save: bool = True
+    _next_save_time: float = 0
 
-    def __init__(self, tree_root: Node, start_board: Board = _init_board, seed: int = None):
-        self.tree_root = tree_root
+    def __init__(self, tree: NodeArena, start_board: BitBoard = _init_board, seed: int = None):
+        """
+        Searches the given graph, whose root must be 'start_board' (see .get_position_key()) unless it has no other
+        nodes yet.
+        """
+        self.tree = tree
         self._board = start_board
+        self._init_board = start_board
+
+        root_key: int = MCTSAgent.get_position_key(start_board)
+        if (tree.keys[NodeArena.ROOT] != root_key):
+            if (tree.num_nodes > 1):
+                raise ValueError("The tree was grown from a different position")
+            tree.clear(root_key)
 
         if (seed is not None):
             random.seed(seed)
 
-    def train(self, duration_seconds: int):
+    def train(self, duration_seconds: int, tree_path: str = None):
+        """
+        Runs simulations for the given number of seconds. Each one selects a path down the tree, adds a node to the end
+        of it and then finishes the game with a rollout (see ._roll_out()) that adds no more nodes.
+
+        If 'tree_path' is given, the tree is saved there (see TreeFile) as it goes: in full at the start, then every
+        _SAVE_INTERVAL_SECONDS only the nodes the simulations have changed, and once more at the end. Use
+        TreeFile.load() to resume training from the file later.
+        """
+        self._start_saving(tree_path)
+
         end_time: float = time.time() + duration_seconds
         while (time.time() < end_time):
-            print(self.tree_root.wins, self.tree_root.num_simulations) # TODO Remove
+            self._make_room(MCTSAgent._MIN_FREE_NODES)
+            self._save_if_due()
             self._simulate()
-            self._board = self._init_board
-            # break # TODO Remove
-        print(self.tree_root.wins, self.tree_root.num_simulations)  # TODO Remove
 
-    def _select(self, node: Node, total_num_simulations: int) -> Node:
-        scores: List[Tuple[Node, float]] = []
+        self._finish_saving()
+
+    def search(self, duration_seconds: float):
+        """
+        Runs simulations for the given number of seconds of CPU time (as measured by Misc.Timer), without saving the
+        tree. For searching during a game, where the root is moved on with .advance() after each move.
+        """
+        end_time: float = time.process_time() + duration_seconds
+        # Always run at least one simulation, so that the root has a child to pick.
+        while (True):
+            self._make_room(MCTSAgent._MIN_FREE_NODES)
+            self._simulate()
+            if (time.process_time() >= end_time):
+                break
+
+    def get_best_move(self) -> Optional[int]:
+        """
+        Returns the packed move to the root's most simulated child, or None if the root has no children.
+        """
+        best_move: Optional[int] = None
+        best_num_simulations: int = -1
+        for child, move in self.tree.get_children(NodeArena.ROOT):
+            if (self.tree.num_simulations[child] > best_num_simulations):
+                best_move = move
+                best_num_simulations = self.tree.num_simulations[child]
+
+        return best_move
+
+    def advance(self, move: Optional[int]):
+        """
+        Moves the root of the tree on by the given packed move (None for a forfeited turn). If the new board has a
+        node, it becomes the root and keeps all of its statistics, and the rest of the tree is freed (see
+        NodeArena.promote()). Otherwise the tree starts again from the new board.
+        """
+        next_board: BitBoard
+        if (move is None):
+            next_board = BitBoard.decode(self._init_board.encode())
+            next_board.skip_turn()
+        else:
+            next_board = self._init_board.get_next_board_from_move(move)
+
+        # Looked up by position rather than by move, which also finds the node when the simulations only ever reached
+        # the position by another order of moves.
+        key: int = MCTSAgent.get_position_key(next_board)
+        node: int = self.tree.find(key)
+        if (node == NodeArena.NO_NODE):
+            self.tree.clear(key)
+        else:
+            self.tree.promote(node)
+        self._init_board = next_board
+        self._board = next_board
+
+    def train_root_parallel(self, duration_seconds: int, num_processes: int, tree_path: str = None):
+        """
+        Trains with root parallelisation: each of 'num_processes' worker processes grows its own tree from this
+        tree's root board, and every _MERGE_INTERVAL_SECONDS the simulations and wins each worker has added to the
+        nodes of the top _MERGE_DEPTH levels of its tree are added to the nodes of this tree with the same positions.
+        The workers don't share anything while they run, so the number of simulations per second grows almost
+        linearly with the number of processes. 'tree_path' works as in train().
+        """
+        self._start_saving(tree_path)
+
+        # Each worker keeps its own tree, so it is sent its task over a pipe of its own rather than through a pool,
+        # which could hand two tasks to one worker and none to another.
+        connections: List[Connection] = []
+        processes: List[multiprocessing.Process] = []
+        for _ in range(num_processes):
+            (connection, worker_connection) = multiprocessing.Pipe()
+            process: multiprocessing.Process = multiprocessing.Process(
+                target=_run_root_parallel_worker, args=(worker_connection, self._init_board.encode()), daemon=True)
+            process.start()
+            worker_connection.close()
+            connections.append(connection)
+            processes.append(process)
+
+        try:
+            end_time: float = time.time() + duration_seconds
+            while (time.time() < end_time):
+                duration: float = min(MCTSAgent._MERGE_INTERVAL_SECONDS, end_time - time.time())
+                for connection in connections:
+                    connection.send(duration)
+                for connection in connections:
+                    statistics: Tuple[List[Tuple[int, int, float]], List[Tuple[int, int, int]]] = connection.recv()
+                    self._make_room(len(statistics[1]))
+                    self._merge_statistics(statistics)
+                self._save_if_due()
+        finally:
+            for connection in connections:
+                connection.send(None)
+            for process in processes:
+                process.join()
+
+        self._finish_saving()
+
+    def train_leaf_parallel(self, duration_seconds: int, num_processes: int, tree_path: str = None):
+        """
+        Trains with leaf parallelisation: this process selects and expands a batch of nodes of its one tree, the
+        'num_processes' worker processes play the games out from them, and the results are back-propagated here.
+        Virtual loss (see _VIRTUAL_LOSS) keeps the selections of a batch from all picking the same path. 'tree_path'
+        works as in train().
+        """
+        self._start_saving(tree_path)
+        batch_size: int = num_processes * MCTSAgent._LEAF_BATCH_SIZE_PER_PROCESS
+
+        with multiprocessing.Pool(num_processes, initializer=_init_leaf_parallel_worker) as pool:
+            end_time: float = time.time() + duration_seconds
+            while (time.time() < end_time):
+                # Each selection adds at most one node.
+                self._make_room(max(MCTSAgent._MIN_FREE_NODES, batch_size))
+                self._save_if_due()
+
+                paths: List[List[int]] = []
+                board_encodings: List[Tuple[int, ...]] = []
+                for _ in range(batch_size):
+                    path: List[int] = self._select_leaf()
+                    self._add_virtual_loss(path, MCTSAgent._VIRTUAL_LOSS)
+                    paths.append(path)
+                    board_encodings.append(self._board.encode())
+                self._board = self._init_board
+
+                winners: List[Optional[PlayerColor]] = \
+                    pool.map(_roll_out_board, board_encodings, chunksize=MCTSAgent._LEAF_BATCH_SIZE_PER_PROCESS)
+                for path, winner in zip(paths, winners):
+                    self._add_virtual_loss(path, -MCTSAgent._VIRTUAL_LOSS)
+                    self._back_propagate(path, winner)
+
+        self._finish_saving()
+
+    def get_statistics(self, max_depth: int) -> Tuple[List[Tuple[int, int, float]], List[Tuple[int, int, int]]]:
+        """
+        Returns the statistics of the top 'max_depth' levels of the graph as two lists: a (position key, number of
+        simulations, wins) triple for each node, and a (parent's key, packed move, child's key) triple for each edge,
+        parents before their children. Nodes reached by more than one path are only listed once. The initial
+        simulations and wins every node starts out with (see NodeArena) aren't counted.
+        """
+        nodes: List[Tuple[int, int, float]] = []
+        edges: List[Tuple[int, int, int]] = []
+        depths: Dict[int, int] = {NodeArena.ROOT: 0}
+        # Breadth first, so that every node is listed at the depth of its shortest path.
+        queue: List[int] = [NodeArena.ROOT]
+        for node in queue:
+            nodes.append((self.tree.keys[node], self.tree.num_simulations[node] - NodeArena.INITIAL_NUM_SIMULATIONS,
+                          self.tree.wins[node] - NodeArena.INITIAL_WINS))
+            if (depths[node] < max_depth):
+                for child, move in self.tree.get_children(node):
+                    edges.append((self.tree.keys[node], move, self.tree.keys[child]))
+                    if (child not in depths):
+                        depths[child] = depths[node] + 1
+                        queue.append(child)
+
+        return (nodes, edges)
+
+    def _merge_statistics(self, statistics: Tuple[List[Tuple[int, int, float]], List[Tuple[int, int, int]]]):
+        """
+        Adds the simulations and wins of another graph's nodes (in the form .get_statistics() returns) to the nodes of
+        this graph with the same positions, adding any nodes and edges that it doesn't have yet.
+        """
+        (nodes, edges) = statistics
+        for parent_key, move, key in edges:
+            parent: int = self.tree.find(parent_key)
+            if (parent == NodeArena.NO_NODE):
+                # The graph ran out of room for the parent.
+                continue
+
+            if (all(child_move != move for _, child_move in self.tree.get_children(parent))):
+                self.tree.add_child(parent, move, key)
+
+        for key, num_simulations, wins in nodes:
+            node: int = self.tree.find(key)
+            if (node != NodeArena.NO_NODE):
+                self.tree.num_simulations[node] += num_simulations
+                self.tree.wins[node] += wins
+                if (self.tree.changed_nodes is not None):
+                    self.tree.changed_nodes.add(node)
+
+    def _select_leaf(self) -> List[int]:
+        """
+        Walks down the graph from the root with ._select() until a node is added, the game is finished or the graph is
+        full, and returns the path of nodes taken, starting with the root. ._board is left on the last node's board,
+        which is where the rollout starts.
+        """
+        node: int = NodeArena.ROOT
+        path: List[int] = [node]
+        self._board = self._init_board
+        while (self._board.phase != GamePhase.FINISHED):
+            (child, move) = self._select(node, self.tree.num_simulations[NodeArena.ROOT])
+            if (move is None):
+                # The player has to forfeit the turn, so roll out from the node reached so far.
+                break
+
+            self._board = self._board.get_next_board_from_move(move)
+            if (child == NodeArena.NO_NODE):
+                num_nodes: int = self.tree.num_nodes
+                child = self.tree.add_child(node, move, MCTSAgent.get_position_key(self._board))
+                if (child == NodeArena.NO_NODE):
+                    # The graph is full, so the rollout starts from the board the move leads to.
+                    break
+
+                path.append(child)
+                if (self.tree.num_nodes > num_nodes):
+                    # A new node, which is where the playout starts. Otherwise the move transposed into a node that
+                    # is already in the graph, and the walk goes on from there.
+                    break
+            else:
+                path.append(child)
+            node = child
+
+        return path
+
+    def _add_virtual_loss(self, path: List[int], num_simulations: int):
+        """
+        Adds the given number of simulations, none of them won, to the nodes on the given path.
+        """
+        for node in path:
+            self.tree.num_simulations[node] += num_simulations
+
+    def _make_room(self, num_nodes: int):
+        if (self.tree.get_num_free() < num_nodes):
+            # Make room by dropping the least visited nodes, rather than letting the graph grow without limit.
+            self.tree.evict()
+            self._needs_full_save = True
+
+    def _start_saving(self, tree_path: Optional[str]):
+        self._tree_path = tree_path
+        self.tree.track_changes(tree_path is not None)
+        self._needs_full_save = True
+        self._next_save_time = time.time()
+
+    def _save_if_due(self):
+        if (self._tree_path is not None and (self._needs_full_save or time.time() >= self._next_save_time)):
+            self._save()
+
+    def _finish_saving(self):
+        if (self._tree_path is not None):
+            self._save()
+        self._tree_path = None
+        self.tree.track_changes(False)
+
+    def _save(self):
+        if (self._needs_full_save or not os.path.exists(self._tree_path)):
+            TreeFile.save(self.tree, self._tree_path)
+        else:
+            TreeFile.save_changes(self.tree, self._tree_path, self.tree.changed_nodes, self.tree.changed_edges,
+                                  self.tree.changed_slots)
+        self.tree.track_changes(True)
+        self._needs_full_save = False
+        self._next_save_time = time.time() + MCTSAgent._SAVE_INTERVAL_SECONDS
+
+    def _select(self, node: int, total_num_simulations: int) -> Tuple[int, Optional[int]]:
+        """
+        Picks the move to make from the given node's board, and returns the (child node, packed move) pair for it.
+        The child node is NodeArena.NO_NODE if the move is unexplored, and the pair is (NodeArena.NO_NODE, None) if
+        the player has no moves and has to forfeit the turn.
+        """
+        scores: List[Tuple[int, int, float]] = []
         unexplored_nodes_score: float = Utils.UCB1(1, 2, total_num_simulations, MCTSAgent._EXPLORATION_MULTIPLIER)
-        # A list of all deltas which have already been explored at least once. Therefore, they are nodes.
-        children: List[Node] = node.children
-        # A list of all valid deltas from the given board.
-        deltas: List[Delta] = self._board.get_all_possible_deltas(Utils.get_player(self._board.round_num))
+        # The (child, move) pairs of all moves which have already been explored at least once. Therefore, they are
+        # nodes.
+        children: List[Tuple[int, int]] = list(self.tree.get_children(node))
+        # All valid moves from the given board, packed into ints (see Classes.Move).
+        moves: array = self._board.get_all_possible_moves(MCTSAgent._get_player(self._board))
+        if (len(moves) == 0):
+            # The tree has no way to represent a forfeited turn, so the simulation leaves the tree here.
+            return (NodeArena.NO_NODE, None)
 
         if (len(children) > 0):
-            for child in children:
-                # Since some deltas have already been explored and are therefore included in 'children', remove them
-                # from 'deltas' so that it only contains unexplored moves.
-                deltas.remove(child.delta)
-                scores.append((child, Utils.UCB1(child.wins, child.num_simulations, total_num_simulations,
-                                                 MCTSAgent._EXPLORATION_MULTIPLIER)))
+            # Since some moves have already been explored and are therefore included in 'children', leave them out of
+            # 'moves' so that it only contains unexplored moves.
+            explored_moves: Set[int] = {move for _, move in children}
+            moves = [move for move in moves if move not in explored_moves]
+            for child, move in children:
+                scores.append((child, move, Utils.UCB1(self.tree.wins[child], self.tree.num_simulations[child],
+                                                       total_num_simulations, MCTSAgent._EXPLORATION_MULTIPLIER)))
 
             # Since there are no unexplored options available, we'll set its score to -1 such that the algorithm won't
             # attempt to choose an unexplored option (since there are none).
-            if len(deltas) == 0:
+            if len(moves) == 0:
                 unexplored_nodes_score = -1
 
             # Order by highest scoring nodes.
-            scores = sorted(scores, key=lambda x:x[1], reverse=True)
-            for child, score in scores:
+            scores = sorted(scores, key=lambda x:x[2], reverse=True)
+            for child, move, score in scores:
                 if (score > unexplored_nodes_score):
                     # This is to avoid re-exploring a leaf node that resulted in a win or loss. We want to explore new
                     # options. Otherwise we'd have wasted this simulation or back-propagated the same result twice.
-                    if (self._board.get_next_board(child.delta).phase == GamePhase.FINISHED):
+                    if (self._board.get_next_board_from_move(move).phase == GamePhase.FINISHED):
                         continue
                     else:
-                        return child
+                        return (child, move)
                 else:
                     # We've now reached a (node : score) pair that has a lower score than all the unexplored moves.
                     # Therefore, stop iterating through existing nodes so we can instead select an unexplored move.
                     break
 
-        random_delta: Delta = random.choice(deltas)
-        new_child_node: Node = Node(node, random_delta)
-        node.children.append(new_child_node)
-        return new_child_node
+            if (len(moves) == 0):
+                # Every move has been explored and ends the game, so there is nothing new to explore. Re-visiting the
+                # best of them is all that's left.
+                return (scores[0][0], scores[0][1])
 
-    def _simulate(self):
-        leaf: Node = self._select(self.tree_root, self.tree_root.num_simulations)
-        self._board = self._board.get_next_board(leaf.delta)
-        while (self._board.phase != GamePhase.FINISHED):
-
-            leaf = self._select(leaf, self.tree_root.num_simulations)
-            self._board = self._board.get_next_board(leaf.delta)
-            if (self._board != 1): # TODO Remove this
-                selection = "({}, {}) -> NODE" if leaf.num_simulations > 2 else "({}, {}) -> EXPLORE"
-                print("{:3}: {} : {}".format(self._board.round_num - 1, leaf.delta.player, selection.format(leaf.wins, leaf.num_simulations)))
-                if (leaf.delta.move_origin is not None):
-                    print("{} -> ".format(leaf.delta.move_origin.pos), end="")
-                print("{}".format(leaf.delta.move_target.pos))
+        return (NodeArena.NO_NODE, random.choice(moves))
 
-            print(self._board)
-            print("")
+    def _simulate(self):
+        path: List[int] = self._select_leaf()
+        self._back_propagate(path, MCTSAgent._roll_out(self._board))
 
-        self._back_propagate(leaf, self._board.winner)
+    @staticmethod
+    def _roll_out(board: BitBoard) -> Optional[PlayerColor]:
+        """
+        Plays the game out from the given board with a cheap random policy that favours captures (see
+        _ROLLOUT_CAPTURE_PROBABILITY), and returns the winner, or None for a draw. The game is played on bare masks
+        (see BitBoard.play_out()), so no boards or nodes are created along the way.
+        """
+        return board.play_out(MCTSAgent._get_player(board), MCTSAgent._ROLLOUT_CAPTURE_PROBABILITY)
 
-    def _back_propagate(self, node: Node, winner: PlayerColor):
+    @staticmethod
+    def get_position_key(board: BitBoard) -> int:
         """
-        TODO
-        Can be done recursively, but no point in using a stack. Iteratively
-        is more memory efficient.
-        :param node:
-        :param winner:
-        :return:
+        Returns the key of the given board's node in a graph (see NodeArena): its Zobrist hash, told apart from the
+        same position on other rounds.
         """
+        return board.zobrist_hash ^ (board.round_num * Zobrist.ROUND_KEY & 0xFFFFFFFFFFFFFFFF)
 
-        while (node is not None):
-            node.num_simulations += 1
+    @staticmethod
+    def _get_player(board: BitBoard) -> PlayerColor:
+        """
+        Returns the player whose turn it is on the given board. White moves first, on round 0.
+        """
+        return PlayerColor.WHITE if board.round_num % 2 == 0 else PlayerColor.BLACK
 
-            if ((node.parent is None and node.children[0].delta.player == winner) or
-                    (node.delta is not None and node.delta.player == winner)):
-                node.wins += 1
+    def _back_propagate(self, path: List[int], winner: Optional[PlayerColor]):
+        """
+        Adds the result of a simulation to every node on the path it took. A node can have several parents, but only
+        the ones on the path took part in the simulation, so only they are updated, and every node on the path is
+        updated exactly once.
+        """
+        # A node's wins are those of the player who moved into its position. The players alternate down the path,
+        # since forfeited turns never get nodes, and the root's position was moved into by the player not to move.
+        player: PlayerColor = MCTSAgent._get_player(self._init_board).opposite()
+        for node in path:
+            self.tree.num_simulations[node] += 1
+            if (player == winner):
+                self.tree.wins[node] += 1
             elif (winner is None):
                 # Must have been a tie.
-                node.wins += 0.5
-
-            # TODO Remove this (temp for printing/debugging)
-            # if (node.board.round_num != 1):
-            #     print("{:3}: {}: ".format(node.board.round_num - 1, node.delta.player), end="")
-            #     if (node.delta.move_origin is not None):
-            #         print("{} -> ".format(node.delta.move_origin.pos), end="")
-            #     print("{}".format(node.delta.move_target.pos))
-            #
-            # print(node.board)
-            # print("")
-
-            node = node.parent
\ No newline at end of file
+                self.tree.wins[node] += 0.5
+            player = player.opposite()
+
+        # Every node a simulation adds or links to is on its path, so these are all the nodes it changed.
+        if (self.tree.changed_nodes is not None):
+            self.tree.changed_nodes.update(path)
+
+
+class _RootParallelWorkerAgent(MCTSAgent):
+    """
+    The agent of a train_root_parallel() worker process. It remembers what it last reported of each node (see
+    MCTSAgent.get_statistics()), so that each merge only sends what was added since the last one.
+    """
+
+    # The (number of simulations, wins) last reported of each node, by position key.
+    _reported: Dict[int, Tuple[int, float]]
+
+    def __init__(self, board: BitBoard):
+        super().__init__(NodeArena(MCTSAgent._WORKER_TREE_MEGABYTES), board)
+        self._reported = {}
+
+    def grow(self, duration_seconds: float) -> Tuple[List[Tuple[int, int, float]], List[Tuple[int, int, int]]]:
+        """
+        Trains the tree for the given number of seconds, and returns the simulations and wins added to each of its top
+        nodes since the last call, with the edges into those nodes, in the form MCTSAgent.get_statistics() returns.
+        """
+        self.train(duration_seconds)
+
+        (nodes, edges) = self.get_statistics(MCTSAgent._MERGE_DEPTH)
+        new_nodes: List[Tuple[int, int, float]] = []
+        for key, num_simulations, wins in nodes:
+            (reported_num_simulations, reported_wins) = self._reported.get(key, (0, 0.0))
+            if (num_simulations > reported_num_simulations):
+                new_nodes.append((key, num_simulations - reported_num_simulations, wins - reported_wins))
+                self._reported[key] = (num_simulations, wins)
+
+        # The main tree may have evicted the nodes since they were last sent, so their edges go with them every time.
+        new_keys: Set[int] = {key for key, _, _ in new_nodes}
+        new_edges: List[Tuple[int, int, int]] = [edge for edge in edges if edge[2] in new_keys]
+
+        return (new_nodes, new_edges)
+
+    def _make_room(self, num_nodes: int):
+        num_evicted: int = self.tree.num_evicted
+        super()._make_room(num_nodes)
+        if (self.tree.num_evicted != num_evicted):
+            # Nodes evicted now may be added again before the next merge, and everything they hold then is new, so
+            # what was reported of them is forgotten while they can still be told apart.
+            for key in [key for key in self._reported if self.tree.find(key) == NodeArena.NO_NODE]:
+                del self._reported[key]
+
+
+def _run_root_parallel_worker(connection: Connection, board_encoding: Tuple[int, ...]):
+    """
+    The loop of a train_root_parallel() worker process: grows a tree rooted at the given board (encoded with
+    BitBoard.encode()) for each duration received, sending back what it added (see _RootParallelWorkerAgent.grow()),
+    until it receives None.
+    """
+    # Forked workers start with the parent's random state, which would have them all grow the same tree.
+    random.seed()
+    agent: _RootParallelWorkerAgent = _RootParallelWorkerAgent(BitBoard.decode(board_encoding))
+    while (True):
+        duration_seconds: Optional[float] = connection.recv()
+        if (duration_seconds is None):
+            return
+        connection.send(agent.grow(duration_seconds))
+
+
+def _init_leaf_parallel_worker():
+    """
+    Sets up a train_leaf_parallel() worker process.
+    """
+    # Forked workers start with the parent's random state, which would have them all play the same games.
+    random.seed()
+
+
+def _roll_out_board(board_encoding: Tuple[int, ...]) -> Optional[PlayerColor]:
+    """
+    Does MCTSAgent._roll_out() from the given board (encoded with BitBoard.encode()).
+    """
+    return MCTSAgent._roll_out(BitBoard.decode(board_encoding))
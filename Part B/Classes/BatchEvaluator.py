@@ -0,0 +1,158 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from Enums.PlayerColor import PlayerColor
+from Misc.BoardTables import NUM_COLS, NUM_ROWS, NUM_SQUARES, DIRECTIONS, \
+    DISTANCES, CENTRE_DISTANCES_DOUBLED
+
+
+class BatchEvaluator():
+    """
+    A class designed not to be instantiated. Rates many boards at once with
+    NumPy array operations, rather than one board at a time in Python.
+
+    Boards are given as a (K, 8, 8) int8 array, indexed by [board, y, x], where
+    each square holds one of the square values below. The features and scores
+    it returns are the same as BitBoard.get_features() and the players'
+    get_heuristic_value() would give for each board.
+    """
+
+    # The values a square can hold in an encoded board.
+    EMPTY: int = 0
+    WHITE: int = 1
+    BLACK: int = 2
+    CORNER: int = 3
+    ELIMINATED: int = 4
+
+    _NUM_FEATURES: int = 8
+    # The width of the border of off-board squares added around each board
+    # when counting mobility, which looks up to two squares away.
+    _PADDING: int = 2
+    # Heuristic score decimal place rounding. Must match the players'.
+    _RATING_NUM_ROUNDING: int = 10
+
+    _BIT_SHIFTS: np.ndarray = np.arange(NUM_SQUARES, dtype=np.uint64)
+    # (64, 64) matrix of the distances between every pair of squares.
+    _DISTANCES: np.ndarray = np.array(DISTANCES, dtype=np.float64)
+    # The distance of every square from the centre.
+    _CENTRE_DISTANCES: np.ndarray = \
+        np.array(CENTRE_DISTANCES_DOUBLED, dtype=np.float64) / 2
+
+    @staticmethod
+    def encode(board_encodings: Sequence[Tuple[int, ...]]) -> np.ndarray:
+        """
+        Turns a list of BitBoard.encode() encodings into a (K, 8, 8) int8
+        array of boards.
+        """
+        masks: np.ndarray = np.array(
+            [board_encoding[:4] for board_encoding in board_encodings],
+            dtype=np.uint64).reshape(-1, 4)
+        bits: np.ndarray = \
+            (masks[:, :, None] >> BatchEvaluator._BIT_SHIFTS) & np.uint64(1)
+
+        # The masks are in the order white, black, corners, eliminated, which
+        # matches the order of the square values.
+        square_values: np.ndarray = np.arange(1, 5, dtype=np.uint64)
+        boards: np.ndarray = (bits * square_values[None, :, None]).sum(axis=1)
+
+        return boards.astype(np.int8).reshape(-1, NUM_ROWS, NUM_COLS)
+
+    @staticmethod
+    def get_features(boards: np.ndarray, player: PlayerColor) -> np.ndarray:
+        """
+        Returns a (K, 8) array of the eight heuristic features of each board,
+        from the point of view of the given player. The features are in the
+        same order as BitBoard.get_features().
+        """
+        own_value: int = BatchEvaluator.WHITE
+        opponent_value: int = BatchEvaluator.BLACK
+        if (player == PlayerColor.BLACK):
+            (own_value, opponent_value) = (opponent_value, own_value)
+
+        own: np.ndarray = boards == own_value
+        opponent: np.ndarray = boards == opponent_value
+        padding: Tuple[Tuple[int, int], ...] = \
+            ((0, 0),) + ((BatchEvaluator._PADDING, BatchEvaluator._PADDING),) * 2
+        empty: np.ndarray = \
+            np.pad(boards == BatchEvaluator.EMPTY, padding)
+        occupied: np.ndarray = np.pad(own | opponent, padding)
+
+        num_boards: int = boards.shape[0]
+        own_flat: np.ndarray = own.reshape(num_boards, -1).astype(np.float64)
+        opponent_flat: np.ndarray = \
+            opponent.reshape(num_boards, -1).astype(np.float64)
+        num_own_pieces: np.ndarray = own_flat.sum(axis=1)
+        num_opponent_pieces: np.ndarray = opponent_flat.sum(axis=1)
+
+        features: np.ndarray = \
+            np.empty((num_boards, BatchEvaluator._NUM_FEATURES))
+        features[:, 0] = num_own_pieces
+        features[:, 1] = num_opponent_pieces
+        features[:, 2] = BatchEvaluator._get_mobility(own, occupied, empty)
+        features[:, 3] = \
+            BatchEvaluator._get_mobility(opponent, occupied, empty)
+        features[:, 4] = BatchEvaluator._get_pair_distance_sums(own_flat) \
+            / (num_own_pieces + 1)
+        features[:, 5] = \
+            BatchEvaluator._get_pair_distance_sums(opponent_flat) \
+            / (num_opponent_pieces + 1)
+        features[:, 6] = own_flat @ BatchEvaluator._CENTRE_DISTANCES \
+            / (num_own_pieces + 1)
+        features[:, 7] = opponent_flat @ BatchEvaluator._CENTRE_DISTANCES \
+            / (num_opponent_pieces + 1)
+
+        return features
+
+    @staticmethod
+    def get_scores(boards: np.ndarray, player: PlayerColor,
+                   weights: Sequence[float]) -> np.ndarray:
+        """
+        Returns a (K,) array of the heuristic score of each board, rated for the
+        given player with the given eight feature weights. Like the players'
+        get_heuristic_value(), scores are from white's point of view.
+        """
+        scores: np.ndarray = np.round(
+            BatchEvaluator.get_features(boards, player)
+            @ np.asarray(weights, dtype=np.float64),
+            BatchEvaluator._RATING_NUM_ROUNDING)
+
+        return scores if player == PlayerColor.WHITE else -scores
+
+    @staticmethod
+    def _get_mobility(pieces: np.ndarray, occupied: np.ndarray,
+                      empty: np.ndarray) -> np.ndarray:
+        """
+        Returns the number of moves the given pieces can make on each board,
+        counted the same way as BitBoard.get_num_moves(). 'occupied' and
+        'empty' must be padded with a border of two False squares, so that
+        squares off the board can be looked up with plain slices.
+        """
+        pad: int = BatchEvaluator._PADDING
+        (height, width) = pieces.shape[1:]
+        mobility: np.ndarray = np.zeros(pieces.shape[0], dtype=np.int64)
+        for dx, dy in DIRECTIONS:
+            # Moves onto the adjacent square, and jumps over an occupied
+            # adjacent square onto the square behind it.
+            adjacent_empty: np.ndarray = \
+                empty[:, pad + dy:pad + dy + height, pad + dx:pad + dx + width]
+            adjacent_occupied: np.ndarray = \
+                occupied[:, pad + dy:pad + dy + height,
+                         pad + dx:pad + dx + width]
+            opposite_empty: np.ndarray = \
+                empty[:, pad + 2 * dy:pad + 2 * dy + height,
+                      pad + 2 * dx:pad + 2 * dx + width]
+            mobility += (pieces & (adjacent_empty
+                                   | (adjacent_occupied & opposite_empty))) \
+                .sum(axis=(1, 2))
+
+        return mobility
+
+    @staticmethod
+    def _get_pair_distance_sums(pieces: np.ndarray) -> np.ndarray:
+        """
+        Given a (K, 64) array of 0s and 1s marking pieces, returns the sum of
+        the distances between every pair of pieces on each board.
+        """
+        # Every pair is counted twice by the product, so halve it.
+        return ((pieces @ BatchEvaluator._DISTANCES) * pieces).sum(axis=1) / 2
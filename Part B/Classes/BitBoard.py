@@ -0,0 +1,974 @@
+import random
+from array import array
+from typing import List, Dict, Tuple, Optional, Union
+
+from Classes.Delta import Delta
+from Classes.Move import Move
+from Classes.Piece import Piece
+from Classes.Pos2D import Pos2D
+from Classes.Square import Square
+from Enums.GamePhase import GamePhase
+from Enums.PlayerColor import PlayerColor
+from Enums.SquareState import SquareState
+from Misc.BoardTables import NUM_COLS, NUM_ROWS, NUM_SQUARES, POSITIONS, \
+    NEIGHBOURS, AXES, CAPTURES, DIRECTIONS, DISTANCES, \
+    CENTRE_DISTANCES_DOUBLED, get_index
+from Misc import Zobrist
+
+
+# Bit i of a mask is set when the square with index i (see Misc.BoardTables)
+# is part of the set.
+_FULL_MASK: int = (1 << NUM_SQUARES) - 1
+# Masks that are used to stop horizontal shifts from wrapping around onto the
+# next/previous row.
+_NOT_FIRST_COL: int = sum(1 << (row_i * NUM_COLS + col_i)
+                          for row_i in range(NUM_ROWS)
+                          for col_i in range(1, NUM_COLS))
+_NOT_LAST_COL: int = sum(1 << (row_i * NUM_COLS + col_i)
+                         for row_i in range(NUM_ROWS)
+                         for col_i in range(NUM_COLS - 1))
+
+_INITIAL_CORNERS: int = ((1 << 0) | (1 << (NUM_COLS - 1))
+                         | (1 << (NUM_SQUARES - NUM_COLS))
+                         | (1 << (NUM_SQUARES - 1)))
+
+# Squares that each player is allowed to place pieces on. White may place on
+# rows 0 - 5 and black may place on rows 2 - 7.
+_WHITE_PLACEMENT_ZONE: int = (1 << (NUM_COLS * (NUM_ROWS - 2))) - 1
+_BLACK_PLACEMENT_ZONE: int = _FULL_MASK & ~((1 << (NUM_COLS * 2)) - 1)
+
+# The (eliminated squares, new corner indices) of each death zone, in the
+# order that the referee applies them.
+_DEATH_ZONES: Tuple[Tuple[int, Tuple[int, ...]], ...]
+
+
+def _build_death_zones() -> Tuple[Tuple[int, Tuple[int, ...]], ...]:
+    death_zones: List[Tuple[int, Tuple[int, ...]]] = []
+    for shrink_i in range(2):
+        low: int = shrink_i
+        high: int = NUM_COLS - 1 - shrink_i
+        ring: int = 0
+        for i in range(low, high + 1):
+            for x, y in ((i, low), (low, i), (i, high), (high, i)):
+                ring |= 1 << (y * NUM_COLS + x)
+
+        low, high = low + 1, high - 1
+        new_corners: Tuple[int, ...] = tuple(
+            y * NUM_COLS + x
+            for x, y in ((low, low), (low, high), (high, high), (high, low)))
+        death_zones.append((ring, new_corners))
+
+    return tuple(death_zones)
+
+
+_DEATH_ZONES = _build_death_zones()
+
+if (hasattr(int, "bit_count")):
+    _popcount = int.bit_count
+else:
+    def _popcount(mask: int) -> int:
+        return bin(mask).count("1")
+
+
+def _iter_indices(mask: int):
+    """
+    Yields the index of every set bit in the given mask, lowest first.
+    """
+    while (mask):
+        low_bit: int = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def _shift(mask: int, dx: int, dy: int) -> int:
+    """
+    Shifts every square in the mask by (dx, dy), dropping any that fall off the
+    board.
+    """
+    if (dx == 1):
+        mask = (mask << 1) & _NOT_FIRST_COL
+    elif (dx == -1):
+        mask = (mask >> 1) & _NOT_LAST_COL
+    elif (dy == 1):
+        mask = (mask << NUM_COLS) & _FULL_MASK
+    elif (dy == -1):
+        mask = mask >> NUM_COLS
+
+    return mask
+
+
+class BitBoard():
+    """
+    An alternative to Board that stores the position as four 64-bit masks
+    rather than a dictionary of Square objects. It exposes the same public
+    methods as Board (and accepts and produces the same Delta objects), so the
+    agents can use either engine interchangeably.
+
+    Searches can also use moves packed into ints (see Classes.Move) instead of
+    Deltas, through .get_all_possible_moves(), .apply_move() and .undo_move().
+    """
+
+    MOVING_PHASE_ROUND_START = 24
+
+    _DEATH_ZONE_ROUNDS: List[int] = [151, 215]
+
+    # The minimum number of pieces a player can have on the board before they
+    # lose.
+    _MIN_NUM_PIECES_BEFORE_LOSS = 2
+
+    # Masks of the squares that hold white pieces, black pieces, corners and
+    # eliminated (out of play) squares respectively.
+    white: int
+    black: int
+    corners: int
+    eliminated: int
+    # round_num is not the turn number. e.g. after each player has had a turn,
+    # then round_num == 3.
+    round_num: int
+    # An enum used to indicate the current phase of the game.
+    phase: GamePhase
+    # Equals None while the game isn't done. If phase == FINISHED and winner is
+    # None, that the game was a tie.
+    winner: PlayerColor
+    # The Zobrist hash of the board (see Misc/Zobrist.py). Matches the hash a
+    # Board representing the same position would have.
+    zobrist_hash: int
+    # Running totals used by .get_features(), kept up to date by each move
+    # rather than recalculated for every evaluation. Holds the sum of the
+    # distances between every pair of white pieces, the same for black, then
+    # the sum of the (doubled) distances of the white and black pieces from the
+    # centre.
+    _feature_sums: Tuple[int, int, int, int]
+    # One entry per delta (or packed move) applied with .apply() (or
+    # .apply_move()) that hasn't been undone yet, holding the delta and the
+    # masks, round number, phase, winner, hash and feature sums from before it
+    # was applied.
+    _undo_stack: List[Tuple[Union[Delta, int], int, int, int, int, int,
+                            GamePhase, PlayerColor, int,
+                            Tuple[int, int, int, int]]]
+
+    def __init__(self, masks: Optional[Tuple[int, int, int, int]],
+                 round_num: int, phase: GamePhase, winner: PlayerColor = None,
+                 zobrist_hash: Optional[int] = None,
+                 feature_sums: Optional[Tuple[int, int, int, int]] = None):
+        if (masks is None):
+            masks = (0, 0, _INITIAL_CORNERS, 0)
+
+        (self.white, self.black, self.corners, self.eliminated) = masks
+        self.round_num = round_num
+        self.phase = phase
+        self.winner = winner
+        self._undo_stack = []
+
+        if (zobrist_hash is None):
+            self.zobrist_hash = self._compute_hash()
+        else:
+            self.zobrist_hash = zobrist_hash
+
+        if (feature_sums is None):
+            self._feature_sums = self._compute_feature_sums()
+        else:
+            self._feature_sums = feature_sums
+
+    def get_num_moves(self, player: PlayerColor) -> int:
+        """
+        This method takes a player and returns the number of possible moves that
+        they can take.
+        """
+        own: int = self._get_player_mask(player)
+        occupied: int = self.white | self.black
+        empty: int = self._get_empty_mask()
+
+        count: int = 0
+        for dx, dy in DIRECTIONS:
+            adjacent: int = _shift(own, dx, dy)
+            count += _popcount(adjacent & empty)
+            count += _popcount(_shift(adjacent & occupied, dx, dy) & empty)
+
+        return count
+
+    def get_possible_placements(self, player: PlayerColor) -> List[Delta]:
+        """
+        Returns a list of all the placements the given player can make.
+        """
+        zone: int = _WHITE_PLACEMENT_ZONE if player == PlayerColor.WHITE \
+            else _BLACK_PLACEMENT_ZONE
+
+        return [self._create_delta(player, None, target)
+                for target in _iter_indices(zone & self._get_empty_mask())]
+
+    def is_suicide(self, delta: Delta) -> bool:
+        """
+        Checks if a move will result in death during placement phase. Mirrors
+        Board.is_suicide.
+        """
+        return self._is_suicide(delta.player, get_index(delta.move_target.pos))
+
+    def is_suicide_move(self, move: int) -> bool:
+        """
+        Does the same as .is_suicide(), for a packed move.
+        """
+        return self._is_suicide(Move.get_player(move), Move.get_target(move))
+
+    def _is_suicide(self, player: PlayerColor, target: int) -> bool:
+        opponent: int = self._get_player_mask(player.opposite())
+        own: int = self._get_player_mask(player)
+
+        for adjacent, opposite in NEIGHBOURS[target]:
+            # Don't place next to corners.
+            if (self.corners >> adjacent & 1):
+                return True
+
+            if (opponent >> adjacent & 1):
+                # Enemy is on edge, we're away from edge. That's suicide.
+                if (opposite is None):
+                    return True
+
+                # If the opposite piece is not our own then it's a suicide.
+                if ((opponent | own) >> opposite & 1
+                        and not own >> opposite & 1):
+                    return True
+
+        return False
+
+    def get_possible_moves(self, pos: Pos2D) -> List[Delta]:
+        """
+        Given a position on the board, returns a list of possible moves (or
+        'deltas') from that position.
+        """
+        origin: int = get_index(pos)
+        player: PlayerColor = PlayerColor.WHITE if self.white >> origin & 1 \
+            else PlayerColor.BLACK
+
+        return [self._create_delta(player, origin, target)
+                for target in self._get_move_targets(origin)]
+
+    def get_all_possible_deltas(self, player: PlayerColor) -> List[Delta]:
+        """
+        Returns a list of all possible moves for a given player.
+        """
+
+        if (self.phase == GamePhase.PLACEMENT):
+            return self.get_possible_placements(player)
+
+        if (self.phase == GamePhase.MOVEMENT):
+            valid_moves: List[Delta] = []
+            for origin in _iter_indices(self._get_player_mask(player)):
+                for target in self._get_move_targets(origin):
+                    valid_moves.append(
+                        self._create_delta(player, origin, target))
+
+            return valid_moves
+
+        assert (self.phase == GamePhase.FINISHED)
+
+        # We shouldn't get this far, see Board.get_all_possible_deltas. Assume
+        # we're still in movement phase and try again.
+        print("WARNING: I think the game is finished but "
+              "get_all_possible_deltas was called anyway! I'll try my best to "
+              "continue.")
+        self.phase = GamePhase.MOVEMENT
+        return self.get_all_possible_deltas(player)
+
+    def get_all_possible_moves(self, player: PlayerColor) -> array:
+        """
+        Does the same as .get_all_possible_deltas(), but returns the moves
+        packed into ints (see Classes.Move), in an array('I'). This is much
+        cheaper, since no Delta or Square objects are created.
+        """
+        moves: array = array('I')
+        if (self.phase == GamePhase.PLACEMENT):
+            zone: int = _WHITE_PLACEMENT_ZONE \
+                if player == PlayerColor.WHITE else _BLACK_PLACEMENT_ZONE
+            for target in _iter_indices(zone & self._get_empty_mask()):
+                moves.append(self._create_move(player, None, target))
+
+            return moves
+
+        if (self.phase == GamePhase.MOVEMENT):
+            for origin in _iter_indices(self._get_player_mask(player)):
+                for target in self._get_move_targets(origin):
+                    moves.append(self._create_move(player, origin, target))
+
+            return moves
+
+        assert (self.phase == GamePhase.FINISHED)
+
+        # See .get_all_possible_deltas().
+        print("WARNING: I think the game is finished but "
+              "get_all_possible_moves was called anyway! I'll try my best to "
+              "continue.")
+        self.phase = GamePhase.MOVEMENT
+        return self.get_all_possible_moves(player)
+
+    def get_delta(self, move: int) -> Delta:
+        """
+        Returns the Delta for the given packed move, which must be one that
+        can be made on the calling instance.
+        """
+        return self._create_delta(Move.get_player(move), Move.get_origin(move),
+                                   Move.get_target(move))
+
+    def get_move(self, delta: Delta) -> int:
+        """
+        Returns the given delta, made on the calling instance, as a packed
+        move.
+        """
+        origin: Optional[int] = None
+        if (delta.move_origin is not None):
+            origin = get_index(delta.move_origin.pos)
+
+        return self._create_move(delta.player, origin,
+                                 get_index(delta.move_target.pos))
+
+    def get_next_board(self, delta: Delta) -> 'BitBoard':
+        """
+        This method takes a delta and uses it to create a new board from the
+        calling instance. Only the origin and target positions of the delta are
+        used; kills, eliminations and new corners are worked out from the
+        masks.
+        """
+        origin: Optional[int] = None
+        if (delta.move_origin is not None):
+            origin = get_index(delta.move_origin.pos)
+        target: int = get_index(delta.move_target.pos)
+
+        # Sanity checks to ensure we're calling the method correctly.
+        assert (self._get_empty_mask() >> target & 1)
+        if (origin is not None):
+            assert (self._get_player_mask(delta.player) >> origin & 1)
+
+        next_board: BitBoard = BitBoard(
+            (self.white, self.black, self.corners, self.eliminated),
+            self.round_num, self.phase, self.winner, self.zobrist_hash,
+            self._feature_sums)
+        next_board._make_move(delta.player, origin, target)
+
+        return next_board
+
+    def apply(self, delta: Delta):
+        """
+        Makes the given delta's move on the calling instance itself. The
+        previous state is pushed onto the undo stack so that the move can be
+        reverted with .undo().
+        """
+        origin: Optional[int] = None
+        if (delta.move_origin is not None):
+            origin = get_index(delta.move_origin.pos)
+        target: int = get_index(delta.move_target.pos)
+
+        # Sanity checks to ensure we're calling the method correctly.
+        assert (self._get_empty_mask() >> target & 1)
+        if (origin is not None):
+            assert (self._get_player_mask(delta.player) >> origin & 1)
+
+        self._push_undo_entry(delta)
+        self._make_move(delta.player, origin, target)
+
+    def undo(self, delta: Delta):
+        """
+        Reverts the most recent delta made with .apply(), which must be the
+        given delta.
+        """
+        assert (self._pop_undo_entry() is delta)
+
+    def get_next_board_from_move(self, move: int) -> 'BitBoard':
+        """
+        Does the same as .get_next_board(), for a packed move.
+        """
+        next_board: BitBoard = BitBoard(
+            (self.white, self.black, self.corners, self.eliminated),
+            self.round_num, self.phase, self.winner, self.zobrist_hash,
+            self._feature_sums)
+        next_board._make_move(Move.get_player(move), Move.get_origin(move),
+                              Move.get_target(move))
+
+        return next_board
+
+    def apply_move(self, move: int):
+        """
+        Does the same as .apply(), for a packed move. Revert it with
+        .undo_move().
+        """
+        self._push_undo_entry(move)
+        self._make_move(Move.get_player(move), Move.get_origin(move),
+                        Move.get_target(move))
+
+    def undo_move(self, move: int):
+        """
+        Reverts the most recent move made with .apply_move(), which must be
+        the given move.
+        """
+        assert (self._pop_undo_entry() == move)
+
+    def _push_undo_entry(self, applied: Union[Delta, int]):
+        self._undo_stack.append((applied, self.white, self.black, self.corners,
+                                 self.eliminated, self.round_num, self.phase,
+                                 self.winner, self.zobrist_hash,
+                                 self._feature_sums))
+
+    def _pop_undo_entry(self) -> Union[Delta, int]:
+        """
+        Restores the state from before the most recently applied delta or move,
+        and returns that delta or move.
+        """
+        (applied, self.white, self.black, self.corners, self.eliminated,
+         self.round_num, self.phase, self.winner, self.zobrist_hash,
+         self._feature_sums) = self._undo_stack.pop()
+
+        return applied
+
+    def skip_turn(self):
+        """
+        Moves the board onto the next round without a move being made, for
+        when a player has no moves and forfeits their turn.
+        """
+        self.zobrist_hash ^= self._get_state_key()
+        self.round_num += 1
+        self._update_game_phase()
+        self.zobrist_hash ^= self._get_state_key()
+
+    def play_out(self, player: PlayerColor,
+                 capture_probability: float) -> Optional[PlayerColor]:
+        """
+        Plays the game out from the position with random moves, 'player'
+        moving first, and returns the winner (None for a draw). With the given
+        probability, each move is picked from just the moves that capture, if
+        there are any. Made for MCTS rollouts: the game is played on local
+        copies of the masks, which leaves the calling instance as it is, and
+        nothing a rollout doesn't need (the hash, the feature sums, undo
+        entries, Deltas or packed moves) is kept up to date.
+        """
+        (white, black, corners, eliminated) = \
+            (self.white, self.black, self.corners, self.eliminated)
+        round_num: int = self.round_num
+        phase: GamePhase = self.phase
+        winner: Optional[PlayerColor] = self.winner
+
+        while (phase != GamePhase.FINISHED):
+            (own, opponent) = (white, black) if player == PlayerColor.WHITE \
+                else (black, white)
+            empty: int = \
+                _FULL_MASK & ~(white | black | corners | eliminated)
+            # The squares that a piece can move to to capture: those with an
+            # enemy piece next to them and an allied piece or corner beyond
+            # it. This ignores that a moving piece can't capture with itself,
+            # which is close enough for picking moves.
+            anchors: int = own | corners
+            capture_targets: int = 0
+            for dx, dy in DIRECTIONS:
+                capture_targets |= (_shift(opponent, -dx, -dy)
+                                    & _shift(_shift(anchors, -dx, -dy),
+                                             -dx, -dy))
+            is_capture_preferred: bool = random.random() < capture_probability
+
+            # Each move is an (origin, target) pair.
+            moves: List[Tuple[Optional[int], int]]
+            captures: List[Tuple[Optional[int], int]]
+            if (phase == GamePhase.PLACEMENT):
+                targets: int = empty & (_WHITE_PLACEMENT_ZONE
+                                        if player == PlayerColor.WHITE
+                                        else _BLACK_PLACEMENT_ZONE)
+                moves = [(None, target) for target in _iter_indices(targets)]
+                captures = [(None, target) for target in
+                            _iter_indices(targets & capture_targets)]
+            else:
+                occupied: int = white | black
+                moves = []
+                captures = []
+                for origin in _iter_indices(own):
+                    for adjacent, opposite in NEIGHBOURS[origin]:
+                        if (empty >> adjacent & 1):
+                            target = adjacent
+                        elif (occupied >> adjacent & 1
+                              and opposite is not None
+                              and empty >> opposite & 1):
+                            target = opposite
+                        else:
+                            continue
+
+                        moves.append((origin, target))
+                        if (capture_targets >> target & 1):
+                            captures.append((origin, target))
+
+            if (len(moves) > 0):
+                if (is_capture_preferred and len(captures) > 0):
+                    moves = captures
+                (origin, target) = random.choice(moves)
+                (white, black, corners, eliminated) = \
+                    BitBoard._get_masks_after_move(
+                        white, black, corners, eliminated,
+                        BitBoard._get_shrink_index(round_num, phase), player,
+                        origin, target)
+            # Otherwise the player has no moves and forfeits their turn.
+
+            round_num += 1
+            (phase, winner) = \
+                BitBoard._get_phase(white, black, round_num, phase, winner)
+            player = player.opposite()
+
+        return winner
+
+    def _make_move(self, player: PlayerColor, origin: Optional[int],
+                   target: int):
+        """
+        Changes the calling instance's masks to reflect the given move and moves
+        the game onto the next round. zobrist_hash is updated using only the
+        squares whose contents changed, and so are the feature sums.
+        """
+        (white, black, corners, eliminated) = \
+            self._get_resulting_masks(player, origin, target)
+
+        (white_allied_distance, black_allied_distance, white_centre_distance,
+         black_centre_distance) = self._feature_sums
+        self._feature_sums = (
+            BitBoard._update_allied_distance(white_allied_distance,
+                                             self.white, white),
+            BitBoard._update_allied_distance(black_allied_distance,
+                                             self.black, black),
+            BitBoard._update_centre_distance(white_centre_distance,
+                                             self.white, white),
+            BitBoard._update_centre_distance(black_centre_distance,
+                                             self.black, black))
+
+        zobrist_hash: int = self.zobrist_hash
+        white_keys: Tuple[int, ...] = \
+            Zobrist.PIECE_KEYS[PlayerColor.WHITE.value]
+        black_keys: Tuple[int, ...] = \
+            Zobrist.PIECE_KEYS[PlayerColor.BLACK.value]
+        for i in _iter_indices(self.white ^ white):
+            zobrist_hash ^= white_keys[i]
+        for i in _iter_indices(self.black ^ black):
+            zobrist_hash ^= black_keys[i]
+        for i in _iter_indices(self.corners ^ corners):
+            zobrist_hash ^= Zobrist.CORNER_KEYS[i]
+        for i in _iter_indices(self.eliminated ^ eliminated):
+            zobrist_hash ^= Zobrist.ELIMINATED_KEYS[i]
+
+        (self.white, self.black, self.corners, self.eliminated) = \
+            (white, black, corners, eliminated)
+        self.zobrist_hash = zobrist_hash
+        self.skip_turn()
+
+    def _compute_hash(self) -> int:
+        """
+        Calculates the Zobrist hash of the calling instance from scratch.
+        """
+        zobrist_hash: int = self._get_state_key()
+        for i in _iter_indices(self.white):
+            zobrist_hash ^= Zobrist.PIECE_KEYS[PlayerColor.WHITE.value][i]
+        for i in _iter_indices(self.black):
+            zobrist_hash ^= Zobrist.PIECE_KEYS[PlayerColor.BLACK.value][i]
+        for i in _iter_indices(self.corners):
+            zobrist_hash ^= Zobrist.CORNER_KEYS[i]
+        for i in _iter_indices(self.eliminated):
+            zobrist_hash ^= Zobrist.ELIMINATED_KEYS[i]
+
+        return zobrist_hash
+
+    def _compute_feature_sums(self) -> Tuple[int, int, int, int]:
+        """
+        Calculates the feature sums of the calling instance from scratch.
+        """
+        return (BitBoard._update_allied_distance(0, 0, self.white),
+                BitBoard._update_allied_distance(0, 0, self.black),
+                BitBoard._update_centre_distance(0, 0, self.white),
+                BitBoard._update_centre_distance(0, 0, self.black))
+
+    def get_features(self, player: PlayerColor) -> Tuple[float, ...]:
+        """
+        Returns the eight features that the heuristics rate a board with, from
+        the point of view of the given player: the number of pieces, mobility,
+        average distance between allied pieces (relative to the number of
+        pieces) and average distance from the centre, first for the given
+        player and then for their opponent. Everything but mobility is read
+        from running totals, so this is cheap.
+        """
+        opponent: PlayerColor = player.opposite()
+        num_own_pieces: int = self.get_num_pieces(player)
+        num_opponent_pieces: int = self.get_num_pieces(opponent)
+
+        (white_allied_distance, black_allied_distance, white_centre_distance,
+         black_centre_distance) = self._feature_sums
+        own_allied_distance: int = white_allied_distance
+        opponent_allied_distance: int = black_allied_distance
+        own_centre_distance: int = white_centre_distance
+        opponent_centre_distance: int = black_centre_distance
+        if (player == PlayerColor.BLACK):
+            (own_allied_distance, opponent_allied_distance) = \
+                (opponent_allied_distance, own_allied_distance)
+            (own_centre_distance, opponent_centre_distance) = \
+                (opponent_centre_distance, own_centre_distance)
+
+        return (num_own_pieces,
+                num_opponent_pieces,
+                self.get_num_moves(player),
+                self.get_num_moves(opponent),
+                own_allied_distance / (num_own_pieces + 1),
+                opponent_allied_distance / (num_opponent_pieces + 1),
+                own_centre_distance / 2 / (num_own_pieces + 1),
+                opponent_centre_distance / 2 / (num_opponent_pieces + 1))
+
+    def _get_state_key(self) -> int:
+        return Zobrist.get_state_key(self.round_num, self.phase,
+                                     BitBoard._DEATH_ZONE_ROUNDS)
+
+    def get_player_squares(self, player: PlayerColor) -> List[Square]:
+        """
+        Returns a list of all squares that have a piece on them that is
+        controlled by the given player.
+        """
+        return [Square(POSITIONS[i], Piece(player), SquareState.OCCUPIED)
+                for i in _iter_indices(self._get_player_mask(player))]
+
+    def _get_player_squares(self, player: PlayerColor) -> List[Square]:
+        return self.get_player_squares(player)
+
+    def get_num_pieces(self, player: PlayerColor) -> int:
+        """
+        Returns the number of pieces the given player has on the board.
+        """
+        return _popcount(self._get_player_mask(player))
+
+    def _update_game_phase(self):
+        """
+        Checks the current state of the game and the board to determine if the
+        game phase should change (and then makes that change).
+        """
+        (self.phase, self.winner) = BitBoard._get_phase(
+            self.white, self.black, self.round_num, self.phase, self.winner)
+
+    @staticmethod
+    def _get_phase(white: int, black: int, round_num: int, phase: GamePhase,
+                   winner: Optional[PlayerColor]) \
+            -> Tuple[GamePhase, Optional[PlayerColor]]:
+        """
+        Returns the (phase, winner) of a game that was in the given phase with
+        the given winner, now that it has reached 'round_num' with the given
+        masks.
+        """
+        if (round_num == BitBoard.MOVING_PHASE_ROUND_START):
+            phase = GamePhase.MOVEMENT
+
+        if (phase == GamePhase.PLACEMENT):
+            # Neither player can lose due to a lack of pieces on the board
+            # during the placement phase.
+            return (phase, winner)
+
+        white_lost: bool = \
+            _popcount(white) < BitBoard._MIN_NUM_PIECES_BEFORE_LOSS
+        black_lost: bool = \
+            _popcount(black) < BitBoard._MIN_NUM_PIECES_BEFORE_LOSS
+
+        if (white_lost and black_lost):
+            # Tie
+            return (GamePhase.FINISHED, None)
+        elif (black_lost):
+            return (GamePhase.FINISHED, PlayerColor.WHITE)
+        elif (white_lost):
+            return (GamePhase.FINISHED, PlayerColor.BLACK)
+
+        return (phase, winner)
+
+    def _get_player_mask(self, player: PlayerColor) -> int:
+        return self.white if player == PlayerColor.WHITE else self.black
+
+    def _get_empty_mask(self) -> int:
+        """
+        Returns a mask of all squares that can be moved to or placed on.
+        """
+        return _FULL_MASK & ~(self.white | self.black | self.corners
+                              | self.eliminated)
+
+    def _get_move_targets(self, origin: int) -> List[int]:
+        """
+        Returns the indices that the piece on 'origin' can move or jump to.
+        """
+        occupied: int = self.white | self.black
+        empty: int = self._get_empty_mask()
+
+        targets: List[int] = []
+        for adjacent, opposite in NEIGHBOURS[origin]:
+            if (empty >> adjacent & 1):
+                targets.append(adjacent)
+            elif (occupied >> adjacent & 1 and opposite is not None
+                  and empty >> opposite & 1):
+                targets.append(opposite)
+
+        return targets
+
+    def _get_resulting_masks(self, player: PlayerColor, origin: Optional[int],
+                             target: int) -> Tuple[int, int, int, int]:
+        """
+        Returns the (white, black, corners, eliminated) masks that result from
+        the given player moving a piece from 'origin' (None for a placement) to
+        'target', including any kills and, if this round triggers a death zone,
+        the shrinking of the board.
+        """
+        return BitBoard._get_masks_after_move(
+            self.white, self.black, self.corners, self.eliminated,
+            BitBoard._get_shrink_index(self.round_num, self.phase), player,
+            origin, target)
+
+    @staticmethod
+    def _get_shrink_index(round_num: int, phase: GamePhase) -> Optional[int]:
+        """
+        Returns which death zone (see _DEATH_ZONES) the move made in the given
+        round triggers, or None if it doesn't trigger one.
+        """
+        if (phase == GamePhase.MOVEMENT
+                and round_num in BitBoard._DEATH_ZONE_ROUNDS):
+            return BitBoard._DEATH_ZONE_ROUNDS.index(round_num)
+
+        return None
+
+    @staticmethod
+    def _get_masks_after_move(white: int, black: int, corners: int,
+                              eliminated: int, shrink_i: Optional[int],
+                              player: PlayerColor, origin: Optional[int],
+                              target: int) -> Tuple[int, int, int, int]:
+        """
+        Does the same as ._get_resulting_masks(), for the given masks. The
+        board is shrunk afterwards if 'shrink_i' isn't None (see
+        ._get_shrink_index()).
+        """
+        (own, opponent) = (white, black) if player == PlayerColor.WHITE \
+            else (black, white)
+
+        if (origin is not None):
+            own &= ~(1 << origin)
+        own |= 1 << target
+
+        # Kill any enemy pieces that are now surrounded by the moved piece and
+        # either an allied piece or a corner.
+        for adjacent, opposite in NEIGHBOURS[target]:
+            if (opponent >> adjacent & 1 and opposite is not None
+                    and (own | corners) >> opposite & 1):
+                opponent &= ~(1 << adjacent)
+
+        # The moved piece is killed if it ends up surrounded itself.
+        if (BitBoard._is_surrounded(target, opponent | corners)):
+            own &= ~(1 << target)
+
+        white, black = (own, opponent) if player == PlayerColor.WHITE \
+            else (opponent, own)
+
+        if (shrink_i is not None):
+            (white, black, corners, eliminated) = BitBoard._shrink(
+                white, black, corners, eliminated, shrink_i)
+
+        return (white, black, corners, eliminated)
+
+    def _create_delta(self, player: PlayerColor, origin: Optional[int],
+                      target: int) -> Delta:
+        """
+        Creates the Delta for the given move, working out the squares that are
+        killed, eliminated and turned into corners as a result of it.
+        """
+        (white, black, corners, eliminated) = \
+            self._get_resulting_masks(player, origin, target)
+
+        # Anything that had a piece before and after the move that doesn't
+        # anymore (excluding the square the moving piece left) was killed.
+        before: int = self.white | self.black
+        if (origin is not None):
+            before &= ~(1 << origin)
+        killed: int = ((before | 1 << target) & ~(white | black)
+                       & ~eliminated & ~corners)
+        # Pieces that were on squares that were eliminated or became corners
+        # are removed by the death zone rather than killed.
+        new_eliminated: int = eliminated & ~self.eliminated
+        new_corners: int = corners & ~self.corners
+
+        move_origin: Optional[Square] = None
+        if (origin is not None):
+            move_origin = Square(POSITIONS[origin], Piece(player),
+                                 SquareState.OCCUPIED)
+        move_target: Square = Square(POSITIONS[target], None,
+                                     SquareState.OPEN)
+
+        return Delta(player, move_origin, move_target,
+                     [POSITIONS[i] for i in _iter_indices(killed)],
+                     [self._get_square(i) for i in
+                      _iter_indices(new_eliminated)],
+                     [self._get_square(i) for i in
+                      _iter_indices(new_corners)])
+
+    def _create_move(self, player: PlayerColor, origin: Optional[int],
+                     target: int) -> int:
+        """
+        Packs the given move, working out which pieces it kills the same way
+        as ._get_resulting_masks() (but leaving out any death zone).
+        """
+        own: int = self._get_player_mask(player)
+        opponent: int = self._get_player_mask(player.opposite())
+        if (origin is not None):
+            own &= ~(1 << origin)
+        own |= 1 << target
+
+        killed_directions: int = 0
+        for direction_i, adjacent, opposite in CAPTURES[target]:
+            if (opponent >> adjacent & 1
+                    and (own | self.corners) >> opposite & 1):
+                opponent &= ~(1 << adjacent)
+                killed_directions |= 1 << direction_i
+
+        return Move.create(player, origin, target, killed_directions,
+                           BitBoard._is_surrounded(target,
+                                                   opponent | self.corners))
+
+    def _get_square(self, i: int) -> Square:
+        """
+        Builds a Square object representing the square at the given index.
+        """
+        if (self.white >> i & 1):
+            return Square(POSITIONS[i], Piece(PlayerColor.WHITE),
+                          SquareState.OCCUPIED)
+        if (self.black >> i & 1):
+            return Square(POSITIONS[i], Piece(PlayerColor.BLACK),
+                          SquareState.OCCUPIED)
+        if (self.corners >> i & 1):
+            return Square(POSITIONS[i], None, SquareState.CORNER)
+        if (self.eliminated >> i & 1):
+            return Square(POSITIONS[i], None, SquareState.ELIMINATED)
+
+        return Square(POSITIONS[i], None, SquareState.OPEN)
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the calling instance.
+        """
+        output: str = ""
+
+        for row_i in range(NUM_ROWS):
+            for col_i in range(NUM_COLS):
+                output += "{} ".format(self._get_square(
+                    row_i * NUM_COLS + col_i).get_representation())
+            # Finished row, add new line.
+            output += "\n"
+
+        return output
+
+    @staticmethod
+    def _update_allied_distance(total: int, before: int, after: int) -> int:
+        """
+        Given the sum of the distances between every pair of pieces in the mask
+        'before', returns the same sum for the mask 'after'. Each piece that
+        was removed or added only costs one pass over the other pieces.
+        """
+        remaining: int = before
+        for i in _iter_indices(before & ~after):
+            remaining ^= 1 << i
+            distances: Tuple[int, ...] = DISTANCES[i]
+            for j in _iter_indices(remaining):
+                total -= distances[j]
+
+        for i in _iter_indices(after & ~before):
+            distances = DISTANCES[i]
+            for j in _iter_indices(remaining):
+                total += distances[j]
+            remaining |= 1 << i
+
+        return total
+
+    @staticmethod
+    def _update_centre_distance(total: int, before: int, after: int) -> int:
+        """
+        Given the sum of the (doubled) distances of the pieces in the mask
+        'before' from the centre, returns the same sum for the mask 'after'.
+        """
+        for i in _iter_indices(before & ~after):
+            total -= CENTRE_DISTANCES_DOUBLED[i]
+        for i in _iter_indices(after & ~before):
+            total += CENTRE_DISTANCES_DOUBLED[i]
+
+        return total
+
+    @staticmethod
+    def _is_surrounded(i: int, enemies: int) -> bool:
+        """
+        Returns True if the square at index 'i' has members of 'enemies' on
+        both sides of it, either horizontally or vertically.
+        """
+        for axis_indices in AXES[i]:
+            if (len(axis_indices) == 2
+                    and enemies >> axis_indices[0] & 1
+                    and enemies >> axis_indices[1] & 1):
+                return True
+
+        return False
+
+    @staticmethod
+    def _shrink(white: int, black: int, corners: int, eliminated: int,
+                shrink_i: int) -> Tuple[int, int, int, int]:
+        """
+        Shrinks the board as the referee does: the outermost ring is
+        eliminated, then each new corner is placed (removing whatever was on
+        it) and kills any pieces it now surrounds.
+        """
+        ring, new_corners = _DEATH_ZONES[shrink_i]
+        white &= ~ring
+        black &= ~ring
+        corners &= ~ring
+        eliminated |= ring
+
+        for corner in new_corners:
+            white &= ~(1 << corner)
+            black &= ~(1 << corner)
+            corners |= 1 << corner
+
+            for adjacent, _ in NEIGHBOURS[corner]:
+                if (white >> adjacent & 1
+                        and BitBoard._is_surrounded(adjacent, black | corners)):
+                    white &= ~(1 << adjacent)
+                elif (black >> adjacent & 1
+                      and BitBoard._is_surrounded(adjacent, white | corners)):
+                    black &= ~(1 << adjacent)
+
+        return (white, black, corners, eliminated)
+
+    def encode(self) -> Tuple[int, ...]:
+        """
+        Returns a compact, picklable encoding of the position (without its undo
+        history), for sending to other processes. Use .decode() to turn it
+        back into a BitBoard.
+        """
+        return (self.white, self.black, self.corners, self.eliminated,
+                self.round_num, self.phase.value,
+                -1 if self.winner is None else self.winner.value,
+                self.zobrist_hash)
+
+    @staticmethod
+    def decode(encoding: Tuple[int, ...]) -> 'BitBoard':
+        """
+        Creates a BitBoard from an encoding returned by .encode().
+        """
+        (white, black, corners, eliminated, round_num, phase_value,
+         winner_value, zobrist_hash) = encoding
+        winner: Optional[PlayerColor] = \
+            None if winner_value == -1 else PlayerColor(winner_value)
+
+        return BitBoard((white, black, corners, eliminated), round_num,
+                        GamePhase(phase_value), winner, zobrist_hash)
+
+    @staticmethod
+    def from_board(board) -> 'BitBoard':
+        """
+        Creates a BitBoard representing the same position as the given Board.
+        """
+        masks: Dict[SquareState, int] = {state: 0 for state in SquareState}
+        white: int = 0
+        black: int = 0
+        for pos, square in board.squares.items():
+            bit: int = 1 << get_index(pos)
+            if (square.state == SquareState.OCCUPIED):
+                if (square.occupant.owner == PlayerColor.WHITE):
+                    white |= bit
+                else:
+                    black |= bit
+            else:
+                masks[square.state] |= bit
+
+        return BitBoard((white, black, masks[SquareState.CORNER],
+                         masks[SquareState.ELIMINATED]),
+                        board.round_num, board.phase, board.winner)
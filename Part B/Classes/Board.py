@@ -8,6 +8,8 @@ from Classes.Square import Square
 from Enums.GamePhase import GamePhase
 from Enums.PlayerColor import PlayerColor
 from Enums.SquareState import SquareState
+from Misc.BoardTables import POSITIONS, ADJACENT, NEIGHBOURS, AXES, get_index
+from Misc import Zobrist
 
 
 class Board():
@@ -52,9 +54,21 @@ class Board():
     # Equals None while the game isn't done. If phase == FINISHED and winner is
     # None, that the game was a tie.
     winner: PlayerColor
+    # The Zobrist hash of the board (see Misc/Zobrist.py), covering the pieces,
+    # corners, eliminated squares, side to move, phase and shrink stage. It is
+    # updated incrementally as moves are made.
+    zobrist_hash: int
+    # One entry per delta applied with .apply() that hasn't been undone yet.
+    # Each entry holds the delta, the (square, occupant, state) values of every
+    # square it changed, and the round number, phase, winner and hash from
+    # before it was applied.
+    _undo_stack: List[Tuple[Delta, List[Tuple[Square, Optional[Piece],
+                                              SquareState]],
+                            int, GamePhase, PlayerColor, int]]
 
     def __init__(self, squares: Optional[Dict[Pos2D, Square]], round_num: int,
-                 phase: GamePhase, winner: PlayerColor = None):
+                 phase: GamePhase, winner: PlayerColor = None,
+                 zobrist_hash: Optional[int] = None):
         if (squares is None):
             self.squares = self._init_squares()
         else:
@@ -63,6 +77,12 @@ class Board():
         self.round_num = round_num
         self.phase = phase
         self.winner = winner
+        self._undo_stack = []
+
+        if (zobrist_hash is None):
+            self.zobrist_hash = self._compute_hash()
+        else:
+            self.zobrist_hash = zobrist_hash
 
     def get_num_moves(self, player: PlayerColor) -> int:
         """
@@ -72,19 +92,15 @@ class Board():
         player_squares: List[Square] = self.get_player_squares(player)
         count: int = 0
         for player_square in player_squares:
-            adj_squares: List[Square] = \
-                self._get_adjacent_squares(player_square.pos)
-            for adj_square in adj_squares:
-                if (adj_square.state == SquareState.OPEN):
+            for adj_i, opposite_i in NEIGHBOURS[get_index(player_square.pos)]:
+                adj_state: SquareState = self.squares[POSITIONS[adj_i]].state
+                if (adj_state == SquareState.OPEN):
+                    count += 1
+                elif (adj_state == SquareState.OCCUPIED
+                      and opposite_i is not None
+                      and self.squares[POSITIONS[opposite_i]].state
+                      == SquareState.OPEN):
                     count += 1
-                elif(adj_square.state == SquareState.OCCUPIED):
-                    opposite_square: Square = \
-                        self.squares.get(
-                            self._get_opposite_pos(player_square.pos,
-                                                   adj_square.pos))
-                    if (opposite_square is not None
-                            and opposite_square.state == SquareState.OPEN):
-                        count += 1
 
         return count
 
@@ -123,24 +139,21 @@ class Board():
         :param delta:
         :return:
         """
-        # Get our adjacent squares
-        adj_squares: List[Square] = \
-            self._get_adjacent_squares(delta.move_target.pos)
-        for adj_square in adj_squares:
+        # Go through our adjacent squares
+        for adj_i, opposite_i in NEIGHBOURS[get_index(delta.move_target.pos)]:
+            adj_square: Square = self.squares[POSITIONS[adj_i]]
             # Don't place next to corners.
             if (adj_square.state == SquareState.CORNER):
                 return True
 
             if adj_square.state == SquareState.OCCUPIED and \
                     adj_square.occupant.owner == delta.player.opposite():
-                opposite_square: Square = \
-                    self.squares.get(Board._get_opposite_pos(
-                        delta.move_target.pos, adj_square.pos), None)
-
                 # Enemy is on edge, we're away from edge. That's suicide.
-                if (opposite_square is None):
+                if (opposite_i is None):
                     return True
 
+                opposite_square: Square = self.squares[POSITIONS[opposite_i]]
+
                 # If the opposite piece is not our own then it's a suicide
                 if (opposite_square.state == SquareState.OCCUPIED and
                     opposite_square.occupant.owner != delta.player) and \
@@ -162,26 +175,22 @@ class Board():
             (potential_square_eliminations, potential_new_corners) = \
                 self._get_death_zone_changes()
 
-        adjacent_squares: List[Square] = self._get_adjacent_squares(pos)
         # For each adjacent square, determine if it can be moved to or jumped
         # over and then create and store the corresponding delta if possible.
-        for adjacent_square in adjacent_squares:
+        for adj_i, opposite_i in NEIGHBOURS[get_index(pos)]:
+            adjacent_square: Square = self.squares[POSITIONS[adj_i]]
             move_origin: Square
             move_target: Square
 
             if (adjacent_square.state == SquareState.OPEN):
                 move_origin = self.squares[pos]
                 move_target = adjacent_square
-            elif (adjacent_square.state == SquareState.OCCUPIED):
-                opposite_square: Square = \
-                    self.squares.get(
-                        self._get_opposite_pos(pos, adjacent_square.pos))
-                if (opposite_square is not None
-                        and opposite_square.state == SquareState.OPEN):
-                    move_origin = self.squares[pos]
-                    move_target = opposite_square
-                else:
-                    continue
+            elif (adjacent_square.state == SquareState.OCCUPIED
+                  and opposite_i is not None
+                  and self.squares[POSITIONS[opposite_i]].state
+                  == SquareState.OPEN):
+                move_origin = self.squares[pos]
+                move_target = self.squares[POSITIONS[opposite_i]]
             else:
                 continue
 
@@ -191,29 +200,35 @@ class Board():
             if (self.round_num in Board._DEATH_ZONE_ROUNDS):
                 assert(len(potential_new_corners) == 4)
 
-                adj_to_corner_squares: List[Square]
                 for corner in potential_new_corners:
-                    adj_to_corner_squares = self._get_adjacent_squares(corner.pos)
-                    adj_occupied_squares: List[Square] = \
-                        [square for square in adj_to_corner_squares if
-                         square.state == SquareState.OCCUPIED]
-
-                    # Determine of the move_target would be an adjacent
-                    # position as well (edge case).
-                    if (move_target in adj_to_corner_squares):
-                        move_target_copy: Square = copy(move_target)
-                        move_target_copy.occupant = move_origin.occupant
-                        move_target_copy.state = move_origin.state
-                        adj_occupied_squares.append(move_target_copy)
-
-                    for adj_square in adj_occupied_squares:
-                        opposite_square: Square = \
-                            self.squares.get(self._get_opposite_pos(corner.pos,
-                                                                    adj_square.pos))
-
-                        if (opposite_square is None):
+                    # The occupied squares adjacent to the corner, paired with
+                    # the index of the square on their other side.
+                    adj_occupied_squares: List[Tuple[Square, Optional[int]]] = \
+                        []
+                    move_target_pair: Optional[Tuple[Square, int]] = None
+                    for adj_i, opposite_i in NEIGHBOURS[get_index(corner.pos)]:
+                        adj_square: Square = self.squares[POSITIONS[adj_i]]
+                        if (adj_square.state == SquareState.OCCUPIED):
+                            adj_occupied_squares.append((adj_square,
+                                                         opposite_i))
+                        elif (adj_square is move_target):
+                            # The move_target would be an adjacent position as
+                            # well (edge case).
+                            move_target_copy: Square = copy(move_target)
+                            move_target_copy.occupant = move_origin.occupant
+                            move_target_copy.state = move_origin.state
+                            move_target_pair = (move_target_copy, opposite_i)
+
+                    if (move_target_pair is not None):
+                        adj_occupied_squares.append(move_target_pair)
+
+                    for adj_square, opposite_i in adj_occupied_squares:
+                        if (opposite_i is None):
                             continue
 
+                        opposite_square: Square = \
+                            self.squares[POSITIONS[opposite_i]]
+
                         # Edge case handling. If the delta involves moving to
                         # the opposite square, pretend it's already there.
                         if (opposite_square.pos == move_target.pos):
@@ -233,7 +248,7 @@ class Board():
 
             potential_kills: List[Pos2D] = \
                 self._get_killed_positions(move_origin.occupant,
-                                           move_target.pos) \
+                                           move_target.pos, move_origin.pos) \
                 + [square.pos for square in potential_corner_kills]
             # TODO Here, add function to assess kills from new corners.
             delta: Delta = Delta(self.squares[pos].occupant.owner, move_origin,
@@ -297,40 +312,115 @@ class Board():
                     == SquareState.OCCUPIED)
 
         next_board: Board = self.__deepcopy__()
+        next_board._make_move(delta, None)
+
+        return next_board
+
+    def apply(self, delta: Delta):
+        """
+        Makes the given delta's move on the calling instance itself rather than
+        on a copy (see get_next_board). Everything the move changes is recorded
+        so that it can be reverted with .undo(), which lets searches walk a
+        single board instead of copying it for every node.
+        """
+
+        # Sanity checks to ensure we're calling the method correctly.
+        assert (self.squares[delta.move_target.pos].state == SquareState.OPEN)
+        if (delta.move_origin is not None):
+            assert (self.squares[delta.move_origin.pos].state
+                    == SquareState.OCCUPIED)
+
+        changes: List[Tuple[Square, Optional[Piece], SquareState]] = []
+        self._undo_stack.append((delta, changes, self.round_num, self.phase,
+                                 self.winner, self.zobrist_hash))
+        self._make_move(delta, changes)
+
+    def undo(self, delta: Delta):
+        """
+        Reverts the most recent delta made with .apply(), which must be the
+        given delta.
+        """
+        (applied_delta, changes, round_num, phase, winner, zobrist_hash) = \
+            self._undo_stack.pop()
+        assert (applied_delta is delta)
+
+        # Restore in reverse order so that squares changed more than once
+        # (e.g. an eliminated square that was also killed) end up as they
+        # originally were.
+        for square, occupant, state in reversed(changes):
+            square.occupant = occupant
+            square.state = state
+
+        self.round_num = round_num
+        self.phase = phase
+        self.winner = winner
+        self.zobrist_hash = zobrist_hash
+
+    def skip_turn(self):
+        """
+        Moves the board onto the next round without a move being made, for
+        when a player has no moves and forfeits their turn.
+        """
+        self.zobrist_hash ^= self._get_state_key()
+        self.round_num += 1
+        self._update_game_phase()
+        self.zobrist_hash ^= self._get_state_key()
 
+    def _make_move(self, delta: Delta,
+                   changes: Optional[List[Tuple[Square, Optional[Piece],
+                                                SquareState]]]):
+        """
+        Changes the calling instance's squares to reflect the given delta and
+        moves the game onto the next round, keeping zobrist_hash up to date.
+        If 'changes' is given, the previous (square, occupant, state) of every
+        changed square is appended to it.
+        """
+        target: Square = self.squares[delta.move_target.pos]
         # Make sure that both the original and target squares are changed to
         # reflect change in the given delta.
         if (delta.move_origin is None):
             # This delta is a placement.
-            next_board.squares[delta.move_target.pos].occupant = \
-                Piece(delta.player)
+            self._set_square(target, Piece(delta.player),
+                             SquareState.OCCUPIED, changes)
         else:
             # This delta is a movement.
-            next_board.squares[delta.move_target.pos].occupant = \
-                delta.move_origin.occupant
-            next_board.squares[delta.move_origin.pos].occupant = None
-            next_board.squares[delta.move_origin.pos].state = SquareState.OPEN
-
-        next_board.squares[delta.move_target.pos].state = SquareState.OCCUPIED
+            origin: Square = self.squares[delta.move_origin.pos]
+            self._set_square(target, origin.occupant, SquareState.OCCUPIED,
+                             changes)
+            self._set_square(origin, None, SquareState.OPEN, changes)
 
         # Update all the squares that had a killed piece.
         for pos in delta.killed_square_positions:
-            next_board.squares[pos].occupant = None
-            next_board.squares[pos].state = SquareState.OPEN
+            self._set_square(self.squares[pos], None, SquareState.OPEN,
+                             changes)
 
         for square in delta.eliminated_squares: # TODO: Make eliminated squares and new_corners also lists of positions instead?
-            next_board.squares[square.pos].occupant = None
-            next_board.squares[square.pos].state = SquareState.ELIMINATED
+            self._set_square(self.squares[square.pos], None,
+                             SquareState.ELIMINATED, changes)
 
         for square in delta.new_corners:
-            next_board.squares[square.pos].occupant = None
-            next_board.squares[square.pos].state = SquareState.CORNER
+            self._set_square(self.squares[square.pos], None,
+                             SquareState.CORNER, changes)
 
         # Update the game state.
-        next_board.round_num += 1
-        next_board._update_game_phase()
+        self.skip_turn()
 
-        return next_board
+    def _set_square(self, square: Square, occupant: Optional[Piece],
+                    state: SquareState,
+                    changes: Optional[List[Tuple[Square, Optional[Piece],
+                                                 SquareState]]]):
+        """
+        Changes the occupant and state of one of the calling instance's
+        squares, updating zobrist_hash and recording the change if 'changes'
+        is given.
+        """
+        if (changes is not None):
+            changes.append((square, square.occupant, square.state))
+
+        self.zobrist_hash ^= Board._get_square_key(square)
+        square.occupant = occupant
+        square.state = state
+        self.zobrist_hash ^= Board._get_square_key(square)
 
     def get_player_squares(self, player: PlayerColor) -> List[Square]:
         """
@@ -352,90 +442,76 @@ class Board():
         Can be horizontal, vertical, or omni i.e. both.
         :return: A list of adjacent squares.
         """
-        adjacent_squares: List[Square] = []
-        if (direction == Board._OMNI):
-            # Recursively call this method to get the horizontally and
-            # vertically adjacent squares.
-            adjacent_squares.extend(
-                self._get_adjacent_squares(pos, Board._HORIZONTAL))
-            adjacent_squares.extend(
-                self._get_adjacent_squares(pos, Board._VERTICAL))
-        elif (direction == Board._HORIZONTAL):
-            adjacent_squares = [self.squares.get(pos + Pos2D(1, 0)),
-                                self.squares.get(pos + Pos2D(-1, 0))]
+        i: int = get_index(pos)
+        adjacent_indices: Tuple[int, ...]
+        if (direction == Board._HORIZONTAL):
+            adjacent_indices = AXES[i][0]
         elif (direction == Board._VERTICAL):
-            adjacent_squares = [self.squares.get(pos + Pos2D(0, 1)),
-                                self.squares.get(pos + Pos2D(0, -1))]
+            adjacent_indices = AXES[i][1]
+        else:
+            adjacent_indices = ADJACENT[i]
 
-        return [square for square in adjacent_squares if square is not None]
+        return [self.squares[POSITIONS[adj_i]] for adj_i in adjacent_indices]
 
     def _get_killed_positions(self, moving_piece: Piece,
-                              moving_piece_target_pos: Pos2D) -> List[Pos2D]:
+                              moving_piece_target_pos: Pos2D,
+                              moving_piece_origin_pos: Optional[Pos2D] = None) \
+            -> List[Pos2D]:
         """
         This method takes a piece that is moving and it's target position and
         calculates a list of positions that will be killed as a result of the
-        move. This may include the moving piece itself.
+        move. This may include the moving piece itself. The origin position is
+        where the piece is moving from, or None if it is being placed.
         """
         killed_positions: List[Pos2D] = []
-
-        # Short for 'horizontally adjacent squares'.
-        x_adjacent: List[Square] = \
-            self._get_adjacent_squares(moving_piece_target_pos,
-                                       Board._HORIZONTAL)
-        y_adjacent: List[Square] = \
-            self._get_adjacent_squares(moving_piece_target_pos,
-                                       Board._VERTICAL)
+        target_i: int = get_index(moving_piece_target_pos)
 
         # Add any adjacent squares that would be killed if the given piece moved
         # to the given location.
-        for adjacent_square in [*x_adjacent, *y_adjacent]:
+        for adj_i, opposite_i in NEIGHBOURS[target_i]:
+            adjacent_square: Square = self.squares[POSITIONS[adj_i]]
             if (adjacent_square.state == SquareState.OCCUPIED
                     and adjacent_square.occupant.owner != moving_piece.owner):
-                opposite_square: Square = \
-                    self.squares.get(self._get_opposite_pos(
-                        moving_piece_target_pos, adjacent_square.pos))
-
-                if opposite_square is None:
+                if opposite_i is None:
                     # The opposite square out of bounds, move onto the next one.
                     continue
 
+                opposite_square: Square = self.squares[POSITIONS[opposite_i]]
+
                 # Check if the opposite piece is owned by the same player who's
                 # making the move or if it is a corner square. If so, add the
-                # adjacent square to the list of killed positions.
+                # adjacent square to the list of killed positions. When a piece
+                # jumps over an enemy piece, the square it jumped from is the
+                # opposite square, but it will no longer be occupied (positions
+                # are shared, so comparing them by identity is enough).
                 if ((opposite_square.state == SquareState.OCCUPIED
                      and opposite_square.occupant.owner == moving_piece.owner
-                     and opposite_square.occupant != moving_piece)
+                     and opposite_square.pos is not moving_piece_origin_pos)
                         or opposite_square.state == SquareState.CORNER):
                     killed_positions.append(adjacent_square.pos)
 
         # Now check if the piece that is moving gets killed. This would
         # (probably) be a stupid move, but it could happen.
 
-        # Remove references to adjacent squares if they are going to be killed,
-        # as they then cannot kill the moving piece.
-        [x_adjacent.remove(self.squares[pos]) for pos in killed_positions if
-         self.squares[pos] in x_adjacent]
-        [y_adjacent.remove(self.squares[pos]) for pos in killed_positions if
-         self.squares[pos] in y_adjacent]
-
-        # Filter out squares from both lists that are not occupied by enemy
-        # pieces or aren't corners.
-        potential_x_killer_squares = \
-            [square for square in x_adjacent
-             if ((square.state == SquareState.OCCUPIED
-                  and (square.occupant.owner != moving_piece.owner))
-                 or (square.state == SquareState.CORNER))]
-        potential_y_killer_squares = \
-            [square for square in y_adjacent
-             if ((square.state == SquareState.OCCUPIED
-                  and (square.occupant.owner != moving_piece.owner))
-                 or (square.state == SquareState.CORNER))]
-
-        # If either list still has two squares in them, that means that the
-        # moving piece is doomed.
-        if (len(potential_x_killer_squares) == 2
-                or len(potential_y_killer_squares) == 2):
-            killed_positions.append(moving_piece_target_pos)
+        # For each axis, count the adjacent squares that could kill the moving
+        # piece i.e. that are occupied by enemy pieces or are corners. Adjacent
+        # squares that are going to be killed cannot kill the moving piece.
+        for axis_indices in AXES[target_i]:
+            num_killers: int = 0
+            for adj_i in axis_indices:
+                square: Square = self.squares[POSITIONS[adj_i]]
+                if (square.pos in killed_positions):
+                    continue
+                if ((square.state == SquareState.OCCUPIED
+                     and square.occupant.owner != moving_piece.owner)
+                        or square.state == SquareState.CORNER):
+                    num_killers += 1
+
+            # If there are killers on both sides, that means that the moving
+            # piece is doomed.
+            if (num_killers == 2):
+                killed_positions.append(moving_piece_target_pos)
+                break
 
         return killed_positions
 
@@ -541,6 +617,28 @@ class Board():
 
         return squares
 
+    def _compute_hash(self) -> int:
+        """
+        Calculates the Zobrist hash of the calling instance from scratch.
+        """
+        zobrist_hash: int = self._get_state_key()
+        for square in self.squares.values():
+            zobrist_hash ^= Board._get_square_key(square)
+
+        return zobrist_hash
+
+    def _get_state_key(self) -> int:
+        return Zobrist.get_state_key(self.round_num, self.phase,
+                                     Board._DEATH_ZONE_ROUNDS)
+
+    def get_squares_hash(self) -> int:
+        """
+        Returns the Zobrist hash of the squares alone, leaving out the side to
+        move, the phase and the shrink stage, so boards with the same pieces in
+        the same places hash the same whatever round they are on.
+        """
+        return self.zobrist_hash ^ self._get_state_key()
+
     def _update_game_phase(self):
         """
         Checks the current state of the game and the board to determine if the
@@ -604,7 +702,7 @@ class Board():
         phase: GamePhase = self.phase
         winner: PlayerColor = self.winner
 
-        return Board(squares, round_num, phase, winner)
+        return Board(squares, round_num, phase, winner, self.zobrist_hash)
 
     @staticmethod
     def _init_squares() -> Dict[Pos2D, Square]:
@@ -654,8 +752,25 @@ class Board():
                         Square(pos, Piece(PlayerColor.BLACK),
                                SquareState.OCCUPIED)
 
+        new_board.zobrist_hash = new_board._compute_hash()
+
         return new_board
 
+    @staticmethod
+    def _get_square_key(square: Square) -> int:
+        """
+        Returns the Zobrist key for the given square's current contents.
+        """
+        if (square.state == SquareState.OCCUPIED):
+            return Zobrist.PIECE_KEYS[square.occupant.owner.value][
+                get_index(square.pos)]
+        if (square.state == SquareState.CORNER):
+            return Zobrist.CORNER_KEYS[get_index(square.pos)]
+        if (square.state == SquareState.ELIMINATED):
+            return Zobrist.ELIMINATED_KEYS[get_index(square.pos)]
+
+        return 0
+
     @staticmethod
     def _get_opposite_pos(first_pos: Pos2D, second_pos: Pos2D) -> Pos2D:
         """
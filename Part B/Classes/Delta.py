@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from Classes.Pos2D import Pos2D
 from Classes.Square import Square
@@ -12,6 +12,9 @@ class Delta():
     create the resulting board.
     """
 
+    __slots__ = ("move_origin", "move_target", "killed_square_positions",
+                 "eliminated_squares", "new_corners", "player")
+
     # The square that the moving piece originated from.
     move_origin: Square
     # The square that the moving piece moved to. The actual piece object will
@@ -58,18 +61,17 @@ class Delta():
 
     def __eq__(self, other: 'Delta') -> bool:
         """
-        Compares two delta objects.
+        Compares two delta objects. On a given board, the player and the
+        positions moved from and to are enough to identify a move, since
+        everything else about it follows from them.
         """
-        self_tuple = (self.player, self.move_origin, self.move_target,
-                      self.killed_square_positions)
-        other_tuple = (other.player, other.move_origin, other.move_target,
-                       other.killed_square_positions)
-
-        return self_tuple == other_tuple
+        return self._get_key() == other._get_key()
 
     def __hash__(self):
-        components = (self.move_origin, self.move_target,
-                      *self.killed_square_positions, *self.eliminated_squares,
-                      *self.new_corners, self.player)
+        return hash(self._get_key())
+
+    def _get_key(self) -> Tuple[PlayerColor, Optional[Pos2D], Pos2D]:
+        if (self.move_origin is None):
+            return (self.player, None, self.move_target.pos)
 
-        return hash(components)
\ No newline at end of file
+        return (self.player, self.move_origin.pos, self.move_target.pos)
\ No newline at end of file
@@ -0,0 +1,138 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from Classes.BatchEvaluator import BatchEvaluator
+from Classes.BitBoard import BitBoard
+from Enums.PlayerColor import PlayerColor
+
+
+class FeatureCache():
+    """
+    Remembers the eight raw heuristic features (see BitBoard.get_features) of
+    boards that have already been rated, keyed by their Zobrist hash. The
+    features don't depend on the heuristic's weights, so a single cache can be
+    shared by every player in a process, however different their parameters
+    are.
+
+    Features are stored from white's point of view. Black's point of view is
+    the same features with each own/opponent pair swapped.
+    """
+
+    _NUM_FEATURES: int = 8
+    # Maps a white point of view feature vector to black's.
+    _BLACK_FEATURE_ORDER: List[int] = [1, 0, 3, 2, 5, 4, 7, 6]
+    # Heuristic score decimal place rounding. Must match the players'.
+    _RATING_NUM_ROUNDING: int = 10
+
+    num_hits: int
+    num_misses: int
+
+    _max_entries: int
+    _features: Dict[int, Tuple[float, ...]]
+
+    def __init__(self, max_entries: int):
+        """
+        Creates a cache that holds the features of at most 'max_entries'
+        boards. Once it is full, the oldest entries are dropped first.
+        """
+        self._max_entries = max_entries
+        self._features = {}
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get_features(self, board: BitBoard,
+                     player: PlayerColor) -> Tuple[float, ...]:
+        """
+        Returns the features of the given board from the point of view of the
+        given player, in the same order as BitBoard.get_features.
+        """
+        features: Tuple[float, ...] = self._features.get(board.zobrist_hash)
+        if (features is None):
+            self.num_misses += 1
+            features = board.get_features(PlayerColor.WHITE)
+            self._store(board.zobrist_hash, features)
+        else:
+            self.num_hits += 1
+
+        if (player == PlayerColor.BLACK):
+            return tuple(features[i]
+                         for i in FeatureCache._BLACK_FEATURE_ORDER)
+
+        return features
+
+    def get_feature_matrix(self, board_encodings: Sequence[Tuple[int, ...]],
+                           player: PlayerColor) -> np.ndarray:
+        """
+        Returns a (positions, 8) array of the features of each of the given
+        boards (encoded with BitBoard.encode), from the point of view of the
+        given player. Boards that aren't cached are all rated in one batch
+        with BatchEvaluator.
+        """
+        features: np.ndarray = \
+            np.empty((len(board_encodings), FeatureCache._NUM_FEATURES))
+        missing_rows: List[int] = []
+        for row_i, board_encoding in enumerate(board_encodings):
+            cached: Tuple[float, ...] = \
+                self._features.get(FeatureCache._get_hash(board_encoding))
+            if (cached is None):
+                missing_rows.append(row_i)
+            else:
+                features[row_i] = cached
+        self.num_hits += len(board_encodings) - len(missing_rows)
+        self.num_misses += len(missing_rows)
+
+        if (len(missing_rows) > 0):
+            missing_encodings: List[Tuple[int, ...]] = \
+                [board_encodings[row_i] for row_i in missing_rows]
+            missing_features: np.ndarray = BatchEvaluator.get_features(
+                BatchEvaluator.encode(missing_encodings), PlayerColor.WHITE)
+            features[missing_rows] = missing_features
+            for board_encoding, board_features \
+                    in zip(missing_encodings, missing_features.tolist()):
+                self._store(FeatureCache._get_hash(board_encoding),
+                            tuple(board_features))
+
+        if (player == PlayerColor.BLACK):
+            return features[:, FeatureCache._BLACK_FEATURE_ORDER]
+
+        return features
+
+    def get_hit_rate(self) -> float:
+        """
+        Returns the fraction of lookups that found their board.
+        """
+        num_lookups: int = self.num_hits + self.num_misses
+        if (num_lookups == 0):
+            return 0.0
+
+        return self.num_hits / num_lookups
+
+    @staticmethod
+    def get_scores(features: np.ndarray, player: PlayerColor,
+                   weights: np.ndarray) -> np.ndarray:
+        """
+        Rates boards from their features. 'features' is a (positions, 8) array
+        from the point of view of the given player. 'weights' is either one
+        player's eight parameters, giving a (positions,) array of scores, or
+        an (8, N) array holding the parameters of N players in its columns,
+        giving a (positions, N) array with every player's score for every
+        board. Like the players' get_heuristic_value, scores are from white's
+        point of view.
+        """
+        scores: np.ndarray = np.round(
+            features @ np.asarray(weights, dtype=np.float64),
+            FeatureCache._RATING_NUM_ROUNDING)
+
+        return scores if player == PlayerColor.WHITE else -scores
+
+    def _store(self, key: int, features: Tuple[float, ...]):
+        if (len(self._features) >= self._max_entries):
+            # Dictionaries keep insertion order, so this is the oldest entry.
+            del self._features[next(iter(self._features))]
+        self._features[key] = features
+
+    @staticmethod
+    def _get_hash(board_encoding: Tuple[int, ...]) -> int:
+        # The last value of a BitBoard encoding is its Zobrist hash.
+        return board_encoding[-1]
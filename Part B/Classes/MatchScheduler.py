@@ -0,0 +1,171 @@
+from math import log
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+class MatchScheduler():
+    """
+    Decides which games to play between the players of a population, racing
+    every pairing instead of playing each one a fixed number of times. Given
+    their ratings, players are only paired with the NUM_OPPONENTS rated closest
+    to them, as games between players of similar strength say the most about
+    them. Otherwise, every player is paired with every other.
+
+    Games are played in waves (see .get_next_games()). Every pairing first gets
+    MIN_GAMES_PER_PAIRING games, then each wave gives every still undecided
+    pairing two more, until it reaches MAX_GAMES_PER_PAIRING or the total
+    budget runs out. The two games of a wave share an opening and swap colours,
+    so that neither player is favoured by the colour or the opening it got.
+
+    A pairing is decided once a sequential probability ratio test (SPRT)
+    accepts that one player scores at least 0.5 + _SCORE_MARGIN against the
+    other, with error rates of _ERROR_RATE either way. Pairings that are still
+    close get the games left over by decided ones, closest first.
+    """
+
+    MIN_GAMES_PER_PAIRING: int = 4
+    MAX_GAMES_PER_PAIRING: int = 20
+    NUM_OPPONENTS: int = 6
+
+    # The hypotheses tested are that the first player of a pairing scores
+    # 0.5 - _SCORE_MARGIN or 0.5 + _SCORE_MARGIN per game, a draw counting as
+    # half a win.
+    _SCORE_MARGIN: float = 0.2
+    # The chance of deciding a pairing in favour of the wrong player.
+    _ERROR_RATE: float = 0.05
+    # The log-likelihood ratio of the hypotheses for each point scored and each
+    # point conceded by the first player of a pairing.
+    _LLR_PER_POINT: float = \
+        log((0.5 + _SCORE_MARGIN) / (0.5 - _SCORE_MARGIN))
+    # A pairing is decided once the magnitude of its log-likelihood ratio
+    # reaches this.
+    _LLR_BOUND: float = log((1 - _ERROR_RATE) / _ERROR_RATE)
+
+    # Each player's (wins, losses, draws) against everyone.
+    player_results: Dict[int, List[int]]
+    # The first player's (wins, losses, draws) in each pairing, keyed by
+    # (first player ID, second player ID).
+    pairing_results: Dict[Tuple[int, int], List[int]]
+    # The number of games given to each pairing so far, played or not.
+    _num_scheduled: Dict[Tuple[int, int], int]
+    # The number of each pairing's games that couldn't be played.
+    _num_failed: Dict[Tuple[int, int], int]
+    _max_games: int
+    num_games_scheduled: int
+
+    def __init__(self, player_ids: Sequence[int], max_games: int,
+                 ratings: Optional[Sequence[float]] = None):
+        """
+        Creates a schedule for the pairings of the given players, in order,
+        playing at most 'max_games' games in total. 'ratings' holds the rating
+        of each player, if they are known. Each pairing gets at least
+        MIN_GAMES_PER_PAIRING games whatever the budget.
+        """
+        self.player_results = {player_id: [0, 0, 0]
+                               for player_id in player_ids}
+        self.pairing_results = {}
+        for idx, player1_id in enumerate(player_ids):
+            for player2_id in player_ids[idx + 1:]:
+                self.pairing_results[(player1_id, player2_id)] = [0, 0, 0]
+
+        if (ratings is not None):
+            # Pairings stay in the same order as the players.
+            similar_pairings: Set[Tuple[int, int]] = set()
+            for (idx, rating) in enumerate(ratings):
+                opponents: List[int] = sorted(
+                    (opponent for opponent in range(len(ratings))
+                     if opponent != idx),
+                    key=lambda opponent: (abs(ratings[opponent] - rating),
+                                          opponent))
+                for opponent in opponents[:MatchScheduler.NUM_OPPONENTS]:
+                    similar_pairings.add((player_ids[min(idx, opponent)],
+                                          player_ids[max(idx, opponent)]))
+            self.pairing_results = {
+                pairing: results
+                for (pairing, results) in self.pairing_results.items()
+                if pairing in similar_pairings}
+        self._num_scheduled = dict.fromkeys(self.pairing_results, 0)
+        self._num_failed = dict.fromkeys(self.pairing_results, 0)
+        self._max_games = max_games
+        self.num_games_scheduled = 0
+
+    def get_next_games(self) -> List[Tuple[int, int, int]]:
+        """
+        Returns the next wave of games as (first player ID, second player ID,
+        game number within the pairing) tuples, or an empty list once the race
+        is over. Every game of the previous wave must have had its result (or
+        its failure) added first. The first player of a pairing is white in its even-numbered
+        games, and each even-numbered game shares its opening with the next.
+        """
+        assert (all(sum(self.pairing_results[pairing])
+                    + self._num_failed[pairing] == num_scheduled
+                    for (pairing, num_scheduled)
+                    in self._num_scheduled.items()))
+
+        games: List[Tuple[int, int, int]] = []
+        if (self.num_games_scheduled == 0):
+            # The first wave gives every pairing its minimum number of games.
+            for pairing in self.pairing_results:
+                games.extend(self._schedule(
+                    pairing, MatchScheduler.MIN_GAMES_PER_PAIRING))
+            return games
+
+        # The closest contests go first, in case the budget runs out.
+        pairings: List[Tuple[int, int]] = sorted(
+            (pairing for pairing, num_scheduled in self._num_scheduled.items()
+             if num_scheduled < MatchScheduler.MAX_GAMES_PER_PAIRING
+             and not self.is_decided(pairing)),
+            key=lambda pairing: abs(self._get_llr(pairing)))
+        for pairing in pairings:
+            if (self._max_games - self.num_games_scheduled < 2):
+                break
+            games.extend(self._schedule(pairing, 2))
+
+        return games
+
+    def add_result(self, player1_id: int, player2_id: int, score: float):
+        """
+        Records the result of a game of the pairing (player1_id, player2_id)
+        returned by .get_next_games(): 'score' is 1 if the first player won,
+        0 if it lost and 0.5 for a draw.
+        """
+        # Index of the first player's result: a win, loss or draw.
+        result: int = {1: 0, 0: 1, 0.5: 2}[score]
+        self.pairing_results[(player1_id, player2_id)][result] += 1
+        self.player_results[player1_id][result] += 1
+        # The second player's result is the opposite.
+        self.player_results[player2_id][(1, 0, 2)[result]] += 1
+
+    def add_failure(self, player1_id: int, player2_id: int):
+        """
+        Records that a game of the pairing (player1_id, player2_id) returned by
+        .get_next_games() couldn't be played. It still uses up one of the
+        pairing's games, but counts for neither player.
+        """
+        self._num_failed[(player1_id, player2_id)] += 1
+
+    def is_decided(self, pairing: Tuple[int, int]) -> bool:
+        """
+        Returns whether the SPRT has decided which player of the given pairing
+        is stronger.
+        """
+        return abs(self._get_llr(pairing)) >= MatchScheduler._LLR_BOUND
+
+    def _schedule(self, pairing: Tuple[int, int],
+                  num_games: int) -> List[Tuple[int, int, int]]:
+        """
+        Gives the given pairing its next 'num_games' games, and returns them.
+        """
+        first_game: int = self._num_scheduled[pairing]
+        self._num_scheduled[pairing] += num_games
+        self.num_games_scheduled += num_games
+        return [(pairing[0], pairing[1], i)
+                for i in range(first_game, first_game + num_games)]
+
+    def _get_llr(self, pairing: Tuple[int, int]) -> float:
+        """
+        Returns the log-likelihood ratio of the first player of the given
+        pairing being the stronger one, rather than the weaker one. Draws are
+        worth half a point to each side, so they cancel out.
+        """
+        (wins, losses, _) = self.pairing_results[pairing]
+        return (wins - losses) * MatchScheduler._LLR_PER_POINT
@@ -0,0 +1,163 @@
+from typing import List, Optional, Tuple, Union
+
+from Enums.PlayerColor import PlayerColor
+from Misc.BoardTables import NUM_COLS, ADJACENT, DIRECTIONS
+
+
+class Move():
+    """
+    A class designed not to be instantiated. Packs a move into a single int, a
+    much lighter alternative to Delta for searches and search trees, which
+    generate and keep millions of moves. Lists of moves are kept in array('I')
+    buffers (see BitBoard.get_all_possible_moves()), and BitBoard.get_delta()
+    and BitBoard.get_move() convert between moves and Deltas.
+
+    From the lowest bit up, a packed move holds:
+    - bits 0 - 5: the index of the target square (see Misc.BoardTables),
+    - bits 6 - 12: the index of the origin square plus one, or 0 for a
+      placement. Together with the target, this is the move's key, which is
+      the same as TranspositionTable.encode_move() gives for its Delta,
+    - bits 13 - 14: the kind of move (PLACE, STEP or JUMP),
+    - bits 15 - 18: the enemy pieces the move kills, one bit per direction
+      from the target square, in the order of Misc.BoardTables.DIRECTIONS,
+    - bit 19: set if the moving piece is killed itself,
+    - bit 20: the value of the PlayerColor making the move.
+
+    Pieces removed by a death zone are a consequence of the round rather than
+    of the move, so they aren't part of it.
+    """
+
+    # The kinds of move.
+    PLACE: int = 0
+    STEP: int = 1
+    JUMP: int = 2
+
+    _ORIGIN_SHIFT: int = 6
+    _KIND_SHIFT: int = 13
+    _KILLS_SHIFT: int = 15
+    _SUICIDE_SHIFT: int = 19
+    _PLAYER_SHIFT: int = 20
+
+    _TARGET_MASK: int = (1 << _ORIGIN_SHIFT) - 1
+    _KEY_MASK: int = (1 << _KIND_SHIFT) - 1
+    _KIND_MASK: int = 0b11
+    _KILLS_MASK: int = 0b1111
+
+    # Indexed by PlayerColor value.
+    _PLAYERS: Tuple[PlayerColor, ...] = (PlayerColor.WHITE, PlayerColor.BLACK)
+    # The difference in square index between a square and its neighbour in
+    # each direction.
+    _DIRECTION_OFFSETS: Tuple[int, ...] = tuple(
+        dy * NUM_COLS + dx for dx, dy in DIRECTIONS)
+
+    @staticmethod
+    def create(player: PlayerColor, origin: Optional[int], target: int,
+               killed_directions: int, is_suicide: bool) -> int:
+        """
+        Packs a move of the given player from 'origin' (None for a placement)
+        to 'target'. 'killed_directions' has bit i set if the enemy piece next
+        to the target in direction DIRECTIONS[i] is killed.
+        """
+        move: int = (target | killed_directions << Move._KILLS_SHIFT
+                     | player.value << Move._PLAYER_SHIFT)
+        if (is_suicide):
+            move |= 1 << Move._SUICIDE_SHIFT
+        if (origin is not None):
+            kind: int = Move.STEP if target in ADJACENT[origin] \
+                else Move.JUMP
+            move |= (origin + 1) << Move._ORIGIN_SHIFT \
+                | kind << Move._KIND_SHIFT
+
+        return move
+
+    @staticmethod
+    def get_player(move: int) -> PlayerColor:
+        return Move._PLAYERS[move >> Move._PLAYER_SHIFT]
+
+    @staticmethod
+    def get_player_value(move: int) -> int:
+        """
+        Returns the PlayerColor value of the player making the move, without
+        looking up the enum.
+        """
+        return move >> Move._PLAYER_SHIFT
+
+    @staticmethod
+    def get_origin(move: int) -> Optional[int]:
+        """
+        Returns the index of the square the piece moves from, or None for a
+        placement.
+        """
+        origin: int = (move & Move._KEY_MASK) >> Move._ORIGIN_SHIFT
+        if (origin == 0):
+            return None
+
+        return origin - 1
+
+    @staticmethod
+    def get_target(move: int) -> int:
+        return move & Move._TARGET_MASK
+
+    @staticmethod
+    def get_kind(move: int) -> int:
+        return move >> Move._KIND_SHIFT & Move._KIND_MASK
+
+    @staticmethod
+    def get_key(move: int) -> int:
+        """
+        Returns the move without its kills or player, i.e. just where it moves
+        from and to. This is the encoding the transposition table stores.
+        """
+        return move & Move._KEY_MASK
+
+    @staticmethod
+    def get_killed_indices(move: int) -> List[int]:
+        """
+        Returns the indices of the squares whose pieces the move kills,
+        including the target if the moving piece is killed.
+        """
+        target: int = move & Move._TARGET_MASK
+        killed_directions: int = move >> Move._KILLS_SHIFT & Move._KILLS_MASK
+        killed: List[int] = [
+            target + offset
+            for direction_i, offset in enumerate(Move._DIRECTION_OFFSETS)
+            if killed_directions >> direction_i & 1]
+        if (Move.is_suicide(move)):
+            killed.append(target)
+
+        return killed
+
+    @staticmethod
+    def get_num_kills(move: int) -> int:
+        """
+        Returns the number of enemy pieces the move kills.
+        """
+        return bin(move >> Move._KILLS_SHIFT & Move._KILLS_MASK).count("1")
+
+    @staticmethod
+    def is_suicide(move: int) -> bool:
+        return bool(move >> Move._SUICIDE_SHIFT & 1)
+
+    @staticmethod
+    def is_capture(move: int) -> bool:
+        """
+        Returns whether the move kills any piece without the moving piece
+        being killed itself. Matches MoveOrderer.is_capture().
+        """
+        return (move >> Move._KILLS_SHIFT & Move._KILLS_MASK != 0
+                and not Move.is_suicide(move))
+
+    @staticmethod
+    def get_referee_form(move: int) \
+            -> Union[Tuple[int, int], Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Returns the move in the form the referee expects, the same as
+        Delta.get_referee_form().
+        """
+        target: int = move & Move._TARGET_MASK
+        target_form: Tuple[int, int] = (target % NUM_COLS, target // NUM_COLS)
+        origin: Optional[int] = Move.get_origin(move)
+        if (origin is None):
+            return target_form
+
+        return ((origin % NUM_COLS, origin // NUM_COLS), target_form)
@@ -0,0 +1,176 @@
+from array import array
+from typing import List, Sequence, Tuple
+
+from Classes.Delta import Delta
+from Classes.Move import Move
+from Classes.TranspositionTable import TranspositionTable
+from Enums.PlayerColor import PlayerColor
+
+
+class MoveOrderer():
+    """
+    Sorts the deltas of a position so that an alpha-beta search tries the ones
+    most likely to cause a cutoff first. In order of priority, these are:
+    1. the best move stored in the transposition table for the position,
+    2. captures, with the ones that kill the most pieces first (moves where
+       the moving piece is killed itself don't count),
+    3. the killer moves for the round, i.e. moves that recently caused a
+       cutoff in a sibling position,
+    4. every other move, by its history score - how often and how deep it has
+       caused cutoffs anywhere in the search.
+
+    A single instance is meant to be kept by a player for the whole game, so
+    that what it learns in one search carries over to the next. It works with
+    either Deltas or packed moves (see Classes.Move), through .order() and
+    .record_cutoff() or .order_moves() and .record_move_cutoff().
+    """
+
+    # Sort priorities for each source of ordering.
+    _TT_MOVE_PRIORITY: int = 3
+    _CAPTURE_PRIORITY: int = 2
+    _KILLER_PRIORITY: int = 1
+    _QUIET_PRIORITY: int = 0
+
+    _KILLERS_PER_ROUND: int = 2
+    # Killer moves are kept per round number, wrapping around after this many
+    # rounds. No search looks this far ahead, so rounds in the same search never
+    # share killer moves.
+    _NUM_KILLER_ROUNDS: int = 64
+    # The number of distinct moves encoded by TranspositionTable.encode_move().
+    _NUM_ENCODED_MOVES: int = 65 << 6
+    # History scores are scaled back down once their scale reaches
+    # 2 ** _MAX_HISTORY_SHIFT, which keeps them well within 64 bits.
+    _MAX_HISTORY_SHIFT: int = 24
+
+    # Indexed by [round_num % _NUM_KILLER_ROUNDS], most recent killer first.
+    _killers: List[List[int]]
+    # Indexed by [PlayerColor.value][encoded move].
+    _history: Tuple[array, ...]
+    # New cutoffs are added to the history scaled up by 2 ** _history_shift,
+    # so that .age_history() can halve every older score relative to them by
+    # just doubling the scale.
+    _history_shift: int
+
+    def __init__(self):
+        self._killers = [[] for _ in range(MoveOrderer._NUM_KILLER_ROUNDS)]
+        self._history = tuple(
+            array('q', [0]) * MoveOrderer._NUM_ENCODED_MOVES
+            for _ in PlayerColor)
+        self._history_shift = 0
+
+    def order(self, deltas: List[Delta], round_num: int,
+              tt_move: int = TranspositionTable.NO_MOVE) -> List[Delta]:
+        """
+        Returns the given deltas, made on a board at the given round, sorted
+        from most to least promising. 'tt_move' is the transposition table's
+        best move for the board, if there is one.
+        """
+        killers: List[int] = \
+            self._killers[round_num % MoveOrderer._NUM_KILLER_ROUNDS]
+
+        def get_sort_key(delta: Delta) -> Tuple[int, int]:
+            return self._get_sort_key(
+                TranspositionTable.encode_move(delta), delta.player.value,
+                MoveOrderer.is_capture(delta),
+                len(delta.killed_square_positions), killers, tt_move)
+
+        # Sorting is stable, so deltas that are equally promising keep the
+        # order they were generated in.
+        return sorted(deltas, key=get_sort_key, reverse=True)
+
+    def order_moves(self, moves: Sequence[int], round_num: int,
+                    tt_move: int = TranspositionTable.NO_MOVE) -> List[int]:
+        """
+        Does the same as .order(), for packed moves.
+        """
+        killers: List[int] = \
+            self._killers[round_num % MoveOrderer._NUM_KILLER_ROUNDS]
+
+        def get_sort_key(move: int) -> Tuple[int, int]:
+            return self._get_sort_key(
+                Move.get_key(move), Move.get_player_value(move),
+                Move.is_capture(move), Move.get_num_kills(move), killers,
+                tt_move)
+
+        return sorted(moves, key=get_sort_key, reverse=True)
+
+    def _get_sort_key(self, move_key: int, player_value: int,
+                      is_capture: bool, num_kills: int, killers: List[int],
+                      tt_move: int) -> Tuple[int, int]:
+        """
+        Returns the sort key of a move, given its TranspositionTable encoding
+        and the killer moves of its round.
+        """
+        if (move_key == tt_move):
+            return (MoveOrderer._TT_MOVE_PRIORITY, 0)
+
+        if (is_capture):
+            return (MoveOrderer._CAPTURE_PRIORITY, num_kills)
+
+        if (move_key in killers):
+            return (MoveOrderer._KILLER_PRIORITY, -killers.index(move_key))
+
+        return (MoveOrderer._QUIET_PRIORITY,
+                self._history[player_value][move_key])
+
+    def record_cutoff(self, delta: Delta, round_num: int, depth: int):
+        """
+        Records that the given delta, made on a board at the given round and
+        searched to the given depth, caused a beta cutoff.
+        """
+        self._record_cutoff(TranspositionTable.encode_move(delta),
+                            delta.player.value, MoveOrderer.is_capture(delta),
+                            round_num, depth)
+
+    def record_move_cutoff(self, move: int, round_num: int, depth: int):
+        """
+        Does the same as .record_cutoff(), for a packed move.
+        """
+        self._record_cutoff(Move.get_key(move), Move.get_player_value(move),
+                            Move.is_capture(move), round_num, depth)
+
+    def _record_cutoff(self, move: int, player_value: int, is_capture: bool,
+                       round_num: int, depth: int):
+        # Cutoffs found by deeper searches are more reliable, and there are
+        # far fewer of them.
+        self._history[player_value][move] += \
+            depth * depth << self._history_shift
+
+        # Captures are already searched early, so they aren't worth a killer
+        # slot.
+        if (is_capture):
+            return
+
+        killers: List[int] = \
+            self._killers[round_num % MoveOrderer._NUM_KILLER_ROUNDS]
+        if (move in killers):
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[MoveOrderer._KILLERS_PER_ROUND:]
+
+    def age_history(self):
+        """
+        Halves every history score, so that moves that were good in earlier
+        positions of the game slowly stop dominating the ordering. Meant to be
+        called once before each search.
+        """
+        self._history_shift += 1
+        if (self._history_shift < MoveOrderer._MAX_HISTORY_SHIFT):
+            return
+
+        # Only every _MAX_HISTORY_SHIFT searches are the scores themselves
+        # scaled back down.
+        for player_history in self._history:
+            for i in range(len(player_history)):
+                player_history[i] >>= MoveOrderer._MAX_HISTORY_SHIFT
+        self._history_shift = 0
+
+    @staticmethod
+    def is_capture(delta: Delta) -> bool:
+        """
+        Returns whether the given delta kills any piece without the moving
+        piece being killed itself.
+        """
+        return (len(delta.killed_square_positions) > 0
+                and delta.move_target.pos
+                not in delta.killed_square_positions)
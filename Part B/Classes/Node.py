@@ -1,7 +1,6 @@
-from typing import List
+from typing import List, Optional
 
-from Classes.Board import Board
-from Classes.Delta import Delta
+from Classes.BitBoard import BitBoard
 
 
 class Node():
@@ -15,13 +14,14 @@ class Node():
     # The number of wins recorded on the node. It is a float to allow for e.g. 2.5 which can represent 2 wins and 1
     # draw, or 1 win and 3 draws, etc.
     wins: float
-    board: Board
-    # The delta that occurred between the parent board and this one.
-    delta: Delta
+    board: BitBoard
+    # The move that occurred between the parent board and this one, packed into
+    # an int (see Classes.Move). None for the root.
+    move: Optional[int]
 
-    def __init__(self, parent, delta):
+    def __init__(self, parent, move):
         self.parent = parent
-        self.delta = delta
+        self.move = move
 
         self.children = []
         # In order to use the UCB1 function, numSimulations needs to be != 0. To solve this, we initialize and assume
@@ -0,0 +1,390 @@
+from array import array
+from typing import Iterator, Optional, Set, Tuple
+
+import numpy as np
+
+
+class NodeArena():
+    """
+    Stores the nodes of an MCTS search graph in flat typed arrays rather than
+    as Node objects. A node stands for a position rather than for a path to
+    it: nodes are keyed by a hash of their position (see
+    MCTSAgent.get_position_key()), so every order of moves that reaches the
+    same position shares one node and its statistics. The moves between
+    positions are edges, kept in arrays of their own, so a node can have any
+    number of parents. Positions never repeat within a game (the key includes
+    the round), so the graph has no cycles.
+
+    Nodes and edges are identified by their index into the arrays. Each
+    node's edges to its children form a linked list through .first_edges and
+    .next_edges, and an open addressing hash table maps keys to nodes. Every
+    array is created at full size when the arena is created, so its memory
+    use is fixed and never grows.
+
+    When the arena is full, .evict() makes room by removing the least visited
+    nodes. Eviction is never done automatically, since it could remove the
+    nodes of a simulation that is still in progress; the caller should evict
+    between simulations instead.
+    """
+
+    # The index of the root node.
+    ROOT: int = 0
+    # Used in place of a node or edge index when there is none, e.g. the first
+    # edge of a leaf.
+    NO_NODE: int = -1
+    NO_EDGE: int = -1
+    # Nodes start out with two simulations and one win, so that UCB1 can rate
+    # them before they have been simulated (see Node).
+    INITIAL_NUM_SIMULATIONS: int = 2
+    INITIAL_WINS: float = 1
+
+    # Bytes used by one node: key (8), first edge (4), number of simulations
+    # (4) and wins (8).
+    _NODE_SIZE_BYTES: int = 8 + 4 + 4 + 8
+    # Bytes used by one edge: parent (4), child (4), next edge (4) and move
+    # (4).
+    _EDGE_SIZE_BYTES: int = 4 + 4 + 4 + 4
+    _INDEX_SLOT_SIZE_BYTES: int = 4
+    # Room is made for this many edges per node, since transpositions add
+    # edges without adding nodes.
+    _EDGES_PER_NODE: float = 1.5
+    # The index is never fuller than this, which keeps its probes short.
+    _MAX_INDEX_LOAD: float = 0.75
+    # Marks an edge that is in the free list. Real parents are never below
+    # NO_NODE.
+    _FREE_EDGE: int = -2
+    # The fraction of the arena's nodes that .evict() removes directly. Nodes
+    # that can no longer be reached without them go too.
+    _EVICTION_FRACTION: float = 0.25
+
+    # Indexed by node index. Nodes that aren't in use have no simulations.
+    keys: array
+    first_edges: array
+    num_simulations: array
+    # A float to allow for draws, which count as half a win. These are the
+    # wins of the player who moved into the node's position.
+    wins: array
+
+    # Indexed by edge index. Edges whose parent is _FREE_EDGE aren't in use.
+    edge_parents: array
+    edge_children: array
+    next_edges: array
+    # The move (packed, see Classes.Move) between the parent's board and the
+    # child's.
+    edge_moves: array
+
+    max_nodes: int
+    max_edges: int
+    num_nodes: int
+    num_edges: int
+    num_evicted: int
+
+    # The nodes, edges and index slots changed since .track_changes() was
+    # called, so that just those can be saved (see TreeFile). None while
+    # changes aren't tracked. Simulation results written straight into
+    # .num_simulations and .wins are for the caller to add.
+    changed_nodes: Optional[Set[int]] = None
+    changed_edges: Optional[Set[int]] = None
+    changed_slots: Optional[Set[int]] = None
+
+    # Maps keys to nodes with linear probing: the node with key k is in the
+    # first slot from (k & ._index_mask) onwards that holds it, with no
+    # NO_NODE slots in between.
+    _index: array
+    _index_mask: int
+    # The heads of linked lists of the indices of unused nodes (through
+    # .first_edges) and of unused edges (through .next_edges).
+    _free_node_head: int
+    _free_edge_head: int
+
+    def __init__(self, max_megabytes: float, root_key: int = 0):
+        """
+        Creates an arena that uses at most 'max_megabytes' of memory, holding
+        just a root with the given key.
+        """
+        max_bytes: int = int(max_megabytes * 1024 * 1024)
+        node_bytes: float = NodeArena._NODE_SIZE_BYTES \
+            + NodeArena._EDGES_PER_NODE * NodeArena._EDGE_SIZE_BYTES
+        max_nodes: int = max(1, int(max_bytes // (
+            node_bytes
+            + NodeArena._INDEX_SLOT_SIZE_BYTES / NodeArena._MAX_INDEX_LOAD)))
+        # The index has a power of two number of slots, so that keys can be
+        # turned into slots with a mask, and the nodes get the room left.
+        num_slots: int = 1
+        while (num_slots * NodeArena._MAX_INDEX_LOAD < max_nodes):
+            num_slots *= 2
+        self.max_nodes = max(1, min(max_nodes, int(
+            (max_bytes - num_slots * NodeArena._INDEX_SLOT_SIZE_BYTES)
+            // node_bytes)))
+        self.max_edges = max(1, int(self.max_nodes
+                                    * NodeArena._EDGES_PER_NODE))
+
+        self.keys = array('Q', [0]) * self.max_nodes
+        self.first_edges = array('i', [NodeArena.NO_EDGE]) * self.max_nodes
+        self.num_simulations = array('I', [0]) * self.max_nodes
+        self.wins = array('d', [0.0]) * self.max_nodes
+        self.edge_parents = array('i', [NodeArena._FREE_EDGE]) * self.max_edges
+        self.edge_children = array('i', [NodeArena.NO_NODE]) * self.max_edges
+        self.next_edges = array('i', [NodeArena.NO_EDGE]) * self.max_edges
+        self.edge_moves = array('I', [0]) * self.max_edges
+        self._index = array('i', [NodeArena.NO_NODE]) * num_slots
+        self._index_mask = num_slots - 1
+        self.num_evicted = 0
+
+        self.clear(root_key)
+
+    def find(self, key: int) -> int:
+        """
+        Returns the node with the given key, or NO_NODE if there is none.
+        """
+        slot: int = key & self._index_mask
+        node: int = self._index[slot]
+        while (node != NodeArena.NO_NODE):
+            if (self.keys[node] == key):
+                return node
+            slot = (slot + 1) & self._index_mask
+            node = self._index[slot]
+
+        return NodeArena.NO_NODE
+
+    def add_child(self, parent: int, move: int, key: int) -> int:
+        """
+        Adds an edge for the given packed move from the given node to the node
+        with the given key, adding that node as well if there isn't one yet,
+        and returns the child's index. Returns NO_NODE if the arena is full.
+        """
+        child: int = self.find(key)
+        if (self._free_edge_head == NodeArena.NO_EDGE
+                or (child == NodeArena.NO_NODE
+                    and self._free_node_head == NodeArena.NO_NODE)):
+            return NodeArena.NO_NODE
+
+        if (child == NodeArena.NO_NODE):
+            child = self._allocate_node(key)
+
+        edge: int = self._free_edge_head
+        self._free_edge_head = self.next_edges[edge]
+        self.edge_parents[edge] = parent
+        self.edge_children[edge] = child
+        self.edge_moves[edge] = move
+        self.next_edges[edge] = self.first_edges[parent]
+        self.first_edges[parent] = edge
+        self.num_edges += 1
+        if (self.changed_edges is not None):
+            self.changed_edges.add(edge)
+            self.changed_nodes.add(parent)
+
+        return child
+
+    def get_edges(self, node: int) -> Iterator[int]:
+        """
+        Yields the indices of the given node's edges to its children.
+        """
+        edge: int = self.first_edges[node]
+        while (edge != NodeArena.NO_EDGE):
+            yield edge
+            edge = self.next_edges[edge]
+
+    def get_children(self, node: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields a (child node, packed move) pair for each of the given node's
+        edges.
+        """
+        for edge in self.get_edges(node):
+            yield (self.edge_children[edge], self.edge_moves[edge])
+
+    def get_num_free(self) -> int:
+        """
+        Returns how many more children can certainly be added.
+        """
+        return min(self.max_nodes - self.num_nodes,
+                   self.max_edges - self.num_edges)
+
+    def track_changes(self, is_tracking: bool):
+        """
+        Starts (with nothing changed yet) or stops keeping .changed_nodes,
+        .changed_edges and .changed_slots.
+        """
+        (self.changed_nodes, self.changed_edges, self.changed_slots) = \
+            (set(), set(), set()) if is_tracking else (None, None, None)
+
+    def evict(self):
+        """
+        Removes a quarter of the arena's nodes (if there are that many besides
+        the root), least visited first, together with every node that can no
+        longer be reached from the root without them.
+        """
+        target: int = int(self.max_nodes * NodeArena._EVICTION_FRACTION)
+
+        # The arena can hold tens of millions of nodes, so pick them with NumPy
+        # (on views of the arrays, which copies nothing) rather than sorting
+        # every node in Python.
+        num_simulations: np.ndarray = \
+            np.frombuffer(self.num_simulations, dtype=np.uintc)
+        is_live: np.ndarray = num_simulations != 0
+        is_live[NodeArena.ROOT] = False
+        evicted: np.ndarray = np.flatnonzero(is_live)
+        if (len(evicted) > target):
+            evicted = evicted[np.argpartition(num_simulations[evicted],
+                                              target)[:target]]
+        is_live[NodeArena.ROOT] = True
+        is_live[evicted] = False
+
+        num_nodes: int = self.num_nodes
+        self._collect_garbage(is_live, NodeArena.ROOT)
+        self._rebuild()
+        self.num_evicted += num_nodes - self.num_nodes
+
+    def promote(self, node: int):
+        """
+        Makes the given node the new root, keeping every node that can be
+        reached from it and freeing the rest. Used to carry the graph on from
+        one turn to the next. The new root takes the index ROOT, so the
+        indices of the node and of the nodes freed change.
+        """
+        self._collect_garbage(
+            np.frombuffer(self.num_simulations, dtype=np.uintc) != 0, node)
+
+        # The old root is gone, so the node can move into its place. All of the
+        # node's parents were freed, since none of them can be reached from it.
+        self.keys[NodeArena.ROOT] = self.keys[node]
+        self.num_simulations[NodeArena.ROOT] = self.num_simulations[node]
+        self.wins[NodeArena.ROOT] = self.wins[node]
+        self.num_simulations[node] = 0
+        edge_parents: np.ndarray = \
+            np.frombuffer(self.edge_parents, dtype=np.intc)
+        edge_parents[edge_parents == node] = NodeArena.ROOT
+
+        self._rebuild()
+
+    def clear(self, root_key: int):
+        """
+        Frees every node and edge, leaving just a fresh root with the given
+        key.
+        """
+        np.frombuffer(self.num_simulations, dtype=np.uintc)[:] = 0
+        np.frombuffer(self.edge_parents, dtype=np.intc)[:] = \
+            NodeArena._FREE_EDGE
+        self.keys[NodeArena.ROOT] = root_key
+        self.num_simulations[NodeArena.ROOT] = \
+            NodeArena.INITIAL_NUM_SIMULATIONS
+        self.wins[NodeArena.ROOT] = NodeArena.INITIAL_WINS
+
+        self._rebuild()
+
+    def _allocate_node(self, key: int) -> int:
+        node: int = self._free_node_head
+        self._free_node_head = self.first_edges[node]
+        self.keys[node] = key
+        self.first_edges[node] = NodeArena.NO_EDGE
+        self.num_simulations[node] = NodeArena.INITIAL_NUM_SIMULATIONS
+        self.wins[node] = NodeArena.INITIAL_WINS
+        self.num_nodes += 1
+
+        slot: int = key & self._index_mask
+        while (self._index[slot] != NodeArena.NO_NODE):
+            slot = (slot + 1) & self._index_mask
+        self._index[slot] = node
+        if (self.changed_nodes is not None):
+            self.changed_nodes.add(node)
+            self.changed_slots.add(slot)
+
+        return node
+
+    def _collect_garbage(self, is_live: np.ndarray, keep: int):
+        """
+        Frees the nodes that aren't marked in 'is_live', then every other node
+        but 'keep' that is left without a parent, and so on, along with the
+        edges to and from them. ._rebuild() has to be called afterwards.
+        """
+        edge_parents: np.ndarray = \
+            np.frombuffer(self.edge_parents, dtype=np.intc)
+        edge_children: np.ndarray = \
+            np.frombuffer(self.edge_children, dtype=np.intc)
+        is_edge_live: np.ndarray = edge_parents != NodeArena._FREE_EDGE
+        # Each pass frees the nodes whose parents were all freed by the one
+        # before, so this takes about as many passes as the part of the graph
+        # being freed is deep.
+        while (True):
+            live_edges: np.ndarray = np.flatnonzero(is_edge_live)
+            is_edge_live[live_edges] = (is_live[edge_parents[live_edges]]
+                                        & is_live[edge_children[live_edges]])
+            num_parents: np.ndarray = np.bincount(
+                edge_children[is_edge_live], minlength=self.max_nodes)
+            is_orphan: np.ndarray = is_live & (num_parents == 0)
+            is_orphan[keep] = False
+            if (not is_orphan.any()):
+                break
+            is_live &= ~is_orphan
+
+        np.frombuffer(self.num_simulations, dtype=np.uintc)[~is_live] = 0
+        edge_parents[~is_edge_live] = NodeArena._FREE_EDGE
+
+    def _rebuild(self):
+        """
+        Rebuilds the edge lists, the free lists, the index and the counts from
+        which nodes have simulations and which edges have a parent.
+        """
+        num_simulations: np.ndarray = \
+            np.frombuffer(self.num_simulations, dtype=np.uintc)
+        first_edges: np.ndarray = \
+            np.frombuffer(self.first_edges, dtype=np.intc)
+        edge_parents: np.ndarray = \
+            np.frombuffer(self.edge_parents, dtype=np.intc)
+        next_edges: np.ndarray = np.frombuffer(self.next_edges, dtype=np.intc)
+
+        # Link up each node's edges, grouped by parent with NumPy.
+        live_edges: np.ndarray = \
+            np.flatnonzero(edge_parents != NodeArena._FREE_EDGE)
+        live_edges = live_edges[np.argsort(edge_parents[live_edges],
+                                           kind="stable")]
+        first_edges[:] = NodeArena.NO_EDGE
+        if (len(live_edges) > 0):
+            parents: np.ndarray = edge_parents[live_edges]
+            is_last: np.ndarray = np.append(parents[1:] != parents[:-1], True)
+            is_first: np.ndarray = np.insert(is_last[:-1], 0, True)
+            next_edges[live_edges[:-1]] = live_edges[1:]
+            next_edges[live_edges[is_last]] = NodeArena.NO_EDGE
+            first_edges[parents[is_first]] = live_edges[is_first]
+
+        live_nodes: np.ndarray = np.flatnonzero(num_simulations != 0)
+        self._free_node_head = NodeArena._link(
+            first_edges, np.flatnonzero(num_simulations == 0))
+        self._free_edge_head = NodeArena._link(
+            next_edges, np.flatnonzero(edge_parents == NodeArena._FREE_EDGE))
+        self.num_nodes = len(live_nodes)
+        self.num_edges = len(live_edges)
+
+        # Insert all of the keys at once. Each pass puts every waiting key into
+        # the next slot of its probe sequence, if that slot is empty and no
+        # other key wants it. Slots are never emptied again, so every key still
+        # ends up with no empty slot before it.
+        index: np.ndarray = np.frombuffer(self._index, dtype=np.intc)
+        index[:] = NodeArena.NO_NODE
+        waiting: np.ndarray = live_nodes
+        slots: np.ndarray = (np.frombuffer(self.keys, dtype=np.uint64)[waiting]
+                             & np.uint64(self._index_mask)).astype(np.int64)
+        while (len(waiting) > 0):
+            is_empty: np.ndarray = index[slots] == NodeArena.NO_NODE
+            (filled_slots, first_i) = np.unique(slots[is_empty],
+                                                return_index=True)
+            placed: np.ndarray = np.flatnonzero(is_empty)[first_i]
+            index[filled_slots] = waiting[placed]
+            is_waiting: np.ndarray = np.ones(len(waiting), dtype=bool)
+            is_waiting[placed] = False
+            waiting = waiting[is_waiting]
+            slots = (slots[is_waiting] + 1) & self._index_mask
+
+    @staticmethod
+    def _link(next_indices: np.ndarray, indices: np.ndarray) -> int:
+        """
+        Links the given indices into a list (in order) through
+        'next_indices', and returns its head, or -1 if there are none.
+        """
+        if (len(indices) == 0):
+            return -1
+
+        next_indices[indices[:-1]] = indices[1:]
+        next_indices[indices[-1]] = -1
+
+        return int(indices[0])
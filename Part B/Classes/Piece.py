@@ -3,23 +3,17 @@ from Enums.PlayerColor import PlayerColor
 
 class Piece():
     """
-    A structure that represents a piece on the board.
+    A structure that represents a piece on the board. Pieces have no identity
+    of their own: two pieces are equal if they belong to the same player.
     """
 
+    __slots__ = ("owner",)
+
     # The player that the piece belongs to.
     owner: PlayerColor
 
-    # This is a counter used to uniquely identify every instance of Piece in the
-    # game. This comes into play when a piece jumps over an enemy piece. We want
-    # to ensure that the piece that ends up on the other side of the enemy piece
-    # is not the same from the original position (see implementation of
-    # board._get_killed_positions()).
-    _id: int = 0
-
     def __init__(self, owner: PlayerColor):
         self.owner = owner
-        self._id = Piece._id
-        Piece._id += 1
 
     def get_representation(self):
         """
@@ -33,9 +27,7 @@ class Piece():
         """
         Compares two piece objects.
         """
-        return self._id == other._id
+        return isinstance(other, Piece) and self.owner == other.owner
 
     def __hash__(self):
-        components = (self.owner, self._id)
-
-        return hash(components)
\ No newline at end of file
+        return hash(self.owner)
\ No newline at end of file
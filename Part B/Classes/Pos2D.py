@@ -1,32 +1,53 @@
+from typing import List
+
+
 class Pos2D():
     """
-    Represents a 2D position.
+    Represents a 2D position. Pos2Ds are immutable, and there is only ever one
+    instance for each position on the board: constructing a Pos2D for an
+    on-board position returns the shared instance rather than a new one. Only
+    positions off the board (e.g. offsets such as Pos2D(1, -1)) create new
+    instances.
     """
 
+    __slots__ = ("x", "y")
+
     # Two ints to represent the 2D position.
     x: int
     y: int
 
-    def __init__(self, x: int, y: int):
-        assert(type(x) == int)
-        assert(type(y) == int)
+    # The size of the board whose positions are shared.
+    _NUM_COLS: int = 8
+    _NUM_ROWS: int = 8
+    # The shared instances, indexed by y * _NUM_COLS + x (the square index, see
+    # Misc.BoardTables.get_index).
+    _interned: List['Pos2D'] = []
+
+    def __new__(cls, x: int, y: int) -> 'Pos2D':
+        if (0 <= x < Pos2D._NUM_COLS and 0 <= y < Pos2D._NUM_ROWS
+                and len(Pos2D._interned) == Pos2D._NUM_COLS * Pos2D._NUM_ROWS):
+            return Pos2D._interned[y * Pos2D._NUM_COLS + x]
+
+        pos: Pos2D = object.__new__(cls)
+        # Bypass __setattr__, which forbids changing a Pos2D.
+        object.__setattr__(pos, "x", x)
+        object.__setattr__(pos, "y", y)
 
-        self.x = x
-        self.y = y
+        return pos
 
     def get_referee_form(self):
         return (self.x, self.y)
 
     def __add__(self, other: 'Pos2D'):
         """
-        Returns a new Pos2D with 'x' and 'y' added to the calling instance's
+        Returns a Pos2D with 'x' and 'y' added to the calling instance's
         corresponding values. Allows for simple pos1 + pos2 notation.
         """
         return Pos2D(self.x + other.x, self.y + other.y)
 
     def __sub__(self, other: 'Pos2D'):
         """
-        Returns a new Pos2D with respective values of 'other' subtracted from
+        Returns a Pos2D with respective values of 'other' subtracted from
         'self'. Allows for simple pos1 - pos2 notation.
         """
         return Pos2D(self.x - other.x, self.y - other.y)
@@ -38,17 +59,49 @@ class Pos2D():
         """
         return "({}, {})".format(self.x, self.y)
 
+    def __setattr__(self, name: str, value):
+        """
+        Pos2Ds are shared between every board, so changing one would move a
+        square on all of them.
+        """
+        raise AttributeError("Pos2D instances are immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError("Pos2D instances are immutable")
+
+    def __copy__(self) -> 'Pos2D':
+        """
+        Pos2Ds are immutable, so copies (including the deep copies made of
+        boards) can share the same instance.
+        """
+        return self
+
+    def __deepcopy__(self, memodict={}) -> 'Pos2D':
+        return self
+
+    def __reduce__(self):
+        """
+        Unpickled Pos2Ds go through __new__, so that on-board positions get the
+        shared instance.
+        """
+        return (Pos2D, (self.x, self.y))
+
     def __hash__(self) -> int:
         """
         Since we use Pos2Ds as keys in Board.squares (which is a Dict[Pos2D,
         Square]), we need to define a hash function so that Python knows how to
-        hash them.
+        hash them. On-board positions hash to their square index, which is
+        unique and cheap to compute.
         """
-        return hash((self.x, self.y))
+        return self.y * Pos2D._NUM_COLS + self.x
 
     def __eq__(self, other: 'Pos2D') -> bool:
         """
         Used to compare if two Pos2Ds are equal or not. Also required in order
         to make Pos2Ds usable as dictionary keys.
         """
-        return (self.x, self.y) == (other.x, other.y)
+        return self is other or (self.x, self.y) == (other.x, other.y)
+
+
+Pos2D._interned = [Pos2D(i % Pos2D._NUM_COLS, i // Pos2D._NUM_COLS)
+                   for i in range(Pos2D._NUM_COLS * Pos2D._NUM_ROWS)]
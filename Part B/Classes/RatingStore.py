@@ -0,0 +1,213 @@
+from math import exp, log, pi, sqrt
+from typing import Dict, List, Sequence, Tuple
+
+
+class Rating():
+    """
+    A player's Glicko-2 rating, on the usual Glicko scale: 'rating' starts at
+    1500, and 'deviation' is how uncertain it is, starting at 350.
+    """
+
+    rating: float
+    deviation: float
+    volatility: float
+
+    def __init__(self, rating: float, deviation: float, volatility: float):
+        self.rating = rating
+        self.deviation = deviation
+        self.volatility = volatility
+
+
+class RatingStore():
+    """
+    Keeps a Glicko-2 rating for every set of parameters that has played, so
+    that what was learnt about players carries over from one generation to the
+    next. Ratings are updated after every game, each game counting as a rating
+    period of its own.
+
+    A new set of parameters starts from the mean rating of the parameters it
+    was made from, if any (see .add_child()), with its deviation widened by
+    _CHILD_DEVIATION to allow for how much it may differ from them.
+    """
+
+    INITIAL_RATING: float = 1500.0
+    INITIAL_DEVIATION: float = 350.0
+    INITIAL_VOLATILITY: float = 0.06
+
+    # How much a child's rating may differ from its parents' mean.
+    _CHILD_DEVIATION: float = 100.0
+    # Constrains how fast volatility changes. Glickman suggests 0.3 to 1.2.
+    _TAU: float = 0.5
+    # Converts between the Glicko and Glicko-2 scales.
+    _SCALE: float = 400 / log(10)
+    # The tolerance of the volatility update.
+    _EPSILON: float = 1e-6
+
+    # Keyed by the parameters, as a tuple.
+    _ratings: Dict[Tuple[float, ...], Rating]
+
+    def __init__(self):
+        self._ratings = {}
+
+    def get(self, parameters: Sequence[float]) -> Rating:
+        """
+        Returns the rating of the given parameters, which is the initial
+        rating if they haven't been seen before.
+        """
+        return self._ratings.get(
+            tuple(parameters), Rating(RatingStore.INITIAL_RATING,
+                                      RatingStore.INITIAL_DEVIATION,
+                                      RatingStore.INITIAL_VOLATILITY))
+
+    def add_child(self, parameters: Sequence[float],
+                  parents: Sequence[Sequence[float]]):
+        """
+        Gives the given parameters a starting rating made from the ratings of
+        the parameters they were bred from, unless they already have one.
+        """
+        if (tuple(parameters) in self._ratings):
+            return
+
+        ratings: List[Rating] = [self.get(parent) for parent in parents]
+        deviation: float = sqrt(
+            sum(rating.deviation ** 2 for rating in ratings) / len(ratings)
+            + RatingStore._CHILD_DEVIATION ** 2)
+        self._ratings[tuple(parameters)] = Rating(
+            sum(rating.rating for rating in ratings) / len(ratings),
+            min(deviation, RatingStore.INITIAL_DEVIATION),
+            sum(rating.volatility for rating in ratings) / len(ratings))
+
+    def add_result(self, parameters1: Sequence[float],
+                   parameters2: Sequence[float], score: float):
+        """
+        Updates the ratings of both sets of parameters after a game between
+        them, in which the first scored 'score': 1 for a win, 0 for a loss and
+        0.5 for a draw.
+        """
+        rating1: Rating = self.get(parameters1)
+        rating2: Rating = self.get(parameters2)
+        self._ratings[tuple(parameters1)] = \
+            RatingStore._get_updated(rating1, rating2, score)
+        self._ratings[tuple(parameters2)] = \
+            RatingStore._get_updated(rating2, rating1, 1 - score)
+
+    def get_expected_score(self, parameters1: Sequence[float],
+                           parameters2: Sequence[float]) -> float:
+        """
+        Returns the score the first set of parameters is expected to get in a
+        game against the second, allowing for the uncertainty of both ratings.
+        """
+        rating1: Rating = self.get(parameters1)
+        rating2: Rating = self.get(parameters2)
+        deviation: float = sqrt(rating1.deviation ** 2
+                                + rating2.deviation ** 2)
+        return RatingStore._get_expected_score(
+            rating1.rating / RatingStore._SCALE,
+            rating2.rating / RatingStore._SCALE,
+            deviation / RatingStore._SCALE)
+
+    def to_list(self) -> List[list]:
+        """
+        Returns every rating as a [parameters, rating, deviation, volatility]
+        list, for saving as JSON.
+        """
+        return [[list(parameters), rating.rating, rating.deviation,
+                 rating.volatility]
+                for (parameters, rating) in self._ratings.items()]
+
+    @staticmethod
+    def from_list(ratings: List[list]) -> 'RatingStore':
+        """
+        Returns a store with the ratings returned by .to_list().
+        """
+        store: RatingStore = RatingStore()
+        for (parameters, rating, deviation, volatility) in ratings:
+            store._ratings[tuple(parameters)] = \
+                Rating(rating, deviation, volatility)
+        return store
+
+    @staticmethod
+    def _get_updated(rating: Rating, opponent: Rating,
+                     score: float) -> Rating:
+        """
+        Returns the given rating after a rating period of a single game,
+        following steps 2 to 8 of Glickman's "Example of the Glicko-2 system".
+        """
+        mu: float = (rating.rating - RatingStore.INITIAL_RATING) \
+            / RatingStore._SCALE
+        phi: float = rating.deviation / RatingStore._SCALE
+        opponent_mu: float = \
+            (opponent.rating - RatingStore.INITIAL_RATING) / RatingStore._SCALE
+        opponent_phi: float = opponent.deviation / RatingStore._SCALE
+
+        g: float = RatingStore._g(opponent_phi)
+        expected_score: float = \
+            RatingStore._get_expected_score(mu, opponent_mu, opponent_phi)
+        variance: float = 1 / (g ** 2 * expected_score * (1 - expected_score))
+        delta: float = variance * g * (score - expected_score)
+
+        volatility: float = RatingStore._get_updated_volatility(
+            phi, rating.volatility, variance, delta)
+        phi = 1 / sqrt(1 / (phi ** 2 + volatility ** 2) + 1 / variance)
+        mu += phi ** 2 * g * (score - expected_score)
+
+        return Rating(mu * RatingStore._SCALE + RatingStore.INITIAL_RATING,
+                      min(phi * RatingStore._SCALE,
+                          RatingStore.INITIAL_DEVIATION),
+                      volatility)
+
+    @staticmethod
+    def _get_updated_volatility(phi: float, volatility: float,
+                                variance: float, delta: float) -> float:
+        """
+        Returns the new volatility of a rating, found with the Illinois
+        algorithm as in step 5 of Glickman's example.
+        """
+        a: float = log(volatility ** 2)
+
+        def f(x: float) -> float:
+            return (exp(x) * (delta ** 2 - phi ** 2 - variance - exp(x))
+                    / (2 * (phi ** 2 + variance + exp(x)) ** 2)
+                    - (x - a) / RatingStore._TAU ** 2)
+
+        lower: float = a
+        upper: float
+        if (delta ** 2 > phi ** 2 + variance):
+            upper = log(delta ** 2 - phi ** 2 - variance)
+        else:
+            k: int = 1
+            while (f(a - k * RatingStore._TAU) < 0):
+                k += 1
+            upper = a - k * RatingStore._TAU
+
+        f_lower: float = f(lower)
+        f_upper: float = f(upper)
+        while (abs(upper - lower) > RatingStore._EPSILON):
+            middle: float = lower + (lower - upper) * f_lower \
+                / (f_upper - f_lower)
+            f_middle: float = f(middle)
+            if (f_middle * f_upper <= 0):
+                lower = upper
+                f_lower = f_upper
+            else:
+                f_lower /= 2
+            upper = middle
+            f_upper = f_middle
+
+        return exp(lower / 2)
+
+    @staticmethod
+    def _g(phi: float) -> float:
+        """
+        Returns how much a result against an opponent with the given deviation
+        (on the Glicko-2 scale) counts.
+        """
+        return 1 / sqrt(1 + 3 * phi ** 2 / pi ** 2)
+
+    @staticmethod
+    def _get_expected_score(mu: float, opponent_mu: float,
+                            opponent_phi: float) -> float:
+        """
+        Returns the expected score against an opponent, on the Glicko-2 scale.
+        """
+        return 1 / (1 + exp(-RatingStore._g(opponent_phi) * (mu - opponent_mu)))
@@ -10,6 +10,8 @@ class Square():
     A structure that represents a square on a board.
     """
 
+    __slots__ = ("pos", "occupant", "state")
+
     # A 2D coordinate object to indicate the location of the square on the
     # board.
     pos: Pos2D
@@ -0,0 +1,174 @@
+from array import array
+from typing import Optional, Tuple
+
+from Classes.Delta import Delta
+from Misc.BoardTables import get_index
+
+
+class TranspositionTable():
+    """
+    A fixed-size hash table of search results, keyed by position hash. It lets
+    a search reuse the value of a position it has already searched when that
+    position is reached again through a different order of moves.
+
+    The table is made of buckets of two slots each. The first slot of a bucket
+    is depth-preferred: it is only replaced by results searched at least as
+    deep. The second slot is always replaced. Every field is stored in a flat
+    typed array, so the table's memory use is fixed when it is created and
+    never grows.
+    """
+
+    # Bound types describing how a stored value relates to the true value of
+    # the position.
+    EXACT: int = 0
+    # The true value is at least the stored value (the search failed high).
+    LOWER_BOUND: int = 1
+    # The true value is at most the stored value (the search failed low).
+    UPPER_BOUND: int = 2
+
+    # Stored in place of a move when no best move is known.
+    NO_MOVE: int = 0xFFFF
+
+    _SLOTS_PER_BUCKET: int = 2
+    # Bytes used by one slot: key (8), depth (1), bound type (1), value (8)
+    # and move (2).
+    _SLOT_SIZE_BYTES: int = 8 + 1 + 1 + 8 + 2
+    # Marks an empty slot (real depths are never negative).
+    _EMPTY_DEPTH: int = -1
+
+    num_probes: int
+    num_hits: int
+    num_stores: int
+    # The number of stores that replaced an entry for a different position.
+    num_overwrites: int
+
+    _bucket_mask: int
+    _keys: array
+    _depths: array
+    _bound_types: array
+    _values: array
+    _moves: array
+
+    def __init__(self, max_megabytes: float):
+        """
+        Creates a table that uses at most 'max_megabytes' of memory. The number
+        of buckets is rounded down to a power of two so that a hash can be
+        turned into a bucket index with a mask.
+        """
+        max_num_buckets: int = int(max_megabytes * 1024 * 1024) \
+            // (TranspositionTable._SLOT_SIZE_BYTES
+                * TranspositionTable._SLOTS_PER_BUCKET)
+        num_buckets: int = 1
+        while (num_buckets * 2 <= max_num_buckets):
+            num_buckets *= 2
+
+        num_slots: int = num_buckets * TranspositionTable._SLOTS_PER_BUCKET
+        self._bucket_mask = num_buckets - 1
+        self._keys = array('Q', [0]) * num_slots
+        self._depths = array('b', [TranspositionTable._EMPTY_DEPTH]) * num_slots
+        self._bound_types = array('b', [0]) * num_slots
+        self._values = array('d', [0.0]) * num_slots
+        self._moves = array('H', [TranspositionTable.NO_MOVE]) * num_slots
+
+        self.num_probes = 0
+        self.num_hits = 0
+        self.num_stores = 0
+        self.num_overwrites = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, int]]:
+        """
+        Looks up the given position hash. Returns a (depth, bound type, value,
+        move) tuple if the position is in the table, or None otherwise.
+        """
+        self.num_probes += 1
+
+        slot: int = (key & self._bucket_mask) \
+            * TranspositionTable._SLOTS_PER_BUCKET
+        for slot_i in (slot, slot + 1):
+            if (self._keys[slot_i] == key
+                    and self._depths[slot_i]
+                    != TranspositionTable._EMPTY_DEPTH):
+                self.num_hits += 1
+                return (self._depths[slot_i], self._bound_types[slot_i],
+                        self._values[slot_i], self._moves[slot_i])
+
+        return None
+
+    def store(self, key: int, depth: int, bound_type: int, value: float,
+              move: int = NO_MOVE):
+        """
+        Stores a search result for the given position hash. 'move' is the best
+        move found, encoded with .encode_move().
+        """
+        self.num_stores += 1
+
+        slot: int = (key & self._bucket_mask) \
+            * TranspositionTable._SLOTS_PER_BUCKET
+        if (self._keys[slot] == key
+                or depth >= self._depths[slot]):
+            # Use the depth-preferred slot. If it holds a different position,
+            # move that result down into the always-replace slot rather than
+            # losing it.
+            if (self._keys[slot] != key
+                    and self._depths[slot] != TranspositionTable._EMPTY_DEPTH):
+                self._copy_slot(slot, slot + 1)
+        else:
+            slot += 1
+            if (self._keys[slot] != key
+                    and self._depths[slot] != TranspositionTable._EMPTY_DEPTH):
+                self.num_overwrites += 1
+
+        # Keep the old best move if the new result doesn't have one.
+        if (move == TranspositionTable.NO_MOVE and self._keys[slot] == key):
+            move = self._moves[slot]
+
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._bound_types[slot] = bound_type
+        self._values[slot] = value
+        self._moves[slot] = move
+
+    def _copy_slot(self, from_slot: int, to_slot: int):
+        """
+        Copies an entry from one slot to another, counting the entry that was
+        in 'to_slot' as overwritten.
+        """
+        if (self._depths[to_slot] != TranspositionTable._EMPTY_DEPTH
+                and self._keys[to_slot] != self._keys[from_slot]):
+            self.num_overwrites += 1
+
+        self._keys[to_slot] = self._keys[from_slot]
+        self._depths[to_slot] = self._depths[from_slot]
+        self._bound_types[to_slot] = self._bound_types[from_slot]
+        self._values[to_slot] = self._values[from_slot]
+        self._moves[to_slot] = self._moves[from_slot]
+
+    def get_hit_rate(self) -> float:
+        """
+        Returns the fraction of probes that found their position.
+        """
+        if (self.num_probes == 0):
+            return 0.0
+
+        return self.num_hits / self.num_probes
+
+    def get_stats(self) -> str:
+        """
+        Returns a one-line summary of the table's counters, for printing.
+        """
+        return "TT: {} probes, {} hits ({:.1%}), {} stores, {} overwrites"\
+            .format(self.num_probes, self.num_hits, self.get_hit_rate(),
+                    self.num_stores, self.num_overwrites)
+
+    @staticmethod
+    def encode_move(delta: Delta) -> int:
+        """
+        Encodes the origin and target squares of a delta into an int that fits
+        in the table's move array. Placements have no origin and use 0 for it.
+        Move.get_key() gives the same encoding for packed moves.
+        """
+        origin: int = 0
+        if (delta.move_origin is not None):
+            origin = get_index(delta.move_origin.pos) + 1
+
+        return origin << 6 | get_index(delta.move_target.pos)
@@ -0,0 +1,301 @@
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from Classes.Move import Move
+from Classes.NodeArena import NodeArena
+
+
+class TreeFile():
+    """
+    An MCTS search graph (see NodeArena) saved to disk, read with mmap so
+    that a player can look nodes up without reading the whole file into
+    memory. Only the pages holding the records a lookup reads are mapped, and
+    only while they are read: the referee counts every mapped byte against a
+    player's memory limit, whether it is read or not.
+
+    The file is a fixed-size header followed by three tables of fixed-width
+    records, each with one record per arena slot, in slot order: the nodes
+    (key, first edge, number of simulations and wins), the edges (parent,
+    child, next edge and packed move) and the slots of the arena's key index.
+    Every record is therefore always at the same offset. The index finds the
+    node for a position from its key (see MCTSAgent.get_position_key())
+    directly, and the edges lead on from there, so a lookup only reads the
+    handful of records it needs. Unused slots are saved too, which keeps the
+    free lists intact and lets training resume from the file.
+
+    The static methods write and load files. Creating an instance opens one
+    for reading.
+    """
+
+    _MAGIC: bytes = b"MCTSTREE"
+    _VERSION: int = 2
+    # Magic, version, number of node slots, edge slots and index slots,
+    # number of nodes and edges in use, number of nodes evicted so far and the
+    # heads of the free lists of nodes and edges.
+    _HEADER: struct.Struct = struct.Struct("<8sIIIIIIQii")
+    _NODE_RECORD: struct.Struct = struct.Struct("<QiId")
+    _NODE_DTYPE: np.dtype = np.dtype([
+        ("key", "<u8"), ("first_edge", "<i4"), ("num_simulations", "<u4"),
+        ("wins", "<f8")])
+    _EDGE_RECORD: struct.Struct = struct.Struct("<iiiI")
+    _EDGE_DTYPE: np.dtype = np.dtype([
+        ("parent", "<i4"), ("child", "<i4"), ("next_edge", "<i4"),
+        ("move", "<u4")])
+    _SLOT_RECORD: struct.Struct = struct.Struct("<i")
+
+    max_nodes: int
+    max_edges: int
+    num_nodes: int
+
+    _file = None
+    _num_slots: int
+    _nodes_offset: int
+    _edges_offset: int
+    _index_offset: int
+
+    def __init__(self, path: str):
+        """
+        Opens the graph saved at the given path for reading.
+        """
+        self._file = open(path, "rb")
+        (self.max_nodes, self.max_edges, self._num_slots, self.num_nodes, _, _,
+         _, _) = TreeFile._unpack_header(
+            self._file.read(TreeFile._HEADER.size))
+        (self._nodes_offset, self._edges_offset, self._index_offset) = \
+            TreeFile._get_offsets(self.max_nodes, self.max_edges)
+
+    def close(self):
+        self._file.close()
+
+    def find(self, key: int) -> int:
+        """
+        Returns the node for the position with the given key, or
+        NodeArena.NO_NODE if it isn't in the graph.
+        """
+        mask: int = self._num_slots - 1
+        slot: int = key & mask
+        node: int = self._read_slot(slot)
+        while (node != NodeArena.NO_NODE):
+            if (self._read_node(node)[0] == key):
+                return node
+            slot = (slot + 1) & mask
+            node = self._read_slot(slot)
+
+        return NodeArena.NO_NODE
+
+    def get_children(self, node: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields a (child node, packed move) pair for each of the given node's
+        edges.
+        """
+        edge: int = self._read_node(node)[1]
+        while (edge != NodeArena.NO_EDGE):
+            (_, child, next_edge, move) = self._read(
+                TreeFile._EDGE_RECORD,
+                self._edges_offset + edge * TreeFile._EDGE_RECORD.size)
+            yield (child, move)
+            edge = next_edge
+
+    def find_child(self, node: int, move: int) -> int:
+        """
+        Returns the child of the given node that is reached by the given
+        packed move, or NodeArena.NO_NODE if it isn't in the graph. Moves are
+        matched by their origin and target only (see Move.get_key()).
+        """
+        key: int = Move.get_key(move)
+        return next((child for child, child_move in self.get_children(node)
+                     if Move.get_key(child_move) == key), NodeArena.NO_NODE)
+
+    def get_best_move(self, node: int) -> Optional[int]:
+        """
+        Returns the packed move to the given node's child with the most
+        simulations, or None if it has no children.
+        """
+        best_move: Optional[int] = None
+        best_num_simulations: int = -1
+        for child, move in self.get_children(node):
+            if (self.get_num_simulations(child) > best_num_simulations):
+                best_move = move
+                best_num_simulations = self.get_num_simulations(child)
+
+        return best_move
+
+    def get_num_simulations(self, node: int) -> int:
+        return self._read_node(node)[2]
+
+    def get_wins(self, node: int) -> float:
+        return self._read_node(node)[3]
+
+    def _read_node(self, node: int) -> Tuple[int, int, int, float]:
+        """
+        Returns the (key, first edge, number of simulations, wins) record of
+        the given node.
+        """
+        return self._read(
+            TreeFile._NODE_RECORD,
+            self._nodes_offset + node * TreeFile._NODE_RECORD.size)
+
+    def _read_slot(self, slot: int) -> int:
+        """
+        Returns the node in the given slot of the key index.
+        """
+        return self._read(
+            TreeFile._SLOT_RECORD,
+            self._index_offset + slot * TreeFile._SLOT_RECORD.size)[0]
+
+    def _read(self, record: struct.Struct, offset: int) -> tuple:
+        """
+        Returns the record of the given format at the given offset, mapping
+        just the pages it is on.
+        """
+        start: int = offset - offset % mmap.ALLOCATIONGRANULARITY
+        with mmap.mmap(self._file.fileno(), offset + record.size - start,
+                       access=mmap.ACCESS_READ, offset=start) as window:
+            return record.unpack_from(window, offset - start)
+
+    @staticmethod
+    def save(tree: NodeArena, path: str):
+        """
+        Writes the whole graph to the given path. The file is written under a
+        temporary name first and then moved into place, so an existing file is
+        never left half-written.
+        """
+        (node_fields, edge_fields, index) = TreeFile._get_fields(tree)
+        nodes: np.ndarray = np.empty(tree.max_nodes,
+                                     dtype=TreeFile._NODE_DTYPE)
+        for field, values, dtype in node_fields:
+            nodes[field] = np.frombuffer(values, dtype=dtype)
+        edges: np.ndarray = np.empty(tree.max_edges,
+                                     dtype=TreeFile._EDGE_DTYPE)
+        for field, values, dtype in edge_fields:
+            edges[field] = np.frombuffer(values, dtype=dtype)
+
+        temp_path: str = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(TreeFile._pack_header(tree))
+            nodes.tofile(file)
+            edges.tofile(file)
+            np.frombuffer(index, dtype=np.intc).astype("<i4").tofile(file)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def save_changes(tree: NodeArena, path: str, nodes: Iterable[int],
+                     edges: Iterable[int], slots: Iterable[int]):
+        """
+        Updates the records of just the given nodes, edges and index slots
+        (and the header) in a file written by .save() for the same graph,
+        which is much cheaper than saving the whole graph after every
+        simulation.
+        """
+        (nodes_offset, edges_offset, index_offset) = \
+            TreeFile._get_offsets(tree.max_nodes, tree.max_edges)
+        with open(path, "r+b") as file:
+            for node in sorted(nodes):
+                file.seek(nodes_offset + node * TreeFile._NODE_RECORD.size)
+                file.write(TreeFile._NODE_RECORD.pack(
+                    tree.keys[node], tree.first_edges[node],
+                    tree.num_simulations[node], tree.wins[node]))
+            for edge in sorted(edges):
+                file.seek(edges_offset + edge * TreeFile._EDGE_RECORD.size)
+                file.write(TreeFile._EDGE_RECORD.pack(
+                    tree.edge_parents[edge], tree.edge_children[edge],
+                    tree.next_edges[edge], tree.edge_moves[edge]))
+            for slot in sorted(slots):
+                file.seek(index_offset + slot * TreeFile._SLOT_RECORD.size)
+                file.write(TreeFile._SLOT_RECORD.pack(tree._index[slot]))
+
+            # The header goes last, once the records it describes are there.
+            file.seek(0)
+            file.write(TreeFile._pack_header(tree))
+
+    @staticmethod
+    def load(path: str, tree: NodeArena):
+        """
+        Replaces the contents of the given arena with the graph saved at the
+        given path, so that training can carry on from it. The arena must
+        have the same number of slots as the saved one.
+        """
+        with open(path, "rb") as file:
+            (max_nodes, max_edges, num_slots, num_nodes, num_edges,
+             num_evicted, free_node_head, free_edge_head) = \
+                TreeFile._unpack_header(file.read(TreeFile._HEADER.size))
+            if ((max_nodes, max_edges, num_slots)
+                    != (tree.max_nodes, tree.max_edges, len(tree._index))):
+                raise ValueError(
+                    "{} holds a graph of {} nodes, but the arena has room for "
+                    "{}".format(path, max_nodes, tree.max_nodes))
+
+            nodes: np.ndarray = np.fromfile(
+                file, dtype=TreeFile._NODE_DTYPE, count=max_nodes)
+            edges: np.ndarray = np.fromfile(
+                file, dtype=TreeFile._EDGE_DTYPE, count=max_edges)
+            index: np.ndarray = np.fromfile(file, dtype="<i4",
+                                            count=num_slots)
+
+        (node_fields, edge_fields, tree_index) = TreeFile._get_fields(tree)
+        for field, values, dtype in node_fields:
+            np.frombuffer(values, dtype=dtype)[:] = nodes[field]
+        for field, values, dtype in edge_fields:
+            np.frombuffer(values, dtype=dtype)[:] = edges[field]
+        np.frombuffer(tree_index, dtype=np.intc)[:] = index
+        tree.num_nodes = num_nodes
+        tree.num_edges = num_edges
+        tree.num_evicted = num_evicted
+        tree._free_node_head = free_node_head
+        tree._free_edge_head = free_edge_head
+
+    @staticmethod
+    def _get_fields(tree: NodeArena) \
+            -> Tuple[List[Tuple[str, object, type]],
+                     List[Tuple[str, object, type]], object]:
+        """
+        Returns a (record field, arena array, NumPy type of the array) triple
+        for each field of a node record and of an edge record, and the arena's
+        index.
+        """
+        return ([("key", tree.keys, np.uint64),
+                 ("first_edge", tree.first_edges, np.intc),
+                 ("num_simulations", tree.num_simulations, np.uintc),
+                 ("wins", tree.wins, np.float64)],
+                [("parent", tree.edge_parents, np.intc),
+                 ("child", tree.edge_children, np.intc),
+                 ("next_edge", tree.next_edges, np.intc),
+                 ("move", tree.edge_moves, np.uintc)],
+                tree._index)
+
+    @staticmethod
+    def _get_offsets(max_nodes: int, max_edges: int) -> Tuple[int, int, int]:
+        """
+        Returns the offsets of the node, edge and index tables.
+        """
+        nodes_offset: int = TreeFile._HEADER.size
+        edges_offset: int = \
+            nodes_offset + max_nodes * TreeFile._NODE_RECORD.size
+        return (nodes_offset, edges_offset,
+                edges_offset + max_edges * TreeFile._EDGE_RECORD.size)
+
+    @staticmethod
+    def _pack_header(tree: NodeArena) -> bytes:
+        return TreeFile._HEADER.pack(
+            TreeFile._MAGIC, TreeFile._VERSION, tree.max_nodes,
+            tree.max_edges, len(tree._index), tree.num_nodes, tree.num_edges,
+            tree.num_evicted, tree._free_node_head, tree._free_edge_head)
+
+    @staticmethod
+    def _unpack_header(header: bytes) \
+            -> Tuple[int, int, int, int, int, int, int, int]:
+        """
+        Returns the (number of node slots, edge slots and index slots, number
+        of nodes and edges in use, number of nodes evicted, heads of the free
+        lists of nodes and edges) stored in a header.
+        """
+        (magic, version, *values) = TreeFile._HEADER.unpack(header)
+        if (magic != TreeFile._MAGIC or version != TreeFile._VERSION):
+            raise ValueError("Not a version {} MCTS tree file".format(
+                TreeFile._VERSION))
+
+        return tuple(values)
@@ -0,0 +1,170 @@
+import time
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
+from typing import (Any, Callable, Deque, Hashable, Iterator, List, Optional,
+                    Tuple)
+
+
+class WorkerPool():
+    """
+    Runs tasks on a fixed number of worker processes and hands back their
+    results in the order they complete, so a slow task never holds up the
+    results of the ones queued after it.
+
+    Each worker runs one task at a time, so the time a task has been running is
+    known exactly. A worker whose task runs for longer than the pool's time
+    limit, or that dies, is killed and replaced by a new one, and the task is
+    queued again, up to MAX_ATTEMPTS times in all.
+    """
+
+    MAX_ATTEMPTS: int = 2
+
+    # How long the time limit is, in wall-clock seconds.
+    _time_limit: float
+    _workers: List['_Worker']
+    # The tasks not given to a worker yet, as (key, function, args, attempt).
+    _queue: Deque[Tuple[Hashable, Callable, tuple, int]]
+
+    def __init__(self, num_workers: int, time_limit: float):
+        """
+        Starts 'num_workers' worker processes. Each task may run for at most
+        'time_limit' seconds, which should be well above the longest a task is
+        ever expected to take.
+        """
+        self._time_limit = time_limit
+        self._workers = [_Worker() for _ in range(num_workers)]
+        self._queue = deque()
+
+    def submit(self, key: Hashable, function: Callable, args: tuple):
+        """
+        Queues the task of calling function(*args) on a worker. Both the
+        function and its arguments must be picklable. 'key' tells its result
+        apart from the others.
+        """
+        self._queue.append((key, function, args, 1))
+
+    def get_results(self) -> Iterator[Tuple[Hashable, bool, Any]]:
+        """
+        Runs every queued task, yielding (key, True, result) as each one
+        returns, until none are left. A task that was killed or whose worker
+        died MAX_ATTEMPTS times is given up on, and yields (key, False, None).
+        An exception raised by a task is raised again here.
+        """
+        while (len(self._queue) > 0
+               or any(worker.task is not None for worker in self._workers)):
+            for worker in self._workers:
+                if (worker.task is None and len(self._queue) > 0):
+                    worker.start_task(self._queue.popleft())
+
+            busy_workers: List[_Worker] = [worker for worker in self._workers
+                                           if worker.task is not None]
+            timeout: float = max(0.0, min(worker.start_time
+                                          for worker in busy_workers)
+                                 + self._time_limit - time.time())
+            ready: List[Any] = wait(
+                [worker.connection for worker in busy_workers]
+                + [worker.process.sentinel for worker in busy_workers],
+                timeout)
+
+            for (idx, worker) in enumerate(self._workers):
+                if (worker.task is None):
+                    continue
+
+                is_dead: bool = worker.process.sentinel in ready
+                if (worker.connection in ready):
+                    try:
+                        (succeeded, result) = worker.connection.recv()
+                    except EOFError:
+                        # The worker died before sending its result.
+                        is_dead = True
+                    else:
+                        key: Hashable = worker.task[0]
+                        worker.task = None
+                        if (not succeeded):
+                            raise result
+                        yield (key, True, result)
+                        continue
+
+                if (is_dead
+                        or time.time() - worker.start_time > self._time_limit):
+                    # The worker is stuck or dead, so it is replaced and its
+                    # task is tried again, if it has any attempts left.
+                    (key, function, args, attempt) = worker.task
+                    print("Task {} (attempt {}) failed - replacing its "
+                          "worker.".format(key, attempt))
+                    worker.kill()
+                    self._workers[idx] = _Worker()
+                    if (attempt < WorkerPool.MAX_ATTEMPTS):
+                        self._queue.append((key, function, args, attempt + 1))
+                    else:
+                        yield (key, False, None)
+
+    def close(self):
+        """
+        Stops all of the workers. Any tasks still queued are dropped.
+        """
+        self._queue.clear()
+        for worker in self._workers:
+            if (worker.task is None):
+                worker.connection.send(None)
+                worker.process.join()
+            else:
+                worker.kill()
+
+
+class _Worker():
+    """
+    A worker process of a WorkerPool, and the task it is running.
+    """
+
+    process: Process
+    # The pool's end of the pipe to the worker.
+    connection: Connection
+    task: Optional[Tuple[Hashable, Callable, tuple, int]]
+    # The wall-clock time its task started.
+    start_time: float
+
+    def __init__(self):
+        (self.connection, worker_connection) = Pipe()
+        self.process = Process(target=_work, args=(worker_connection,),
+                               daemon=True)
+        self.process.start()
+        worker_connection.close()
+        self.task = None
+        self.start_time = 0.0
+
+    def start_task(self, task: Tuple[Hashable, Callable, tuple, int]):
+        """
+        Sends the given (key, function, args, attempt) task to the worker.
+        """
+        (_, function, args, _) = task
+        self.task = task
+        self.start_time = time.time()
+        self.connection.send((function, args))
+
+    def kill(self):
+        """
+        Kills the worker, whatever it is doing.
+        """
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+def _work(connection: Connection):
+    """
+    The loop of a worker process: runs each (function, args) task received
+    from the pool and sends back (True, result), or (False, exception) if it
+    raised one, until it receives None.
+    """
+    while (True):
+        task: Optional[Tuple[Callable, tuple]] = connection.recv()
+        if (task is None):
+            return
+
+        (function, args) = task
+        try:
+            connection.send((True, function(*args)))
+        except Exception as e:
+            connection.send((False, e))
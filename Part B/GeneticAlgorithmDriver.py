@@ -4,20 +4,27 @@ Authors: Matt Farrugia and Shreyash Patodia
 version: v1.2
 """
 
-import argparse
-import gc
-import importlib
+import json
+import os
 import random
+import re
 import time
-from multiprocessing import Pool
-from multiprocessing.pool import ApplyResult
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional
 
-import multiprocessing
+import numpy
 from numpy import mean
 from numpy.random import choice
 
+from Classes.BitBoard import BitBoard
+from Classes.FeatureCache import FeatureCache
+from Classes.MatchScheduler import MatchScheduler
+from Classes.Move import Move
+from Classes.RatingStore import Rating, RatingStore
+from Classes.WorkerPool import WorkerPool
+from Enums.GamePhase import GamePhase
+from Enums.PlayerColor import PlayerColor
 from GeneticPlayer import Player
+from Misc.BoardTables import NUM_COLS
 
 VERSION_INFO = """Referee version 1.2 (released May 07 2018)
 Plays a basic game of Watch Your Back! between two Player classes
@@ -28,84 +35,146 @@ Run `python referee.py -h` for help and additional usage information
 def main():
     SEED: int = 3333
     random.seed(SEED)
-    time_out: float = 10.0
-    MAX_TIMEOUT: float = 60.0
+    # Picks the parents, so it is seeded too for runs to be repeatable.
+    numpy.random.seed(SEED)
+    # The most CPU time a game may take before it is drawn (see simulate_fast_game). A game's worker is killed and
+    # replaced if the game is still running after twice as long, and a game that fails that way on every attempt is
+    # left out of the results.
+    GAME_CPU_DEADLINE: float = 30.0
     ARTIFICIAL_HEURISTICS = [1, -1, 0.01, -0.01, -0.001, 0.001, -0.005, 0.005]
 
     N: int = 16 # Population size.
     NUM_HEURISTIC_VALUES: int = 8 # Number of heuristic values.
-    NUM_GAMES_PER_GENERATION: int = 100
-    NUM_GAMES_PER_PLAYER_PER_GENERATION = round_even(NUM_GAMES_PER_GENERATION / (N * (N - 1) / 2))
+    # The most games played per generation. Each pairing of players is raced (see MatchScheduler), so most get far
+    # fewer than MatchScheduler.MAX_GAMES_PER_PAIRING, and the games left over go to the closest contests.
+    NUM_GAMES_PER_GENERATION: int = 1200
     NUM_PARENTS: int = 3
     MUTATION_RATE: float = 0.05
-    print("NUM_GAMES_PER_PLAYER_PER_GENERATION:", NUM_GAMES_PER_PLAYER_PER_GENERATION)
+    # The fraction of games that are also checked move by move against the
+    # referee's rules (see simulate_fast_game).
+    VALIDATION_RATE: float = 0.01
+    # Each generation is saved here before and after it is played, along with the results of its games as they come
+    # in (see create_checkpoint and append_result), and the latest one is resumed on start up.
+    CHECKPOINT_DIRECTORY: str = "ga_checkpoints"
+    print("NUM_GAMES_PER_GENERATION:", NUM_GAMES_PER_GENERATION)
     population: Dict[int, PlayerWrapper] = {}
-
-    # Generate initial population.
-    heuristic_weights: List[float]
-    new_wrapper: PlayerWrapper
-    for i in range(N - 1):
-        heuristic_weights = [random.uniform(-1, 1) for i in range(NUM_HEURISTIC_VALUES)]
-        new_wrapper = PlayerWrapper(heuristic_weights)
+    generation_counter: int = 1
+    # The ratings of every player so far, by parameters. They carry over from one generation to the next.
+    ratings: RatingStore = RatingStore()
+    # The openings are the same every generation, so the features of the boards they lead to are kept between them
+    # (see get_move_agreements).
+    feature_cache: FeatureCache = FeatureCache(OPENING_FEATURE_CACHE_MAX_ENTRIES)
+
+    checkpoint: Optional[dict] = load_latest_checkpoint(CHECKPOINT_DIRECTORY)
+    if (checkpoint is not None):
+        (generation_counter, population, ratings) = restore_checkpoint(checkpoint)
+        print("Resuming generation {} ({} games already played).".format(
+            generation_counter, len(load_results(CHECKPOINT_DIRECTORY, generation_counter))))
+    else:
+        # Generate initial population.
+        heuristic_weights: List[float]
+        new_wrapper: PlayerWrapper
+        for i in range(N - 1):
+            heuristic_weights = [random.uniform(-1, 1) for i in range(NUM_HEURISTIC_VALUES)]
+            new_wrapper = PlayerWrapper(heuristic_weights)
+            population[new_wrapper.id] = new_wrapper
+
+        # Insert custom player.
+        new_wrapper = PlayerWrapper(ARTIFICIAL_HEURISTICS)
         population[new_wrapper.id] = new_wrapper
 
-    # Insert custom player.
-    new_wrapper = PlayerWrapper(ARTIFICIAL_HEURISTICS)
-    population[new_wrapper.id] = new_wrapper
-
-    pool: Pool = Pool(11)
-    processes: List[ApplyResult]
-    generation_counter = 1
+    # One worker per CPU, so that a game's CPU time keeps up with its wall-clock time.
+    pool: WorkerPool = WorkerPool(os.cpu_count(), 2 * GAME_CPU_DEADLINE)
     while(True):
         print("\nGeneration:", generation_counter)
-        # Generate the processes for each game to be played on.
+        if (checkpoint is None):
+            checkpoint = create_checkpoint(generation_counter, population, ratings)
+            save_checkpoint(CHECKPOINT_DIRECTORY, checkpoint)
+        # The games of a resumed generation that were already played, by game number, and those that failed.
+        finished_games: Dict[int, tuple] = {result[4]: result
+                                            for result in load_results(CHECKPOINT_DIRECTORY, generation_counter)}
+        failed_games: Dict[int, tuple] = {failure[3]: failure
+                                          for failure in load_results(CHECKPOINT_DIRECTORY, generation_counter, True)}
+        num_failed_games: int = 0
+        results: List[tuple] = []
+
+        # Race the pairings wave by wave. Games are numbered in the order they are scheduled, which only depends on
+        # the results of earlier waves, so a resumed generation schedules the same games and knows the finished ones.
         player_wrappers: List[PlayerWrapper] = list(population.values())
-        processes = []
-        for idx, player1 in enumerate(player_wrappers):
-            for player2 in player_wrappers[idx + 1:]:
-                for i in range(NUM_GAMES_PER_PLAYER_PER_GENERATION):
-                    process: ApplyResult
-                    if (i % 2 == 0):
-                        print("Playing:", player1.id, player2.id, "player1 as white")
-                        process = pool.apply_async(simulate_game, (player1, player2, i, len(processes)))
-                    else:
-                        print("Playing:", player1.id, player2.id, "player1 as black")
-                        process = pool.apply_async(simulate_game, (player2, player1, i, len(processes)))
-                    processes.append(process)
-
-        print("Num games to play:", len(processes))
-
-        # Get results.
-        results = []
-        timed_out: bool = False
-        counter: int = 0
-        while (counter < len(processes)):
-            try:
-                print("Getting {} at {:2f} seconds timeout...".format(counter, time_out))
-                results.append(processes[counter].get(time_out))
-                print("Got {}.".format(counter))
-                time_out *= 0.98 # Decrease timeout by 2%.
-                timed_out = False
-            except multiprocessing.TimeoutError:
-                if (timed_out):
-                    print(counter, "timed out x2 - abandoning game.")
-                    results.append(("SKIP", "SKIP", "SKIP", "SKIP", "SKIP"))
-                    timed_out = False
+        # Once there are ratings to go by, players are only paired with those of similar strength.
+        player_ratings: Optional[List[float]] = None
+        if (any(ratings.get(player.parameters).deviation < RatingStore.INITIAL_DEVIATION for player in player_wrappers)):
+            player_ratings = [ratings.get(player.parameters).rating for player in player_wrappers]
+        scheduler: MatchScheduler = MatchScheduler([player.id for player in player_wrappers], NUM_GAMES_PER_GENERATION,
+                                                   player_ratings)
+        print("Num pairings:", len(scheduler.pairing_results))
+        game_count: int = 0
+        games: List[Tuple[int, int, int]] = scheduler.get_next_games()
+        while (len(games) > 0):
+            # Queue each game to be played on the pool.
+            # The (player1_id, player2_id, i) of each queued game, by game number.
+            queued_games: Dict[int, Tuple[int, int, int]] = {}
+            wave_results: List[tuple] = []
+            # The (player1_id, player2_id, i, game number) of each game that couldn't be played.
+            wave_failures: List[tuple] = []
+            for (player1_id, player2_id, i) in games:
+                validate: bool = random.random() < VALIDATION_RATE
+                player1: PlayerWrapper = population[player1_id]
+                player2: PlayerWrapper = population[player2_id]
+                # Games i and i + 1 of a pairing swap colours, but start from the same opening.
+                if (game_count in finished_games):
+                    wave_results.append(finished_games[game_count])
+                elif (game_count in failed_games):
+                    wave_failures.append(failed_games[game_count])
+                elif (i % 2 == 0):
+                    print("Playing:", player1.id, player2.id, "player1 as white")
+                    pool.submit(game_count, simulate_fast_game,
+                                (player1, player2, i, game_count, validate, i // 2, GAME_CPU_DEADLINE))
+                    queued_games[game_count] = (player1_id, player2_id, i)
                 else:
-                    time_out = min(time_out * 2, MAX_TIMEOUT)  # Double timeout and try again.
-                    print(counter, "timed out x1 - retrying simulation.")
-                    timed_out = True
-                    counter -= 1
-
-            counter += 1
-
-        assert (len(results) == len(processes))
+                    print("Playing:", player1.id, player2.id, "player1 as black")
+                    pool.submit(game_count, simulate_fast_game,
+                                (player2, player1, i, game_count, validate, i // 2, GAME_CPU_DEADLINE))
+                    queued_games[game_count] = (player1_id, player2_id, i)
+                game_count += 1
+
+            print("Num games to play:", len(queued_games))
+
+            # Get results as they complete.
+            for (game_number, is_finished, result) in pool.get_results():
+                if (not is_finished):
+                    # Its workers got stuck or died every time. It has no result, so it is left out rather than
+                    # counted as anything.
+                    print("Game #{} could not be finished - left out.".format(game_number))
+                    failure: tuple = queued_games[game_number] + (game_number,)
+                    wave_failures.append(failure)
+                    append_result(CHECKPOINT_DIRECTORY, generation_counter, failure, True)
+                    continue
+                wave_results.append(result)
+                append_result(CHECKPOINT_DIRECTORY, generation_counter, result)
+                print("Got {}.".format(game_number))
+
+            assert (len(wave_results) + len(wave_failures) == len(games))
+
+            # Record the wave's results, and schedule the next wave from them. They are recorded in the order the
+            # games were scheduled rather than finished, so that the ratings don't depend on which finished first.
+            for result in sorted(wave_results, key=lambda result: result[4]):
+                (player1_id, player2_id, i, answer, _) = result
+                results.append(result)
+                scheduler.add_result(player1_id, player2_id, get_score(answer, i))
+                ratings.add_result(population[player1_id].parameters, population[player2_id].parameters,
+                                   get_score(answer, i))
+            for (player1_id, player2_id, _, _) in wave_failures:
+                scheduler.add_failure(player1_id, player2_id)
+            num_failed_games += len(wave_failures)
+
+            games = scheduler.get_next_games()
+
+        print("Played {} games ({} failed, {} pairings decided).".format(
+            game_count, num_failed_games, sum(scheduler.is_decided(pairing) for pairing in scheduler.pairing_results)))
 
         # Evaluate results as the threads complete.
         for (player1_id, player2_id, i, answer, _) in results:
-            if (answer == "SKIP"):
-                continue
-
             if (answer == "W" and i % 2 == 0):
                 population[player1_id].wins += 1
                 population[player2_id].losses += 1
@@ -124,15 +193,27 @@ def main():
                 population[player2_id].wins += 0.5
                 population[player2_id].losses += 0.5
 
-        # Calculate win rates i.e. fitness scores.
+        # Calculate fitness scores. Not every pair of players has played, so a player's win rate is the mean score
+        # its rating predicts against the rest of the population.
         for player in player_wrappers:
-            player.win_rate = player.wins / (player.wins + player.losses)
+            player.win_rate = mean([ratings.get_expected_score(player.parameters, opponent.parameters)
+                                    for opponent in player_wrappers if opponent != player])
+        checkpoint["population"] = [player.to_dict() for player in player_wrappers]
+        save_checkpoint(CHECKPOINT_DIRECTORY, checkpoint)
+
+        # How alike the population plays, as a check on its diversity.
+        agreements: Dict[int, float] = get_move_agreements(player_wrappers, feature_cache)
+        print("Move agreement: {:4f}".format(mean(list(agreements.values()))))
 
         # Print fitness scores and parameters.
         print("Rank:")
         sorted_players: List[PlayerWrapper] = sorted(player_wrappers, key=lambda x: x.win_rate, reverse=True)
         for player in sorted_players:
-            print("ID: {} | WR: {:4f} | Param: {}".format(player.id, player.win_rate, ["{:8f}".format(param) for param in player.parameters]))
+            rating: Rating = ratings.get(player.parameters)
+            print("ID: {} | WR: {:4f} | Rating: {:.0f} +/- {:.0f} | W/L/D: {} | Agree: {:.2f} | Param: {}".format(
+                player.id, player.win_rate, rating.rating, rating.deviation,
+                "/".join(map(str, scheduler.player_results[player.id])), agreements[player.id],
+                ["{:8f}".format(param) for param in player.parameters]))
 
         # Calculate probability of each class being a parent (derived from win rate).
         sum_win_rates: float = sum(player.win_rate for player in sorted_players)
@@ -158,6 +239,7 @@ def main():
 
             child_wrapper: PlayerWrapper = PlayerWrapper(child_parameters)
             new_population[child_wrapper.id] = child_wrapper
+            ratings.add_child(child_parameters, [parent.parameters for parent in parents])
 
         # Insert custom wrapper.
         if (generation_counter % 5 == 0):
@@ -167,6 +249,7 @@ def main():
 
         population = new_population
         generation_counter += 1
+        checkpoint = None
 
 class PlayerWrapper():
     _id: int = 0
@@ -189,276 +272,278 @@ class PlayerWrapper():
     def make_player(self, color):
         return Player(color, self.parameters)
 
+    def to_dict(self) -> dict:
+        return {"id": self.id, "parameters": self.parameters, "wins": self.wins, "losses": self.losses,
+                "win_rate": self.win_rate}
+
     def __eq__(self, other):
         return self.id == other.id
 
     def __hash__(self):
         return hash((self.id, "PlayerWrapper"))
 
-def simulate_game(whiteWrapper: PlayerWrapper, blackWrapper: PlayerWrapper, i: int, game_count: int):
-    """Coordinate a game of Watch Your Back! between two Player classes."""
-    print("Simulating game #{}...".format(game_count))
+def simulate_fast_game(whiteWrapper: PlayerWrapper, blackWrapper: PlayerWrapper, i: int, game_count: int,
+                       validate: bool = False, opening: Optional[int] = None, cpu_deadline: Optional[float] = None):
+    """
+    Plays a game between the two players without the referee in between. Both
+    players pick their moves (see Player.get_move) on one shared BitBoard, which
+    is trusted to apply the rules, so no action is converted, validated or
+    replayed onto a second board, and there are no resource checks.
 
-    # load command-line options
-    # options = _Options()
+    With 'validate', every move is also played on the referee's _Game, and a
+    _ValidationException is raised as soon as the two disagree.
 
-    # initialise the game and players
-    game = _Game()
-    white = _Player(whiteWrapper.make_player("white"), TIME_LIMIT_DEFAULT, SPACE_LIMIT_DEFAULT)
-    black = _Player(blackWrapper.make_player("black"), TIME_LIMIT_DEFAULT, SPACE_LIMIT_DEFAULT)
-    # now, play the game!
-    player, opponent = white, black  # white has first move
+    Given an 'opening' number, the first NUM_OPENING_MOVES moves are picked at
+    random instead, the same way for the same number. The players are all but
+    deterministic, so this is what makes repeated games between them differ.
 
-    while game.playing():
-        turns = game.turns
+    Given a 'cpu_deadline', a game still going after that many seconds of CPU
+    time is drawn.
+    """
+    print("Simulating game #{}...".format(game_count))
 
-        if (turns > 200):
-            game.winner = "draw"
+    start_time: float = time.process_time()
+    board: BitBoard = BitBoard(None, 0, GamePhase.PLACEMENT)
+    players: Dict[PlayerColor, Player] = {PlayerColor.WHITE: whiteWrapper.make_player("white"),
+                                          PlayerColor.BLACK: blackWrapper.make_player("black")}
+    game: _Game = _Game() if validate else None
+    winner: str = None
+    opening_moves: List[int] = [] if opening is None else get_opening_moves(opening)
+
+    while (board.phase != GamePhase.FINISHED):
+        if (board.phase == GamePhase.MOVEMENT
+                and board.round_num - BitBoard.MOVING_PHASE_ROUND_START > MAX_MOVING_TURNS):
+            winner = "draw"
             break
-
-        try:
-            action = player.action(turns)
-        except _ResourceLimitException as e:
-            # looks like one of the players exceeded their resource limits
-            # during calculation of 'action'---that's the end of this game, then
-            print(f"resource limit exceeded during action():", e)
-            return
-
-        try:
-            game.update(action)
-        except _InvalidActionException as e:
-            # if one of the players makes an invalid action,
-            # print the error message
-            print(f"invalid action ({game.loser}):", e)
+        if (cpu_deadline is not None and time.process_time() - start_time > cpu_deadline):
+            print("Game #{} passed its deadline on round {}.".format(game_count, board.round_num))
+            winner = "draw"
             break
 
-        try:
-            opponent.update(action)
-        except _ResourceLimitException as e:
-            # looks like one of the players exceeded their resource limits
-            # during calculation of 'update'
-            print(f"resource limit exceeded during update():", e)
-            return
-
-        # other player's turn!
-        player, opponent = opponent, player
-
-    print("Game #{} ({} vs {}) finished. Winner: {}".format(game_count, whiteWrapper.id, blackWrapper.id, game.winner))
-    print(game)
-    if (i % 2 == 0):
-        return (whiteWrapper.id, blackWrapper.id, i, game.winner, game_count)  # ("W", "B", or "draw")
-    else:
-        return (blackWrapper.id, whiteWrapper.id, i, game.winner, game_count)
-
-def round_even(x):
-    init_result: int = int(x)
-    if (init_result % 2 == 0):
-        return max(init_result, 2) # In case x was e.g. 0.9 and rounded down to 0.
-    else:
-        return init_result + 1
-
-# --------------------------------------------------------------------------- #
-
-# OPTIONS
+        # White moves on even rounds.
+        color: PlayerColor = PlayerColor.WHITE if board.round_num % 2 == 0 else PlayerColor.BLACK
+        move: Optional[int]
+        if (board.round_num < len(opening_moves)):
+            move = opening_moves[board.round_num]
+        else:
+            move = players[color].get_move(board)
+        if (move is None):
+            board.skip_turn()
+        else:
+            board = board.get_next_board_from_move(move)
 
-# default values (to use if flag is not provided)
-DELAY_DEFAULT = 0
-SPACE_LIMIT_DEFAULT = 0
-TIME_LIMIT_DEFAULT  = 0
+        if (validate):
+            try:
+                game.update(None if move is None else Move.get_referee_form(move))
+            except _InvalidActionException as e:
+                raise _ValidationException("game #{}: {}".format(game_count, e))
+            _validate_board(board, game, game_count)
 
-# missing values (to use if flag is provided, but with no value)
-DELAY_NOVALUE = 1.0 # seconds
-SPACE_LIMIT_NOVALUE = 100.0 # MB (each)
-TIME_LIMIT_NOVALUE  = 120.0 # seconds (each)
+    if (winner is None):
+        winner = "draw" if board.winner is None else _WINNERS[board.winner]
 
+    print("Game #{} ({} vs {}) finished. Winner: {}".format(game_count, whiteWrapper.id, blackWrapper.id, winner))
+    if (i % 2 == 0):
+        return (whiteWrapper.id, blackWrapper.id, i, winner, game_count)  # ("W", "B", or "draw")
+    else:
+        return (blackWrapper.id, whiteWrapper.id, i, winner, game_count)
 
-class _Options:
+def get_opening_moves(opening: int) -> List[int]:
     """
-    Parse and contain command-line arguments.
-    
-    --- help message: ---
-    usage: referee.py [-h] [-d [DELAY]] [-s [SPACE_LIMIT]] [-t [TIME_LIMIT]]
-                      white_module black_module
-
-    Plays a game of Watch Your Back! between two Player classes
-
-    positional arguments:
-      white_module          full name of module containing White Player class
-      black_module          full name of module containing Black Player class
-
-    optional arguments:
-      -h, --help            show this help message and exit
-      -d [DELAY], --delay [DELAY]
-                            how long (float, seconds) to wait between turns
-      -s [SPACE_LIMIT], --space_limit [SPACE_LIMIT]
-                            limit on memory space (float, MB) for each player
-      -t [TIME_LIMIT], --time_limit [TIME_LIMIT]
-                            limit on CPU time (float, seconds) for each player
-    ---------------------
+    Returns the NUM_OPENING_MOVES random moves that start every game given the
+    same opening number (see simulate_fast_game).
     """
-    def __init__(self):
-        parser = argparse.ArgumentParser(
-                description="Plays a game of Watch Your Back! between two "
-                    "Player classes")
-        parser.add_argument('white_module',
-                help="full name of module containing White Player class")
-        parser.add_argument('black_module',
-                help="full name of module containing Black Player class")
-        parser.add_argument('-d', '--delay',
-                type=float, default=DELAY_DEFAULT, nargs="?",
-                help="how long (float, seconds) to wait between turns")
-        parser.add_argument('-s', '--space_limit',
-                type=float, default=SPACE_LIMIT_DEFAULT, nargs="?",
-                help="limit on memory space (float, MB) for each player")
-        parser.add_argument('-t', '--time_limit',
-                type=float, default=TIME_LIMIT_DEFAULT,  nargs="?",
-                help="limit on CPU time (float, seconds) for each player")
-
-        args = parser.parse_args()
-
-        self.white_player = _load_player(args.white_module)
-        self.black_player = _load_player(args.black_module)
-        self.delay = _novalue_check(args.delay, DELAY_NOVALUE)
-        self.space = _novalue_check(args.space_limit, SPACE_LIMIT_NOVALUE)
-        self.time  = _novalue_check(args.time_limit, TIME_LIMIT_NOVALUE)
-
-# HELPER FUNCTIONS
-
-def _novalue_check(value, default):
+    # Has its own generator, as the players reseed the shared one.
+    opening_random: random.Random = random.Random(opening)
+    board: BitBoard = BitBoard(None, 0, GamePhase.PLACEMENT)
+    moves: List[int] = []
+    for round_num in range(NUM_OPENING_MOVES):
+        # White moves on even rounds. Every opening move is a placement, so there is always one to make.
+        move: int = opening_random.choice(board.get_all_possible_moves(
+            PlayerColor.WHITE if round_num % 2 == 0 else PlayerColor.BLACK))
+        board.apply_move(move)
+        moves.append(move)
+    return moves
+
+def get_move_agreements(player_wrappers: List[PlayerWrapper], feature_cache: FeatureCache) -> Dict[int, float]:
     """
-    Check if a value has been provided (is not None)
-    Return that value if so, or default if not
+    Returns, by player ID, the fraction of the openings used by the games (see
+    simulate_fast_game) after which the player's heuristic picks the same
+    first move as most of the population does. Every player faces the same
+    openings, so each board after an opening is rated for the whole population
+    at once, as one (boards, 8) @ (8, players) product of the boards' features
+    and the players' parameters.
     """
-    return value if value is not None else default
-
-def _load_player(modulename, package='.'):
+    parameters: numpy.ndarray = numpy.array([player.parameters for player in player_wrappers]).T
+    num_agreements: numpy.ndarray = numpy.zeros(len(player_wrappers))
+    num_openings: int = MatchScheduler.MAX_GAMES_PER_PAIRING // 2
+    for opening in range(num_openings):
+        board: BitBoard = BitBoard(None, 0, GamePhase.PLACEMENT)
+        for move in get_opening_moves(opening):
+            board.apply_move(move)
+        color: PlayerColor = PlayerColor.WHITE if board.round_num % 2 == 0 else PlayerColor.BLACK
+
+        board_encodings: List[Tuple[int, ...]] = []
+        for move in board.get_all_possible_moves(color):
+            board.apply_move(move)
+            board_encodings.append(board.encode())
+            board.undo_move(move)
+        # Scores are from white's point of view, so black picks the lowest.
+        scores: numpy.ndarray = FeatureCache.get_scores(feature_cache.get_feature_matrix(board_encodings, color),
+                                                        color, parameters)
+        choices: numpy.ndarray = scores.argmax(axis=0) if color == PlayerColor.WHITE else scores.argmin(axis=0)
+        num_agreements += choices == numpy.bincount(choices).argmax()
+
+    return {player.id: float(num_agreements[idx]) / num_openings for (idx, player) in enumerate(player_wrappers)}
+
+def _validate_board(board: BitBoard, game: '_Game', game_count: int):
     """
-    Load a Player class given the name of a module.
-    
-    :param modulename: where to look for the Player class (name of a module)
-    :param package: where to look for the module (relative package)
-    :return: the Player class (a class object)
+    Raises a _ValidationException unless the pieces and the winner of the given
+    board and of the referee's game are the same.
     """
-    module = importlib.import_module(modulename, package=package)
-    player_class = module.Player
-    return player_class
-
-# --------------------------------------------------------------------------- #
-
-# PLAYER WRAPPER CLASS
-
-class _Player:
+    for color, piece in _WINNERS.items():
+        mask: int = board.white if color == PlayerColor.WHITE else board.black
+        squares: List[Tuple[int, int]] = [(i % NUM_COLS, i // NUM_COLS) for i in range(mask.bit_length())
+                                          if mask >> i & 1]
+        if (sorted(squares) != sorted(game._squares_with_piece(piece))):
+            raise _ValidationException("game #{}: {} pieces differ on round {}\n{}\n{}".format(
+                game_count, piece, board.round_num, board, game))
+
+    if (board.phase == GamePhase.FINISHED
+            and (game.playing() or game.winner != ("draw" if board.winner is None else _WINNERS[board.winner]))):
+        raise _ValidationException("game #{}: the referee's game has a different result on round {}".format(
+            game_count, board.round_num))
+
+class _ValidationException(Exception):
+    """For when a fast game and the referee's game state disagree"""
+
+# Games still going after this many turns of the moving phase are drawn.
+MAX_MOVING_TURNS: int = 200
+# The number of random placements that start a game given an opening (see simulate_fast_game).
+NUM_OPENING_MOVES: int = 4
+# The number of boards whose heuristic features are remembered for get_move_agreements.
+OPENING_FEATURE_CACHE_MAX_ENTRIES: int = 10000
+# The referee's name for each player's pieces and wins.
+_WINNERS: Dict[PlayerColor, str] = {PlayerColor.WHITE: "W", PlayerColor.BLACK: "B"}
+
+def create_checkpoint(generation_counter: int, population: Dict[int, PlayerWrapper], ratings: RatingStore) -> dict:
     """
-    Wrapper for a Player class to simplify initialization and resource limiting
+    Returns the checkpoint of a generation that is about to be played. It holds
+    everything needed to play the generation again exactly as it would have been
+    played: the generation counter (which also decides when the artificial
+    heuristics are reinserted), the population in order, the ratings so far, the
+    state of both random number generators and the next player ID. The
+    population's wins, losses and win rates are added once it has been played.
+    The results of its games are kept in a log of their own (see append_result).
     """
-    def __init__(self, player, time_limit, space_limit):
-        self.timer = _CountdownTimer(time_limit)
-        self.space_limit = space_limit
-
-        gc.collect() # off the clock
-        with self.timer:
-            self.player = player
-        _space_check(self.space_limit)
+    random_state = random.getstate()
+    numpy_random_state = numpy.random.get_state()
+    return {"generation": generation_counter,
+            "population": [player.to_dict() for player in population.values()],
+            "ratings": ratings.to_list(),
+            "next_player_id": PlayerWrapper._id,
+            "random_state": [random_state[0], list(random_state[1]), random_state[2]],
+            "numpy_random_state": [numpy_random_state[0], numpy_random_state[1].tolist()]
+                                  + list(numpy_random_state[2:])}
+
+def restore_checkpoint(checkpoint: dict) -> Tuple[int, Dict[int, PlayerWrapper], RatingStore]:
+    """
+    Puts the random number generators and the player IDs back as they were when
+    the given checkpoint was created, and returns its (generation counter,
+    population, ratings), ready to play the generation again. The wins, losses
+    and ratings are from before the generation, since its results are counted
+    again.
+    """
+    (version, internal_state, gauss_next) = checkpoint["random_state"]
+    random.setstate((version, tuple(internal_state), gauss_next))
+    (algorithm, keys, *numpy_random_state) = checkpoint["numpy_random_state"]
+    numpy.random.set_state((algorithm, numpy.array(keys, dtype=numpy.uint32), *numpy_random_state))
 
-    def update(self, move):
-        gc.collect()
-        with self.timer:
-            self.player.update(move)
-        _space_check(self.space_limit)
+    population: Dict[int, PlayerWrapper] = {}
+    for player in checkpoint["population"]:
+        wrapper: PlayerWrapper = PlayerWrapper(player["parameters"])
+        wrapper.id = player["id"]
+        population[wrapper.id] = wrapper
+    PlayerWrapper._id = checkpoint["next_player_id"]
 
-    def action(self, turns):
-        gc.collect()
-        with self.timer:
-            action = self.player.action(turns)
-        _space_check(self.space_limit)
-        return action
+    return (checkpoint["generation"], population, RatingStore.from_list(checkpoint["ratings"]))
 
-# HELPER CLASSES AND FUNCTIONS
+def save_checkpoint(directory: str, checkpoint: dict):
+    """
+    Writes the given checkpoint to its generation's file in the given
+    directory. The file is written and flushed to disk under a temporary name
+    first and then moved into place, so a crash never leaves it half-written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path: str = os.path.join(directory, _CHECKPOINT_NAME.format(checkpoint["generation"]))
+    temp_path: str = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def load_latest_checkpoint(directory: str) -> Optional[dict]:
+    """
+    Returns the checkpoint of the latest generation saved in the given
+    directory, or None if there are none.
+    """
+    if (not os.path.isdir(directory)):
+        return None
 
-class _ResourceLimitException(Exception):
-    """For when a player or both players exceed specified space / time limits"""
+    generations: List[int] = [int(match.group(1)) for match in map(_CHECKPOINT_PATTERN.fullmatch, os.listdir(directory))
+                              if match is not None]
+    if (len(generations) == 0):
+        return None
 
-# MEMORY MANAGEMENT
+    with open(os.path.join(directory, _CHECKPOINT_NAME.format(max(generations)))) as file:
+        return json.load(file)
 
-def _get_space_usage():
+def append_result(directory: str, generation_counter: int, result: tuple, failed: bool = False):
     """
-    Find the current and peak Virtual Memory usage of the current process, in MB
+    Appends the given game result to the results log of the given generation in
+    the given directory, one JSON list per line, and flushes it to disk. Only the
+    new line is written, however many games have been played. With 'failed',
+    it is a game that couldn't be played instead, and goes in a log of its own.
     """
-    # on linux, we can find the memory usage of our program we are looking for 
-    # inside /proc/self/status (specifically, fields VmSize and VmPeak)
-    with open("/proc/self/status") as proc_status:
-        for line in proc_status:
-            if 'VmSize:' in line:
-                curr_mem_usage = int(line.split()[1]) / 1024 # kB -> MB
-            elif 'VmPeak:' in line:
-                peak_mem_usage = int(line.split()[1]) / 1024 # kB -> MB
-    return curr_mem_usage, peak_mem_usage
-
-# by default, the python interpreter uses a significant amount of space
-# measure this first to later subtract from all measurements
-try:
-    _DEFAULT_MEM_USAGE, _ = _get_space_usage()
-except:
-    #print("note: unable to measure memory usage on this platform (try dimefox)")
-    pass
-
-def _space_check(limit):
+    name: str = _FAILURES_NAME if failed else _RESULTS_NAME
+    with open(os.path.join(directory, name.format(generation_counter)), "a") as file:
+        file.write(json.dumps(result) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+def load_results(directory: str, generation_counter: int, failed: bool = False) -> List[tuple]:
     """
-    Check up on the current and peak space usage of the process, printing
-    stats and ensuring that peak usage is not exceeding limits
+    Returns the game results logged for the given generation in the given
+    directory (see append_result), in the order they were logged, or with
+    'failed', the games that couldn't be played.
     """
-    try:
-        curr_mem_usage, peak_mem_usage = _get_space_usage()
-    except:
-        #print("unable to measure memory usage on this platform")
-        return
-    
-    # adjust measurements to reflect usage of players and referee, not
-    # the Python interpreter itself
-    curr_mem_usage -= _DEFAULT_MEM_USAGE
-    peak_mem_usage -= _DEFAULT_MEM_USAGE
-
-    print(f"space: {curr_mem_usage:.3f}MB (current usage) "
-        + f"{peak_mem_usage:.3f}MB (max usage) (both players)")
-    
-    # if we are limited, let's hope we are not out of space!
-    # double the limit because space usage is shared
-    if limit and peak_mem_usage > 2 * limit:
-        raise _ResourceLimitException("Players exceeded shared space limit")
-
-# TIME MANAGEMENT
-
-class _CountdownTimer:
+    name: str = _FAILURES_NAME if failed else _RESULTS_NAME
+    path: str = os.path.join(directory, name.format(generation_counter))
+    if (not os.path.isfile(path)):
+        return []
+
+    with open(path, "rb+") as file:
+        lines: List[bytes] = file.readlines()
+        if (len(lines) > 0 and not lines[-1].endswith(b"\n")):
+            # A crash cut the last result short, so it is dropped, and the file cut back for the next one to follow.
+            lines.pop()
+            file.truncate(sum(len(line) for line in lines))
+    return [tuple(json.loads(line)) for line in lines]
+
+_CHECKPOINT_NAME: str = "generation_{:05d}.json"
+_CHECKPOINT_PATTERN = re.compile(r"generation_(\d+)\.json")
+_RESULTS_NAME: str = "generation_{:05d}_results.jsonl"
+_FAILURES_NAME: str = "generation_{:05d}_failures.jsonl"
+
+def get_score(answer: str, i: int) -> float:
     """
-    Reusable context manager for timing specific sections of code
-
-    * measures CPU time, not wall-clock time
-    * if limit is not 0, throws an exception upon exiting the context after the 
-      allocated time has passed
+    Returns the score of player1 (white in even games) in game 'i' of a pairing, given the game's winner: 1 for a
+    win, 0 for a loss and 0.5 for a draw.
     """
-    def __init__(self, limit):
-        """
-        Create a new countdown timer with time limit `limit`, in seconds
-        (0 for unlimited time)
-        """
-        self.limit = limit
-        self.clock = 0
-
-    def __enter__(self):
-        # start timing
-        self.start = time.process_time()
-        return self # unused
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        # accumulate elapsed time since __enter__
-        elapsed = time.process_time() - self.start
-        self.clock += elapsed
-        #print(f"time: {elapsed:.3f}s (this turn), {self.clock:.3f}s (total)")
-
-        # if we are limited, let's hope we aren't out of time!
-        if self.limit and self.clock > self.limit:
-            raise _ResourceLimitException("Player exceeded available time")
-
+    if (answer == "draw"):
+        return 0.5
+    return 1.0 if (answer == "W") == (i % 2 == 0) else 0.0
 
 # --------------------------------------------------------------------------- #
 
@@ -1,13 +1,18 @@
 import random
-from typing import List, Tuple, Dict, Union
+from array import array
+from typing import List, Tuple, Dict, Union, Optional, Sequence
 
-from Classes.Board import Board
+from Classes.BitBoard import BitBoard
 from Classes.Delta import Delta
+from Classes.FeatureCache import FeatureCache
+from Classes.Move import Move
+from Classes.MoveOrderer import MoveOrderer
 from Classes.Pos2D import Pos2D
-from Classes.Square import Square
+from Classes.TranspositionTable import TranspositionTable
 from Enums.GamePhase import GamePhase
 from Enums.PlayerColor import PlayerColor
 from Misc.Utilities import Utilities as Utils
+from Misc import Zobrist
 
 
 class Player():
@@ -34,10 +39,24 @@ class Player():
     _ALPHA_START_VALUE: int = -9999
     _BETA_START_VALUE: int = 9999
     _SEED: int = 13373
+    # The most memory the transposition table may use. Kept small since the
+    # genetic algorithm runs two players in each of its worker processes.
+    _TRANSPOSITION_TABLE_MEGABYTES: float = 16
+    # The number of boards whose heuristic features are remembered.
+    _FEATURE_CACHE_MAX_ENTRIES: int = 100000
+
+    # Shared by every player in the process. The features don't depend on a
+    # player's parameters, so players in the same game (or in later games run
+    # by the same process) reuse each other's work.
+    _feature_cache: FeatureCache = FeatureCache(_FEATURE_CACHE_MAX_ENTRIES)
 
     # A reference to the current board that the agent is on.
-    _board: Board
+    _board: BitBoard
     _color: PlayerColor
+    # Search results kept between turns, keyed by position hash.
+    _transposition_table: TranspositionTable
+    # Killer moves and history scores kept between turns.
+    _move_orderer: MoveOrderer
     # The depth to go in each iteration of the iterative-deepening search
     # algorithm i.e. number of moves to look ahead.
     _depth: int = 1
@@ -56,7 +75,10 @@ class Player():
         """
         self.parameters = parameters
 
-        self._board = Board(None, 0, GamePhase.PLACEMENT)
+        self._board = BitBoard(None, 0, GamePhase.PLACEMENT)
+        self._transposition_table = TranspositionTable(
+            Player._TRANSPOSITION_TABLE_MEGABYTES)
+        self._move_orderer = MoveOrderer()
         if (color.lower() == "white"):
             self._color = PlayerColor.WHITE
         else:
@@ -77,40 +99,68 @@ class Player():
         below, in the ‘Representing actions’ section.
         """
 
-        deltas: List[Delta] = self._board.get_all_possible_deltas(self._color)
-        if (len(deltas) == 0):
+        move: Optional[int] = self.get_move(self._board)
+        if (move is None):
+            # We have no moves, so our turn is forfeited.
+            self._board.skip_turn()
             return None
 
-        delta_scores: Dict[Delta, float] = {}
-
-        for delta in deltas:
-            delta_scores[delta] = \
-                Player.get_alpha_beta_value(
-                    self._board.get_next_board(delta), Player._depth - 1,
-                    Player._ALPHA_START_VALUE,
-                    Player._BETA_START_VALUE, self._color, self.parameters)
-
-        if self._board.round_num > 0 and \
-                self._board.phase == GamePhase.PLACEMENT:
-            test = {k: v for k, v in delta_scores.items() if
-                    (not self._board.is_suicide(k))}
-            delta_scores = test
-
-        best_deltas: List[Delta] = Utils.get_best_deltas(delta_scores, self._color)
-        best_delta: Tuple[Delta, float]
-        if (len(best_deltas) > 1):
-            # There are more than one "best" deltas. Pick a random one.
-            best_delta = random.choice(list(best_deltas))
-        else:
-            best_delta = best_deltas[0]
+        self._board = self._board.get_next_board_from_move(move)
+
+        return Move.get_referee_form(move)
+
+    def get_move(self, board: BitBoard) -> Optional[int]:
+        """
+        Picks the packed move (see Classes.Move) to make on the given board,
+        on which it must be this player's turn, or returns None if the turn has
+        to be forfeited. The board is left as it was. Used by action(), and by
+        GeneticAlgorithmDriver.simulate_fast_game() to play both sides of a
+        game on one shared board without going through the referee.
+        """
+        # The search works with packed moves (see Classes.Move) rather than
+        # Deltas, which are much more expensive to create.
+        moves: array = board.get_all_possible_moves(self._color)
+        if (len(moves) == 0):
+            return None
 
-        self._board = self._board.get_next_board(best_delta[0])
+        move_scores: Dict[int, float] = {}
+
+        self._move_orderer.age_history()
+        if (Player._depth == 1):
+            # Only looking one move ahead, so rate all the resulting boards in
+            # one batch.
+            move_scores = dict(zip(moves, Player.get_child_values(
+                board, moves, self._color, self.parameters)))
+        else:
+            for move in moves:
+                board.apply_move(move)
+                move_scores[move] = \
+                    Player.get_alpha_beta_value(
+                        board, Player._depth - 1,
+                        Player._ALPHA_START_VALUE,
+                        Player._BETA_START_VALUE, self._color, self.parameters,
+                        self._transposition_table, self._move_orderer)
+                board.undo_move(move)
+
+        if board.round_num > 0 and \
+                board.phase == GamePhase.PLACEMENT:
+            test = {k: v for k, v in move_scores.items() if
+                    (not board.is_suicide_move(k))}
+            move_scores = test
+
+        best_moves: List[Tuple[int, float]] = Utils.get_best_deltas(move_scores, self._color)
+        best_move: Tuple[int, float]
+        if (len(best_moves) > 1):
+            # There are more than one "best" moves. Pick a random one.
+            best_move = random.choice(list(best_moves))
+        else:
+            best_move = best_moves[0]
 
         # if self._color == PlayerColor.WHITE and self.parameters == [1, -1, 0.01, -0.01]:
         #     print([(str(delta), score) for delta, score in delta_scores.items()])
         #     print("{} {} DOES {} [{}]".format(self.parameters, self._color, best_delta[0], best_delta[1]))
 
-        return best_delta[0].get_referee_form()
+        return best_move[0]
 
     def update(self, action: Tuple[Union[int, Tuple[int]]]):
         """
@@ -135,8 +185,7 @@ class Player():
 
         if (action is None):
             # Opponent forfeited turn.
-            self._board.round_num += 1
-            self._board._update_game_phase()
+            self._board.skip_turn()
             return
 
         positions: List[Pos2D]
@@ -180,91 +229,130 @@ class Player():
         self._board = self._board.get_next_board(opponent_delta)
 
     @staticmethod
-    def get_alpha_beta_value(board: Board, depth: int, alpha: float, beta: float, color: PlayerColor, parameters: List[float]) -> float:
+    def get_alpha_beta_value(board: BitBoard, depth: int, alpha: float, beta: float, color: PlayerColor, parameters: List[float], transposition_table: TranspositionTable, move_orderer: MoveOrderer) -> float:
+        # The value of a position depends on whose point of view it is being
+        # evaluated from, so include the color in the key. The table is kept
+        # between turns, so include the round too: the same pieces on a later
+        # round are closer to the next shrink, which an entry's search may not
+        # have seen coming.
+        key: int = board.zobrist_hash ^ Zobrist.PLAYER_KEYS[color] \
+            ^ (board.round_num * Zobrist.ROUND_KEY & 0xFFFFFFFFFFFFFFFF)
+        # The window the caller asked for, used to tell whether the value found
+        # is exact or only a bound.
+        original_alpha: float = alpha
+        original_beta: float = beta
+        tt_move: int = TranspositionTable.NO_MOVE
+        entry: Optional[Tuple[int, int, float, int]] = transposition_table.probe(key)
+        if (entry is not None):
+            (entry_depth, bound_type, value, tt_move) = entry
+            if (entry_depth >= depth):
+                if (bound_type == TranspositionTable.EXACT):
+                    return value
+                elif (bound_type == TranspositionTable.LOWER_BOUND):
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if (beta <= alpha):
+                    return value
+
         if (depth == 0 or board.phase == GamePhase.FINISHED):
-            return Player.get_heuristic_value(board, color, parameters)
+            v: float = Player.get_heuristic_value(board, color, parameters)
+            transposition_table.store(key, depth, TranspositionTable.EXACT, v)
+            return v
+
+        moves: List[int] = move_orderer.order_moves(
+            board.get_all_possible_moves(color), board.round_num, tt_move)
+
+        best_move: Optional[int] = None
+        if (depth == 1 and len(moves) > 0):
+            # The children are all leaves, so rate them in one batch. There are
+            # no cutoffs among them, so the value is exact.
+            child_values: List[float] = Player.get_child_values(
+                board, moves, color.opposite(), parameters)
+            pick_best = max if color == PlayerColor.WHITE else min
+            v = pick_best(child_values)
+            best_move = moves[child_values.index(v)]
+            transposition_table.store(
+                key, depth, TranspositionTable.EXACT, v,
+                Move.get_key(best_move))
+            return v
 
         if (color == PlayerColor.WHITE): # Maximizer
-            v: float = -999999
-            deltas: List[Delta] = board.get_all_possible_deltas(color)
-            for delta in deltas:
-                v = max(v, Player.get_alpha_beta_value(board.get_next_board(delta), depth - 1, alpha, beta, color.opposite(), parameters))
+            v = -999999
+            for move in moves:
+                board.apply_move(move)
+                child_v: float = Player.get_alpha_beta_value(board, depth - 1, alpha, beta, color.opposite(), parameters, transposition_table, move_orderer)
+                board.undo_move(move)
+                if (child_v > v or best_move is None):
+                    v = child_v
+                    best_move = move
                 alpha = max(alpha, v)
                 if (beta <= alpha):
+                    move_orderer.record_move_cutoff(move, board.round_num, depth)
                     break
-            return v
 
         else: # Minimizer
             v = 999999
-            deltas: List[Delta] = board.get_all_possible_deltas(color)
-            for delta in deltas:
-                v = min(v, Player.get_alpha_beta_value(board.get_next_board(delta), depth - 1, alpha, beta, color.opposite(), parameters))
+            for move in moves:
+                board.apply_move(move)
+                child_v: float = Player.get_alpha_beta_value(board, depth - 1, alpha, beta, color.opposite(), parameters, transposition_table, move_orderer)
+                board.undo_move(move)
+                if (child_v < v or best_move is None):
+                    v = child_v
+                    best_move = move
                 beta = min(beta, v)
                 if (beta <= alpha):
+                    move_orderer.record_move_cutoff(move, board.round_num, depth)
                     break
-            return v
+
+        # Work out whether v is the exact value of the position or only a bound
+        # on it, relative to the window that was searched.
+        bound_type: int
+        if (v <= original_alpha):
+            bound_type = TranspositionTable.UPPER_BOUND
+        elif (v >= original_beta):
+            bound_type = TranspositionTable.LOWER_BOUND
+        else:
+            bound_type = TranspositionTable.EXACT
+        transposition_table.store(
+            key, depth, bound_type, v,
+            TranspositionTable.NO_MOVE if best_move is None
+            else Move.get_key(best_move))
+
+        return v
+
+    @staticmethod
+    def get_child_values(board: BitBoard, moves: Sequence[int], color: PlayerColor, parameters: List[float]) -> List[float]:
+        """
+        Rates the board that each of the given packed moves would result in,
+        rating them all at once. 'color' is the player the boards are rated
+        for, as in get_heuristic_value.
+        """
+        board_encodings: List[Tuple[int, ...]] = []
+        for move in moves:
+            board.apply_move(move)
+            board_encodings.append(board.encode())
+            board.undo_move(move)
+
+        return FeatureCache.get_scores(
+            Player._feature_cache.get_feature_matrix(board_encodings, color),
+            color, parameters).tolist()
 
     @staticmethod
-    def get_heuristic_value(board: Board, player: PlayerColor, parameters: List[float]):
+    def get_heuristic_value(board: BitBoard, player: PlayerColor, parameters: List[float]):
         """
         Given a board, calculates and returns its rating based on heuristics.
         """
 
-        player_squares: List[Square] = board.get_player_squares(player)
-        opponent_squares: List[Square] = board.get_player_squares(player.opposite())
-
-        # -- Num pieces --
-        # Calculate the number of white and black pieces. This is a very
-        # important heuristic that will help prioritize preserving white's own
-        # pieces and killing the enemy's black pieces.
-        num_own_pieces: int = len(player_squares)
-        num_opponent_pieces: int = len(opponent_squares)
-
-        # -- Mobility --
-        # Calculate the mobility for both white and black i.e. the number of
-        # possible moves they can make.
-        own_mobility: int = board.get_num_moves(player)
-        opponent_mobility: int = board.get_num_moves(player.opposite())
-
-        # -- Cohesiveness --
-        own_total_distance: int = 0
-        opponent_total_distance: int = 0
-
-        displacement: Pos2D
-        for idx, square in enumerate(player_squares):
-            for square2 in player_squares[idx + 1:]:
-                displacement = square.pos - square2.pos
-                own_total_distance += abs(displacement.x) + abs(displacement.y)
-
-        for idx, square in enumerate(opponent_squares):
-            for square2 in opponent_squares[idx + 1:]:
-                displacement = square.pos - square2.pos
-                opponent_total_distance += abs(displacement.x) + abs(
-                    displacement.y)
-
-        own_avg_allied_distance: float = own_total_distance / (num_own_pieces + 1)
-        opponent_avg_allied_distance: float = opponent_total_distance / (
-                    num_opponent_pieces + 1)
-
-        # -- Centrality --
-        own_total_distance: int = 0
-        opponent_total_distance: int = 0
-
-        x_displacement: float
-        y_displacement: float
-        for square in player_squares:
-            x_displacement = 3.5 - square.pos.x
-            y_displacement = 3.5 - square.pos.y
-            own_total_distance += abs(x_displacement) + abs(y_displacement)
-
-        for square in opponent_squares:
-            x_displacement = 3.5 - square.pos.x
-            y_displacement = 3.5 - square.pos.y
-            opponent_total_distance += abs(x_displacement) + abs(y_displacement)
-
-        own_avg_center_distance: float = own_total_distance / (num_own_pieces + 1)
-        opponent_avg_center_distance: float = opponent_total_distance / (
-                    num_opponent_pieces + 1)
+        # The number of pieces, mobility, cohesiveness (average distance
+        # between allied pieces) and centrality (average distance from the
+        # centre) of both players. See BitBoard.get_features. They are the same
+        # for every player, so they are cached.
+        (num_own_pieces, num_opponent_pieces,
+         own_mobility, opponent_mobility,
+         own_avg_allied_distance, opponent_avg_allied_distance,
+         own_avg_center_distance, opponent_avg_center_distance) = \
+            Player._feature_cache.get_features(board, player)
 
         # Calculate the heuristic score/rating.
         rounded_heuristic_score: float = round(
@@ -0,0 +1,211 @@
+import os
+import random
+from array import array
+from typing import Dict, Tuple, Union, Optional
+
+from Classes.Agents.MCTSAgent import MCTSAgent
+from Classes.BitBoard import BitBoard
+from Classes.Move import Move
+from Classes.NodeArena import NodeArena
+from Classes.TreeFile import TreeFile
+from Enums.GamePhase import GamePhase
+from Enums.PlayerColor import PlayerColor
+from Misc.BoardTables import NUM_COLS
+from Misc.Timer import Timer
+
+
+class Player():
+    """
+    Plays with Monte Carlo Tree Search (see MCTSAgent). The tree is kept for
+    the whole game: after each move, ours or the opponent's, the node for the
+    move becomes the new root, so the simulations already run below it carry
+    over to the next search and the rest of the tree is freed.
+
+    If a tree trained offline (see Main.py) has been saved, positions it knows
+    are played from it instead, straight out of the memory-mapped file (see
+    TreeFile), and only the rest are searched.
+    """
+
+    # --- Timer parameters ---
+    # The total time for the player in the game.
+    _TIME_LIMIT: float = 120.0
+    # The remaining amount of time remaining at which point the AI will start
+    # picking moves completely randomly so as to not run out of time.
+    _PANIC_MODE_REMAINING_TIME: float = 2.0
+    # The amount of rounds expected to be played. Includes placement rounds and
+    # all rounds until around 2nd deathzone.
+    _NUM_EXPECTED_ROUNDS: int = 24 + 194
+    # Games can go on for longer than expected, so always keep enough time for
+    # at least this many more rounds.
+    _MIN_EXPECTED_REMAINING_ROUNDS: int = 10
+    # How much time a move in each phase gets, relative to an even split of the
+    # remaining time. Placement moves shape the rest of the game, so they get
+    # more.
+    _PHASE_TIME_WEIGHTS: Dict[GamePhase, float] = {
+        GamePhase.PLACEMENT: 1.5,
+        GamePhase.MOVEMENT: 1.0
+    }
+
+    # --- Other parameters ---
+    _SEED: int = 1337
+    # The referee's memory limit for each player, in MB.
+    _SPACE_LIMIT_MEGABYTES: float = 100
+    # About how much memory the player uses besides its tree, nearly all of it
+    # taken by importing NumPy.
+    _BASE_MEGABYTES: float = 88
+    # The most memory the MCTS tree may use: whatever the limit leaves. That
+    # still holds several times as many nodes as a whole game's searches add.
+    _TREE_MEGABYTES: float = _SPACE_LIMIT_MEGABYTES - _BASE_MEGABYTES
+    # Where Main.py saves the trained tree, relative to the working directory.
+    _TREE_PATH: str = "mcts_tree.bin"
+
+    # --- Instance variables ---
+    _timer: Timer
+    # A reference to the current board that the agent is on.
+    _board: BitBoard
+    _color: PlayerColor
+    # Searches the tree, whose root is kept on the same board as ._board.
+    _agent: MCTSAgent
+    # The trained tree, or None if there isn't one.
+    _tree_file: Optional[TreeFile]
+
+    def __init__(self, color: str):
+        """
+        This method is called by the referee once at the beginning of the game
+        to initialise your player. The input parameter colour is either
+        'white' or 'black'.
+        """
+        self._board = BitBoard(None, 0, GamePhase.PLACEMENT)
+        if (color.lower() == "white"):
+            self._color = PlayerColor.WHITE
+        else:
+            self._color = PlayerColor.BLACK
+
+        # The agent gets its own copy of the board, since forfeited turns are
+        # made on ._board in place.
+        self._agent = MCTSAgent(NodeArena(Player._TREE_MEGABYTES),
+                                BitBoard.decode(self._board.encode()),
+                                seed=Player._SEED)
+        self._tree_file = None
+        if (os.path.exists(Player._TREE_PATH)):
+            self._tree_file = TreeFile(Player._TREE_PATH)
+        self._timer = Timer(Player._TIME_LIMIT)
+
+    def action(self, turns) -> Union[Tuple[int, int],
+                                      Tuple[Tuple[int, int], Tuple[int, int]],
+                                      None]:
+        """
+        This method is called by the referee to request an action by your
+        player, and returns it in the form the referee expects (see
+        Move.get_referee_form()), or None to forfeit the turn.
+        """
+        with self._timer:
+            moves: array = self._board.get_all_possible_moves(self._color)
+            if (len(moves) == 0):
+                # We have no moves, so our turn is forfeited.
+                self._make_move(None)
+                return None
+
+            move: Optional[int] = self._get_trained_move(moves)
+            if (move is not None):
+                print(self._color, "DOES", Move.get_referee_form(move),
+                      "[trained]")
+            else:
+                remaining_time: float = self._timer.get_remaining()
+                if (remaining_time < Player._PANIC_MODE_REMAINING_TIME):
+                    # AHH! Not much time remaining - pick a random move.
+                    print(self._color, "PANIC")
+                else:
+                    self._agent.search(self._get_move_time_budget())
+                    move = self._agent.get_best_move()
+                if (move is None):
+                    move = random.choice(moves)
+
+                print(self._color, "DOES", Move.get_referee_form(move),
+                      "[{} simulations]".format(
+                          self._agent.tree.num_simulations[NodeArena.ROOT]))
+            self._make_move(move)
+
+            return Move.get_referee_form(move)
+
+    def update(self, action: Union[Tuple[int, int],
+                                   Tuple[Tuple[int, int], Tuple[int, int]],
+                                   None]):
+        """
+        This method is called by the referee to inform your player about the
+        opponent's most recent action: a placement (x, y), a move
+        ((a, b), (c, d)), or None for a forfeited turn.
+        """
+        with self._timer:
+            print(self._color, "SEES", action)
+
+            if (action is None):
+                # Opponent forfeited turn.
+                self._make_move(None)
+                return
+
+            origin: Optional[int] = None
+            target: int
+            if (type(action[0]) == int):
+                # Placement
+                target = action[1] * NUM_COLS + action[0]
+            else:
+                # Movement
+                ((origin_x, origin_y), (target_x, target_y)) = action
+                origin = origin_y * NUM_COLS + origin_x
+                target = target_y * NUM_COLS + target_x
+
+            opponent_move: Optional[int] = next(
+                (move for move in self._board.get_all_possible_moves(
+                    self._color.opposite())
+                 if Move.get_origin(move) == origin
+                 and Move.get_target(move) == target), None)
+            assert (opponent_move is not None)
+
+            self._make_move(opponent_move)
+
+    def _get_trained_move(self, moves: array) -> Optional[int]:
+        """
+        Returns the trained tree's most simulated move from the current board,
+        or None if there is no trained tree or it has no moves from the board.
+        'moves' are the legal moves, which a move from the tree must be one of
+        in case its key belongs to a different position.
+        """
+        if (self._tree_file is None):
+            return None
+
+        node: int = self._tree_file.find(
+            MCTSAgent.get_position_key(self._board))
+        if (node == NodeArena.NO_NODE):
+            return None
+
+        move: Optional[int] = self._tree_file.get_best_move(node)
+        return move if move in moves else None
+
+    def _make_move(self, move: Optional[int]):
+        """
+        Makes the given packed move (None for a forfeited turn) on the board,
+        and moves the tree's root on to match.
+        """
+        if (move is None):
+            self._board.skip_turn()
+        else:
+            self._board = self._board.get_next_board_from_move(move)
+        self._agent.advance(move)
+
+    def _get_move_time_budget(self) -> float:
+        """
+        Returns how much CPU time the current move may take, based on the time
+        remaining, the game phase and the number of rounds expected to remain.
+        """
+        remaining_time: float = \
+            self._timer.get_remaining() - Player._PANIC_MODE_REMAINING_TIME
+        remaining_expected_rounds: int = max(
+            Player._NUM_EXPECTED_ROUNDS - self._board.round_num,
+            Player._MIN_EXPECTED_REMAINING_ROUNDS)
+        # We only play every second round.
+        remaining_expected_moves: float = remaining_expected_rounds / 2
+
+        budget: float = remaining_time / remaining_expected_moves \
+            * Player._PHASE_TIME_WEIGHTS[self._board.phase]
+        return max(0.0, min(budget, remaining_time))
@@ -1,12 +1,33 @@
+import os
+
 from Classes.Agents.MCTSAgent import MCTSAgent
-from Classes.Node import Node
+from Classes.NodeArena import NodeArena
+from Classes.TreeFile import TreeFile
 
 
 # This will be the file to run the program.
 
+# The most memory the MCTS tree may use. Once it is full, the least visited
+# subtrees are evicted to make room.
+_TREE_MEGABYTES: float = 512
+# Where the trained tree is saved. Training carries on from it if it exists.
+_TREE_PATH: str = "mcts_tree.bin"
+# Training runs root-parallel (see MCTSAgent.train_root_parallel) over this
+# many processes when it's more than one.
+_NUM_TRAINING_PROCESSES: int = 1
+
+
 def main():
-    tree_root: Node = Node(None, None)
-    mcts_agent: MCTSAgent = MCTSAgent(tree_root, seed=30024)
-    mcts_agent.train(30)
+    tree: NodeArena = NodeArena(_TREE_MEGABYTES)
+    if (os.path.exists(_TREE_PATH)):
+        TreeFile.load(_TREE_PATH, tree)
+    mcts_agent: MCTSAgent = MCTSAgent(tree, seed=30024)
+    if (_NUM_TRAINING_PROCESSES > 1):
+        mcts_agent.train_root_parallel(30, _NUM_TRAINING_PROCESSES, _TREE_PATH)
+    else:
+        mcts_agent.train(30, _TREE_PATH)
+
 
-main()
+# Worker processes import this module too, and mustn't start training.
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+from typing import List, Optional, Tuple
+
+from Classes.Pos2D import Pos2D
+
+
+# Lookup tables for the 8x8 board, built once when this module is imported.
+# Each square is identified by its index i = y * NUM_COLS + x, and each table is
+# a tuple with one entry per square index. Move generation and capture
+# detection can then read neighbours straight out of these tables rather than
+# building and adding Pos2Ds on every call.
+
+NUM_COLS: int = 8
+NUM_ROWS: int = 8
+NUM_SQUARES: int = NUM_COLS * NUM_ROWS
+
+# The four directions as (dx, dy) pairs. Horizontal directions come first,
+# matching the order of Board._get_adjacent_squares.
+DIRECTIONS: Tuple[Tuple[int, int], ...] = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# One shared Pos2D per square index, so that converting indices back into
+# positions doesn't allocate.
+POSITIONS: Tuple[Pos2D, ...] = tuple(
+    Pos2D(i % NUM_COLS, i // NUM_COLS) for i in range(NUM_SQUARES))
+
+# For each square, the indices of the squares directly adjacent to it.
+ADJACENT: Tuple[Tuple[int, ...], ...]
+# For each square, a list of (adjacent index, opposite index) pairs, one per
+# direction that stays on the board. The opposite index is the square on the
+# other side of the adjacent square (i.e. where a jump over it would land, or
+# where an ally/corner would need to be to capture it). It is None when it
+# falls off the board.
+NEIGHBOURS: Tuple[Tuple[Tuple[int, Optional[int]], ...], ...]
+# For each square, a list of (jumped-over index, landing index) pairs for
+# every jump that stays on the board.
+JUMPS: Tuple[Tuple[Tuple[int, int], ...], ...]
+# For each square, a (horizontal, vertical) pair of tuples holding its adjacent
+# indices along that axis. A piece is surrounded along an axis when both of
+# the squares on that axis hold enemies.
+AXES: Tuple[Tuple[Tuple[int, ...], Tuple[int, ...]], ...]
+# For each square, a (direction index, adjacent index, opposite index) triple
+# for every direction in which a piece on the square could capture the piece
+# next to it, i.e. where both the adjacent and opposite squares are on the
+# board. The direction index is into DIRECTIONS.
+CAPTURES: Tuple[Tuple[Tuple[int, int, int], ...], ...]
+# For each pair of squares, the Manhattan distance between them. Indexed by
+# [index 1][index 2].
+DISTANCES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(abs(i % NUM_COLS - j % NUM_COLS) + abs(i // NUM_COLS - j // NUM_COLS)
+          for j in range(NUM_SQUARES))
+    for i in range(NUM_SQUARES))
+# For each square, twice its Manhattan distance from the centre of the board.
+# Doubled so that it is a whole number, since the centre lies between squares.
+CENTRE_DISTANCES_DOUBLED: Tuple[int, ...] = tuple(
+    abs(2 * (i % NUM_COLS) - (NUM_COLS - 1))
+    + abs(2 * (i // NUM_COLS) - (NUM_ROWS - 1))
+    for i in range(NUM_SQUARES))
+
+
+def get_index(pos: Pos2D) -> int:
+    """
+    Returns the square index for the given position.
+    """
+    return pos.y * NUM_COLS + pos.x
+
+
+def _is_on_board(x: int, y: int) -> bool:
+    return 0 <= x < NUM_COLS and 0 <= y < NUM_ROWS
+
+
+def _build_tables():
+    adjacent: List[Tuple[int, ...]] = []
+    neighbours: List[Tuple[Tuple[int, Optional[int]], ...]] = []
+    jumps: List[Tuple[Tuple[int, int], ...]] = []
+    axes: List[Tuple[Tuple[int, ...], Tuple[int, ...]]] = []
+
+    for i in range(NUM_SQUARES):
+        x: int = i % NUM_COLS
+        y: int = i // NUM_COLS
+
+        square_adjacent: List[int] = []
+        square_neighbours: List[Tuple[int, Optional[int]]] = []
+        square_jumps: List[Tuple[int, int]] = []
+        horizontal: List[int] = []
+        vertical: List[int] = []
+        for dx, dy in DIRECTIONS:
+            if (not _is_on_board(x + dx, y + dy)):
+                continue
+            adj_i: int = (y + dy) * NUM_COLS + (x + dx)
+            square_adjacent.append(adj_i)
+            (horizontal if dy == 0 else vertical).append(adj_i)
+
+            opp_i: Optional[int] = None
+            if (_is_on_board(x + 2 * dx, y + 2 * dy)):
+                opp_i = (y + 2 * dy) * NUM_COLS + (x + 2 * dx)
+                square_jumps.append((adj_i, opp_i))
+            square_neighbours.append((adj_i, opp_i))
+
+        adjacent.append(tuple(square_adjacent))
+        neighbours.append(tuple(square_neighbours))
+        jumps.append(tuple(square_jumps))
+        axes.append((tuple(horizontal), tuple(vertical)))
+
+    return tuple(adjacent), tuple(neighbours), tuple(jumps), tuple(axes)
+
+
+(ADJACENT, NEIGHBOURS, JUMPS, AXES) = _build_tables()
+
+CAPTURES = tuple(
+    tuple((direction_i,
+           (i // NUM_COLS + dy) * NUM_COLS + i % NUM_COLS + dx,
+           (i // NUM_COLS + 2 * dy) * NUM_COLS + i % NUM_COLS + 2 * dx)
+          for direction_i, (dx, dy) in enumerate(DIRECTIONS)
+          if _is_on_board(i % NUM_COLS + 2 * dx, i // NUM_COLS + 2 * dy))
+    for i in range(NUM_SQUARES))
@@ -21,6 +21,7 @@ class Timer:
         """
         self.limit = limit
         self.clock = 0
+        self.start = None
 
     def __enter__(self):
         # start timing
@@ -31,9 +32,26 @@ class Timer:
         # accumulate elapsed time since __enter__
         elapsed = time.process_time() - self.start
         self.clock += elapsed
+        self.start = None
         print(f"time: {elapsed:.3f}s (this turn), {self.clock:.3f}s (total)")
 
         # if we are limited, let's hope we aren't out of time!
         if self.limit and self.clock > self.limit:
             # Slightly modified.
-            raise RuntimeError("Player exceeded available time")
\ No newline at end of file
+            raise RuntimeError("Player exceeded available time")
+
+    def get_elapsed(self) -> float:
+        """
+        Returns the CPU time elapsed since entering the context, or 0 if the
+        timer isn't currently running.
+        """
+        if (self.start is None):
+            return 0.0
+        return time.process_time() - self.start
+
+    def get_remaining(self) -> float:
+        """
+        Returns how much of the time limit is left, counting the time elapsed
+        so far in the current context.
+        """
+        return self.limit - self.clock - self.get_elapsed()
@@ -0,0 +1,57 @@
+import random
+from typing import Dict, Tuple
+
+from Enums.GamePhase import GamePhase
+from Enums.PlayerColor import PlayerColor
+from Misc.BoardTables import NUM_SQUARES
+
+
+# Random 64-bit keys used for Zobrist hashing. A board's hash is the XOR of the
+# keys for everything on it, so making a move only requires XOR-ing out the
+# keys of what changed and XOR-ing in the new ones. The keys are generated from
+# a fixed seed so that hashes are the same across processes and runs.
+_SEED: int = 30024
+_random: random.Random = random.Random(_SEED)
+
+
+def _get_keys(num_keys: int) -> Tuple[int, ...]:
+    return tuple(_random.getrandbits(64) for _ in range(num_keys))
+
+
+# Indexed by [PlayerColor.value][square index].
+PIECE_KEYS: Tuple[Tuple[int, ...], ...] = \
+    tuple(_get_keys(NUM_SQUARES) for _ in PlayerColor)
+# Indexed by square index.
+CORNER_KEYS: Tuple[int, ...] = _get_keys(NUM_SQUARES)
+ELIMINATED_KEYS: Tuple[int, ...] = _get_keys(NUM_SQUARES)
+# XOR-ed in when it is the second player's turn (i.e. on odd rounds).
+SIDE_KEY: int = _random.getrandbits(64)
+# Indexed by the number of times the board has shrunk so far.
+SHRINK_KEYS: Tuple[int, ...] = _get_keys(3)
+PHASE_KEYS: Dict[GamePhase, int] = \
+    {phase: _random.getrandbits(64) for phase in GamePhase}
+# Not part of a board's hash. Searches whose value for a position depends on
+# which player they are evaluating it for XOR one of these into the board's
+# hash to tell the two apart.
+PLAYER_KEYS: Dict[PlayerColor, int] = \
+    {player: _random.getrandbits(64) for player in PlayerColor}
+# Not part of a board's hash either. Searches that must tell apart the same
+# position on different rounds (whose futures differ, since the death zones
+# come on fixed rounds) XOR the round number times this into the hash.
+ROUND_KEY: int = _random.getrandbits(64) | 1
+
+
+def get_state_key(round_num: int, phase: GamePhase,
+                  death_zone_rounds) -> int:
+    """
+    Returns the combined key for everything that isn't a square: the side to
+    move, the game phase and the number of times the board has shrunk.
+    """
+    shrink_stage: int = len([death_zone_round for death_zone_round
+                             in death_zone_rounds
+                             if round_num > death_zone_round])
+    key: int = PHASE_KEYS[phase] ^ SHRINK_KEYS[shrink_stage]
+    if (round_num % 2 == 1):
+        key ^= SIDE_KEY
+
+    return key
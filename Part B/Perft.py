@@ -0,0 +1,376 @@
+"""
+Perft ("performance test") for the board engines. Counts the leaf nodes of the
+full game tree of a position down to a given depth, using only
+get_all_possible_deltas() and get_next_board(). The counts double as a
+regression suite (any change to move generation or to how moves are applied
+changes them) and as a benchmark (nodes per second).
+
+Every count can also be cross-checked against a tree built from the referee's
+own _Game rules, which are the rules our engines have to match.
+
+Run `python Perft.py -h` for usage information.
+"""
+
+import argparse
+import copy
+import random
+import time
+from array import array
+from typing import List, Tuple, Union, Optional, Dict, Callable
+
+from Classes.BitBoard import BitBoard
+from Classes.Board import Board
+from Classes.Delta import Delta
+from Classes.Move import Move
+from Enums.GamePhase import GamePhase
+from Enums.PlayerColor import PlayerColor
+from referee import _Game, _InvalidActionException
+
+# An action in the referee's form: (x, y) for a placement, ((a, b), (c, d)) for
+# a move and None for a forfeited turn.
+Action = Union[None, Tuple[int, int], Tuple[Tuple[int, int], Tuple[int, int]]]
+
+_ENGINES: Dict[str, Callable[[], Union[Board, BitBoard]]] = {
+    "bitboard": lambda: BitBoard(None, 0, GamePhase.PLACEMENT),
+    "board": lambda: Board(None, 0, GamePhase.PLACEMENT),
+}
+
+# The positions to run perft from, as (name, round number) pairs. Each one is
+# reached by playing random moves from the start of the game. The rounds are
+# chosen so that shallow searches cross the end of the placement phase and
+# both death zones (see BitBoard._DEATH_ZONE_ROUNDS).
+_POSITIONS: List[Tuple[str, int]] = [
+    ("placement start", 0),
+    ("placement end", BitBoard.MOVING_PHASE_ROUND_START - 2),
+    ("movement start", BitBoard.MOVING_PHASE_ROUND_START),
+    ("before 1st death zone", 150),
+    ("before 2nd death zone", 214),
+]
+
+_SEED: int = 30024
+_MOVEMENT_DIRECTIONS: List[Tuple[int, int]] = \
+    [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Counts the leaf nodes of the game tree of a set of "
+                    "positions, to check and benchmark move generation.")
+    parser.add_argument("-d", "--depth", type=int, default=2,
+                        help="number of moves to look ahead (default: 2)")
+    parser.add_argument("-e", "--engine", choices=list(_ENGINES),
+                        default="bitboard",
+                        help="board engine to test (default: bitboard)")
+    parser.add_argument("-p", "--position", type=int, default=None,
+                        help="only run the position with this index")
+    parser.add_argument("--packed", action="store_true",
+                        help="use packed moves (see Classes/Move.py) made "
+                             "with apply_move() and undo_move() rather than "
+                             "deltas (bitboard engine only)")
+    parser.add_argument("--no-check", action="store_true",
+                        help="don't cross-check the counts against the "
+                             "referee's rules (which is much slower)")
+    args = parser.parse_args()
+    if (args.packed and args.engine != "bitboard"):
+        parser.error("--packed only works with the bitboard engine")
+
+    positions: List[Tuple[str, int]] = _POSITIONS
+    if (args.position is not None):
+        positions = [_POSITIONS[args.position]]
+
+    is_all_correct: bool = True
+    for name, round_num in positions:
+        actions: List[Action] = get_random_actions(round_num, _SEED)
+        board: Union[Board, BitBoard] = \
+            play_actions(_ENGINES[args.engine](), actions)
+
+        start: float = time.process_time()
+        divide: Dict[Action, int]
+        if (args.packed):
+            divide = perft_packed_divide(board, args.depth)
+        else:
+            divide = perft_divide(board, args.depth)
+        elapsed: float = time.process_time() - start
+        num_nodes: int = sum(divide.values())
+        print("{:<22} round {:>3}, depth {}: {:>10} nodes in {:.3f}s "
+              "({:.0f} nodes/s)".format(
+                  name, round_num, args.depth, num_nodes, elapsed,
+                  num_nodes / elapsed if elapsed > 0 else 0))
+
+        if (args.no_check):
+            continue
+
+        game: _Game = play_referee_actions(actions)
+        referee_divide: Dict[Action, int] = perft_referee_divide(
+            game, args.depth)
+        mismatches: List[str] = get_mismatches(divide, referee_divide)
+        if (len(mismatches) == 0):
+            print("    matches the referee")
+        else:
+            is_all_correct = False
+            print("    DOES NOT MATCH THE REFEREE:")
+            print(board)
+            for mismatch in mismatches:
+                print("       ", mismatch)
+
+    if (not is_all_correct):
+        exit(1)
+
+
+def perft(board: Union[Board, BitBoard], depth: int) -> int:
+    """
+    Returns the number of leaf nodes in the game tree of the given board, down
+    to the given depth. Games that finish before then have no leaves.
+    """
+    if (depth == 0):
+        return 1
+    if (board.phase == GamePhase.FINISHED):
+        return 0
+
+    deltas: List[Delta] = board.get_all_possible_deltas(get_player(board))
+    if (len(deltas) == 0):
+        # The player has no moves, so their turn is forfeited.
+        return perft(get_forfeited_board(board), depth - 1)
+
+    if (depth == 1):
+        return len(deltas)
+
+    num_nodes: int = 0
+    for delta in deltas:
+        num_nodes += perft(board.get_next_board(delta), depth - 1)
+
+    return num_nodes
+
+
+def perft_divide(board: Union[Board, BitBoard], depth: int) \
+        -> Dict[Action, int]:
+    """
+    Returns the number of leaf nodes below each of the moves that can be made
+    on the given board, keyed by the move in the referee's form.
+    """
+    if (depth == 0 or board.phase == GamePhase.FINISHED):
+        return {}
+
+    deltas: List[Delta] = board.get_all_possible_deltas(get_player(board))
+    if (len(deltas) == 0):
+        return {None: perft(get_forfeited_board(board), depth - 1)}
+
+    return {delta.get_referee_form():
+            perft(board.get_next_board(delta), depth - 1)
+            for delta in deltas}
+
+
+def perft_packed(board: BitBoard, depth: int) -> int:
+    """
+    Does the same as perft(), but with packed moves, which are made and undone
+    on the one board.
+    """
+    if (depth == 0):
+        return 1
+    if (board.phase == GamePhase.FINISHED):
+        return 0
+
+    moves: array = board.get_all_possible_moves(get_player(board))
+    if (len(moves) == 0):
+        return perft_packed(get_forfeited_board(board), depth - 1)
+
+    if (depth == 1):
+        return len(moves)
+
+    num_nodes: int = 0
+    for move in moves:
+        board.apply_move(move)
+        num_nodes += perft_packed(board, depth - 1)
+        board.undo_move(move)
+
+    return num_nodes
+
+
+def perft_packed_divide(board: BitBoard, depth: int) -> Dict[Action, int]:
+    """
+    Does the same as perft_divide(), but with packed moves.
+    """
+    if (depth == 0 or board.phase == GamePhase.FINISHED):
+        return {}
+
+    moves: array = board.get_all_possible_moves(get_player(board))
+    if (len(moves) == 0):
+        return {None: perft_packed(get_forfeited_board(board), depth - 1)}
+
+    divide: Dict[Action, int] = {}
+    for move in moves:
+        board.apply_move(move)
+        divide[Move.get_referee_form(move)] = perft_packed(board, depth - 1)
+        board.undo_move(move)
+
+    return divide
+
+
+def perft_referee(game: _Game, depth: int) -> int:
+    """
+    Does the same as perft(), but for a game of the referee's.
+    """
+    if (depth == 0):
+        return 1
+    if (not game.playing()):
+        return 0
+
+    num_nodes: int = 0
+    for _, next_game in get_referee_moves(game):
+        num_nodes += perft_referee(next_game, depth - 1)
+
+    return num_nodes
+
+
+def perft_referee_divide(game: _Game, depth: int) -> Dict[Action, int]:
+    """
+    Does the same as perft_divide(), but for a game of the referee's.
+    """
+    if (depth == 0 or not game.playing()):
+        return {}
+
+    return {action: perft_referee(next_game, depth - 1)
+            for action, next_game in get_referee_moves(game)}
+
+
+def get_referee_moves(game: _Game) -> List[Tuple[Action, _Game]]:
+    """
+    Returns every action the current player can legally make in the given
+    game, along with the game that results from it. Whether an action is legal
+    is left entirely to _Game.update().
+    """
+    candidates: List[Action] = []
+    if (game.phase == 'placing'):
+        candidates = [(x, y) for y in range(8) for x in range(8)]
+    else:
+        for x, y in game._squares_with_piece(game._piece()):
+            for dx, dy in _MOVEMENT_DIRECTIONS:
+                candidates.append(((x, y), (x + dx, y + dy)))
+                candidates.append(((x, y), (x + 2 * dx, y + 2 * dy)))
+
+    moves: List[Tuple[Action, _Game]] = []
+    for action in candidates:
+        next_game: Optional[_Game] = try_referee_action(game, action)
+        if (next_game is not None):
+            moves.append((action, next_game))
+
+    if (len(moves) == 0 and game.phase == 'moving'):
+        moves.append((None, try_referee_action(game, None)))
+
+    return moves
+
+
+def try_referee_action(game: _Game, action: Action) -> Optional[_Game]:
+    """
+    Returns the game that results from making the given action, or None if the
+    referee rejects it.
+    """
+    next_game: _Game = copy.deepcopy(game)
+    try:
+        next_game.update(action)
+    except _InvalidActionException:
+        return None
+
+    return next_game
+
+
+def get_mismatches(divide: Dict[Action, int],
+                   referee_divide: Dict[Action, int]) -> List[str]:
+    """
+    Compares the per-move counts of an engine with the referee's, and returns
+    a description of every move where they differ.
+    """
+    mismatches: List[str] = []
+    for action in set(divide) | set(referee_divide):
+        if (action not in referee_divide):
+            mismatches.append("{}: not a legal move".format(action))
+        elif (action not in divide):
+            mismatches.append("{}: missing".format(action))
+        elif (divide[action] != referee_divide[action]):
+            mismatches.append("{}: {} nodes, referee has {}".format(
+                action, divide[action], referee_divide[action]))
+
+    return sorted(mismatches)
+
+
+def get_player(board: Union[Board, BitBoard]) -> PlayerColor:
+    """
+    Returns the player whose turn it is. White moves first, on round 0.
+    """
+    if (board.round_num % 2 == 0):
+        return PlayerColor.WHITE
+    else:
+        return PlayerColor.BLACK
+
+
+def get_forfeited_board(board: Union[Board, BitBoard]) \
+        -> Union[Board, BitBoard]:
+    """
+    Returns the board after the current player forfeits their turn.
+    """
+    next_board: Union[Board, BitBoard] = copy.deepcopy(board)
+    next_board.skip_turn()
+
+    return next_board
+
+
+def get_random_actions(round_num: int, seed: int) -> List[Action]:
+    """
+    Returns a list of random actions that take a new game to the given round
+    without finishing it. Seeds are tried from 'seed' upwards until one gets
+    there.
+    """
+    while (True):
+        rng: random.Random = random.Random(seed)
+        board: BitBoard = BitBoard(None, 0, GamePhase.PLACEMENT)
+        actions: List[Action] = []
+        while (board.round_num < round_num
+               and board.phase != GamePhase.FINISHED):
+            deltas: List[Delta] = \
+                board.get_all_possible_deltas(get_player(board))
+            if (len(deltas) == 0):
+                board = get_forfeited_board(board)
+                actions.append(None)
+            else:
+                delta: Delta = rng.choice(deltas)
+                board = board.get_next_board(delta)
+                actions.append(delta.get_referee_form())
+
+        if (board.phase != GamePhase.FINISHED):
+            return actions
+        seed += 1
+
+
+def play_actions(board: Union[Board, BitBoard], actions: List[Action]) \
+        -> Union[Board, BitBoard]:
+    """
+    Returns the board after making the given actions on it, one after the
+    other.
+    """
+    for action in actions:
+        if (action is None):
+            board = get_forfeited_board(board)
+            continue
+
+        delta: Delta = next(
+            delta for delta
+            in board.get_all_possible_deltas(get_player(board))
+            if delta.get_referee_form() == action)
+        board = board.get_next_board(delta)
+
+    return board
+
+
+def play_referee_actions(actions: List[Action]) -> _Game:
+    """
+    Returns a new referee game after making the given actions in it.
+    """
+    game: _Game = _Game()
+    for action in actions:
+        game.update(action)
+
+    return game
+
+
+if __name__ == '__main__':
+    main()